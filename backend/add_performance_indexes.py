@@ -22,8 +22,8 @@ def index_exists(conn, table_name, index_name):
     """), {"table_name": table_name, "index_name": index_name})
     return result.scalar()
 
-def create_index_if_not_exists(conn, table_name, index_name, columns, unique=False):
-    """Create an index if it doesn't already exist."""
+def create_index_if_not_exists(conn, table_name, index_name, columns, unique=False, where=None):
+    """Create an index if it doesn't already exist. Pass `where` to create a partial index."""
     if index_exists(conn, table_name, index_name):
         logger.info(f"  ✓ Index '{index_name}' already exists, skipping")
         return False
@@ -33,11 +33,12 @@ def create_index_if_not_exists(conn, table_name, index_name, columns, unique=Fal
         columns_sql = columns
     else:
         columns_sql = ", ".join(columns)
+    where_clause = f"WHERE {where}" if where else ""
     
     try:
         conn.execute(text(f"""
             CREATE {unique_clause} INDEX IF NOT EXISTS "{index_name}" 
-            ON "{table_name}" ({columns_sql})
+            ON "{table_name}" ({columns_sql}) {where_clause}
         """))
         conn.commit()
         logger.info(f"  ✓ Created index '{index_name}' on {table_name}({columns_sql})")
@@ -169,6 +170,23 @@ def create_performance_indexes():
                 "is_active"
             )
             
+            # Keyset paging of the admin user list: ORDER BY lower(email), id
+            indexes_created += create_index_if_not_exists(
+                conn, "users", "idx_users_email_lower_id",
+                ["lower(email)", "id"]
+            )
+            
+            # Case-insensitive prefix search on email and name (LIKE 'abc%')
+            indexes_created += create_index_if_not_exists(
+                conn, "users", "idx_users_email_prefix",
+                "lower(email) text_pattern_ops"
+            )
+            
+            indexes_created += create_index_if_not_exists(
+                conn, "users", "idx_users_full_name_prefix",
+                "lower(full_name) text_pattern_ops"
+            )
+            
             # Audit Logs Indexes
             logger.info("\n📝 Creating indexes for 'audit_logs' table...")
             
@@ -186,6 +204,43 @@ def create_performance_indexes():
                 conn, "audit_logs", "idx_audit_logs_action",
                 "action"
             )
+            
+            # Keyset paging indexes for /api/audit-logs/search: every filter column
+            # followed by the (created_at DESC, id DESC) page order
+            indexes_created += create_index_if_not_exists(
+                conn, "audit_logs", "idx_audit_logs_created_at_id",
+                ["created_at DESC", "id DESC"]
+            )
+            
+            indexes_created += create_index_if_not_exists(
+                conn, "audit_logs", "idx_audit_logs_action_created_at",
+                ["action", "created_at DESC", "id DESC"]
+            )
+            
+            indexes_created += create_index_if_not_exists(
+                conn, "audit_logs", "idx_audit_logs_actor_created_at",
+                ["actor_user_id", "created_at DESC", "id DESC"]
+            )
+            
+            indexes_created += create_index_if_not_exists(
+                conn, "audit_logs", "idx_audit_logs_target_created_at",
+                ["target_user_id", "created_at DESC", "id DESC"]
+            )
+            
+            # Case-insensitive prefix search on target_email (LIKE 'abc%')
+            indexes_created += create_index_if_not_exists(
+                conn, "audit_logs", "idx_audit_logs_target_email_prefix",
+                "lower(target_email) text_pattern_ops"
+            )
+            
+            # Stored files indexes
+            logger.info("\n📝 Creating indexes for 'stored_files' table...")
+            
+            # One stored copy per uploaded content hash (dedup); also resolves concurrent identical uploads
+            indexes_created += create_index_if_not_exists(
+                conn, "stored_files", "idx_stored_files_upload_sha256",
+                "upload_sha256", unique=True
+            )
         
         logger.info("\n" + "=" * 60)
         if indexes_created > 0:
@@ -0,0 +1,243 @@
+"""
+Audit log retention and compressed archival.
+Entries older than AUDIT_RETENTION_DAYS are moved out of the audit_logs table into one
+compressed NDJSON file per month (gzip, or zstd when the zstandard package is installed),
+in batches using DELETE ... RETURNING. A small index.json records the id and time range
+of each monthly archive so archived months can be located and stream-searched on demand.
+Can be run as a standalone script (e.g. from cron) or triggered from the admin router;
+a database advisory lock makes sure only one run (of any worker or host) writes at a time.
+"""
+import gzip
+import io
+import json
+import logging
+import os
+import re
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+from sqlalchemy import text
+from config import settings
+from db import engine
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = Path(settings.audit_archive_dir)
+INDEX_FILE = "index.json"
+MONTH_PATTERN = re.compile(r"^\d{4}-\d{2}$")
+LOCK_NAME = "audit_archive"
+
+# A batch archived twice after a crash is appended right after its first copy, so duplicates
+# are looked for among this many preceding lines only (batch sizes are capped to it)
+DEDUP_WINDOW = 50000
+
+ARCHIVE_COLUMNS = (
+    "id", "actor_user_id", "actor_email", "target_user_id", "target_email",
+    "action", "details", "ip_address", "user_agent", "created_at",
+)
+
+def zstd_available() -> bool:
+    try:
+        import zstandard  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def archive_extension() -> str:
+    """File extension for new archives: zstd when configured and installed, gzip otherwise."""
+    if settings.audit_archive_compression == "zstd":
+        if zstd_available():
+            return ".ndjson.zst"
+        logger.warning("zstandard is not installed, archiving audit logs with gzip instead")
+    return ".ndjson.gz"
+
+def open_for_append(path: Path):
+    """Open an archive for appending; each batch becomes a new gzip member / zstd frame."""
+    if path.name.endswith(".zst"):
+        import zstandard
+        return zstandard.ZstdCompressor(level=10).stream_writer(open(path, "ab"), closefd=True)
+    return gzip.open(path, "ab", compresslevel=6)
+
+def open_for_read(path: Path):
+    """Open an archive as a text stream, reading across all members/frames."""
+    if path.name.endswith(".zst"):
+        import zstandard
+        reader = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames=True, closefd=True)
+        return io.TextIOWrapper(reader, encoding="utf-8")
+    return gzip.open(path, "rt", encoding="utf-8")
+
+def load_index() -> Dict[str, dict]:
+    """Month ("YYYY-MM") -> archive file, row count, id range and created_at range."""
+    index_path = ARCHIVE_DIR / INDEX_FILE
+    if not index_path.exists():
+        return {}
+    with open(index_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_index(index: Dict[str, dict]):
+    """Write the index atomically so readers never see a partial file."""
+    index_path = ARCHIVE_DIR / INDEX_FILE
+    tmp_path = index_path.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, index_path)
+
+def write_month(index: Dict[str, dict], month: str, rows):
+    """Append rows for one month to its archive file and update the index entry."""
+    entry = index.get(month)
+    if entry is None:
+        entry = {"file": f"audit_logs-{month}{archive_extension()}", "count": 0,
+                 "min_id": None, "max_id": None, "first_created_at": None, "last_created_at": None}
+    path = ARCHIVE_DIR / entry["file"]
+    with open_for_append(path) as f:
+        for row in rows:
+            f.write((json.dumps(row, default=str, separators=(",", ":")) + "\n").encode("utf-8"))
+    # The rows are only deleted from the database once they are safely on disk
+    with open(path, "rb") as f:
+        os.fsync(f.fileno())
+
+    ids = [row["id"] for row in rows]
+    created = [row["created_at"] for row in rows if row["created_at"]]
+    entry["count"] += len(rows)
+    entry["min_id"] = min([i for i in (entry["min_id"], *ids) if i is not None])
+    entry["max_id"] = max([i for i in (entry["max_id"], *ids) if i is not None])
+    if created:
+        entry["first_created_at"] = min([c for c in (entry["first_created_at"], *created) if c])
+        entry["last_created_at"] = max([c for c in (entry["last_created_at"], *created) if c])
+    entry["bytes"] = path.stat().st_size
+    index[month] = entry
+
+def archive_batches(conn, cutoff: datetime, retention_days: int, batch_size: int):
+    """The archival loop of archive_old_audit_logs, run while holding the lock."""
+    ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    index = load_index()
+    archived = 0
+    months = set()
+    columns_sql = ", ".join(ARCHIVE_COLUMNS)
+
+    logger.info(f"Archiving audit logs older than {cutoff.isoformat()} ({retention_days} days)")
+    while True:
+        result = conn.execute(text(f"""
+            DELETE FROM audit_logs
+            WHERE id IN (
+                SELECT id FROM audit_logs
+                WHERE created_at < :cutoff
+                ORDER BY created_at, id
+                LIMIT :batch_size
+            )
+            RETURNING {columns_sql}
+        """), {"cutoff": cutoff, "batch_size": batch_size})
+        rows = [dict(row) for row in result.mappings()]
+        if not rows:
+            conn.rollback()
+            break
+
+        by_month = {}
+        for row in rows:
+            created_at = row["created_at"]
+            row["created_at"] = created_at.isoformat() if created_at else None
+            month = created_at.strftime("%Y-%m") if created_at else "unknown"
+            by_month.setdefault(month, []).append(row)
+        try:
+            for month, month_rows in by_month.items():
+                write_month(index, month, month_rows)
+            save_index(index)
+        except Exception:
+            conn.rollback()  # Keep the rows in the table if the archive write failed
+            raise
+        conn.commit()
+
+        archived += len(rows)
+        months.update(by_month)
+        logger.info(f"  Archived {archived} entries so far")
+
+    return archived, months
+
+def archive_old_audit_logs(retention_days: Optional[int] = None, batch_size: int = 5000) -> dict:
+    """
+    Move audit log entries older than retention_days into the monthly archives.
+    Each batch is deleted with DELETE ... RETURNING, written and fsynced, and only then
+    committed, so a crash can at worst archive a batch twice (never lose it).
+    Returns a summary of what was archived.
+    """
+    retention_days = retention_days if retention_days is not None else settings.audit_retention_days
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    batch_size = min(batch_size, DEDUP_WINDOW)
+
+    with engine.connect() as conn:
+        # Session-level lock: held across the per-batch commits until released below
+        locked = conn.execute(text("SELECT pg_try_advisory_lock(hashtext(:name))"), {"name": LOCK_NAME}).scalar()
+        conn.commit()
+        if not locked:
+            logger.warning("Audit log archival is already running, skipping this run")
+            return {"archived": 0, "months": [], "cutoff": cutoff.isoformat(), "already_running": True}
+        try:
+            archived, months = archive_batches(conn, cutoff, retention_days, batch_size)
+        finally:
+            conn.rollback()
+            conn.execute(text("SELECT pg_advisory_unlock(hashtext(:name))"), {"name": LOCK_NAME})
+            conn.commit()
+
+    logger.info(f"✓ Archived {archived} audit log entries into {len(months)} monthly files")
+    return {"archived": archived, "months": sorted(months), "cutoff": cutoff.isoformat(), "already_running": False}
+
+def search_archive(
+    month: str,
+    action: Optional[str] = None,
+    actor_user_id: Optional[int] = None,
+    target_user_id: Optional[int] = None,
+    target_email_prefix: Optional[str] = None
+) -> Iterator[str]:
+    """
+    Stream the NDJSON lines of one archived month that match the filters.
+    Decompresses line by line and remembers only the last DEDUP_WINDOW ids, so memory
+    stays flat regardless of archive size.
+    """
+    entry = load_index().get(month)
+    if entry is None:
+        return
+    email_prefix = target_email_prefix.lower() if target_email_prefix else None
+    # A batch archived twice after a crash is only returned once
+    seen_ids = set()
+    recent_ids = deque()
+    with open_for_read(ARCHIVE_DIR / entry["file"]) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            if row["id"] in seen_ids:
+                continue
+            seen_ids.add(row["id"])
+            recent_ids.append(row["id"])
+            if len(recent_ids) > DEDUP_WINDOW:
+                seen_ids.discard(recent_ids.popleft())
+            if action and row.get("action") != action:
+                continue
+            if actor_user_id and row.get("actor_user_id") != actor_user_id:
+                continue
+            if target_user_id and row.get("target_user_id") != target_user_id:
+                continue
+            if email_prefix and not (row.get("target_email") or "").lower().startswith(email_prefix):
+                continue
+            yield line if line.endswith("\n") else line + "\n"
+
+def main():
+    """Main function for standalone script execution."""
+    import argparse
+    import sys
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    parser = argparse.ArgumentParser(description="Move old audit log entries into compressed monthly archives")
+    parser.add_argument("--days", type=int, default=settings.audit_retention_days, help="Retention in days")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+    archive_old_audit_logs(args.days, args.batch_size)
+
+if __name__ == "__main__":
+    main()
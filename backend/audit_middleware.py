@@ -0,0 +1,154 @@
+"""
+Automatic server-side auditing of mutating API requests.
+
+- capture_mutation_fields: router dependency that records which top-level fields a
+  POST/PUT/PATCH/DELETE body contained (names only, never values).
+- AuditMiddleware: ASGI middleware that, once a successful mutation response has been
+  sent, combines the authenticated actor (stored by auth.get_current_user), the target,
+  the changed fields and the client IP/user agent into an AuditLog entry and hands it
+  to the background audit sink. The response is never delayed by a database write.
+- Admin endpoints are operations, so they are named after their path
+  (POST /api/admin/audit-retention -> "run_audit_retention"); a handler can store the
+  options it ran with in request.state.audit_parameters.
+"""
+import logging
+import re
+from fastapi import Request
+from starlette.concurrency import run_in_threadpool
+from audit_sink import audit_sink
+
+logger = logging.getLogger(__name__)
+
+# HTTP method -> action verb
+AUDITED_METHODS = {"POST": "create", "PUT": "update", "PATCH": "update", "DELETE": "delete"}
+
+# URL prefix -> resource name used in the action, e.g. "update_shop_visit"
+AUDITED_RESOURCES = {
+    "/api/customers": "customer",
+    "/api/shop-visits": "shop_visit",
+    "/api/configurations": "configuration",
+    "/api/user-profiles": "user_profile",
+    "/api/users": "user",
+    "/api/files": "file",
+    "/api/report-exports": "report_export",
+    "/api/admin": "admin",
+}
+
+ADMIN_PREFIX = "/api/admin/"
+
+async def capture_mutation_fields(request: Request):
+    """Remember the top-level field names (and target hints) of a JSON mutation body."""
+    if request.method not in AUDITED_METHODS:
+        return
+    if not request.headers.get("content-type", "").startswith("application/json"):
+        return
+    try:
+        body = await request.json()
+    except Exception:
+        return
+    if isinstance(body, dict):
+        request.state.audit_fields = sorted(body.keys())
+        request.state.audit_target_email = body.get("email")
+        request.state.audit_target_user_id = body.get("user_id")
+
+def get_client_ip(headers: dict, scope) -> str:
+    """Client address, preferring the headers set by the nginx proxy."""
+    forwarded = headers.get("x-forwarded-for")
+    if forwarded:
+        return forwarded.split(",")[0].strip()
+    if headers.get("x-real-ip"):
+        return headers["x-real-ip"]
+    client = scope.get("client")
+    return client[0] if client else None
+
+def build_audit_entry(scope, status_code: int):
+    """Turn a completed request into AuditLog column values, or None if it isn't audited."""
+    method = scope.get("method")
+    path = scope.get("path", "")
+    resource = next(
+        (name for prefix, name in AUDITED_RESOURCES.items()
+         if path == prefix or path.startswith(prefix + "/")),
+        None
+    )
+    if method not in AUDITED_METHODS or resource is None or not 200 <= status_code < 300:
+        return None
+
+    state = scope.get("state") or {}
+    actor = state.get("audit_actor")
+    if actor is None:
+        return None  # Unauthenticated requests are rejected before they change anything
+
+    path_params = scope.get("path_params") or {}
+    resource_id = next(
+        (value for key, value in path_params.items() if key.endswith("_id")), None
+    )
+    target_user_id = path_params.get("user_id") or state.get("audit_target_user_id")
+    if resource == "user" and target_user_id is None:
+        target_user_id = resource_id
+    if resource == "user" and method == "DELETE":
+        # The user row is gone and audit_logs.target_user_id references users.id;
+        # the deleted id stays in details.resource_id
+        target_user_id = None
+    try:
+        target_user_id = int(target_user_id) if target_user_id is not None else None
+    except (TypeError, ValueError):
+        target_user_id = None
+
+    if resource == "admin":
+        action = "run_" + re.sub(r"[^a-z0-9]+", "_", path[len(ADMIN_PREFIX):].lower()).strip("_")
+    else:
+        action = f"{AUDITED_METHODS[method]}_{resource}"
+    details = {
+        "method": method,
+        "path": path,
+        "resource_id": resource_id,
+        "fields": state.get("audit_fields", []),
+        "status_code": status_code,
+    }
+    if state.get("audit_parameters"):
+        details["parameters"] = state["audit_parameters"]
+
+    headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope.get("headers", [])}
+    return {
+        "actor_user_id": actor["id"],
+        "actor_email": actor["email"],
+        "target_user_id": target_user_id,
+        "target_email": state.get("audit_target_email"),
+        "action": action,
+        "details": details,
+        "ip_address": get_client_ip(headers, scope),
+        "user_agent": headers.get("user-agent"),
+    }
+
+class AuditMiddleware:
+    """Pure ASGI middleware so streaming responses are passed through untouched."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("method") not in AUDITED_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+        try:
+            entry = build_audit_entry(scope, status_code)
+            if entry is not None:
+                if audit_sink.overflow_policy == "block":
+                    # Waiting for room in a full queue must not stall the event loop
+                    await run_in_threadpool(audit_sink.submit, entry)
+                else:
+                    audit_sink.submit(entry)
+        except Exception as e:
+            # Auditing must never break a request that already succeeded
+            logger.error(f"Failed to record audit entry for {scope.get('path')}: {e}", exc_info=True)
@@ -0,0 +1,229 @@
+"""
+Asynchronous, batched audit log writer.
+Request handlers hand audit entries to an in-process bounded queue (a few microseconds),
+and a background thread bulk-inserts them into audit_logs every flush interval or as
+soon as a full batch is waiting. The queue is flushed on shutdown.
+A batch the database rejects (constraint or data error) is retried entry by entry and only
+the failing entries are dropped; on connection errors the batch is re-queued and retried.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+from config import settings
+from db import SessionLocal
+from models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "block")
+
+# Every queued entry carries all of these keys so batches can be inserted with one executemany
+AUDIT_COLUMNS = (
+    "actor_user_id", "actor_email", "target_user_id", "target_email",
+    "action", "details", "ip_address", "user_agent", "created_at",
+)
+
+# Longest time submit() waits for room with the "block" policy before dropping the entry.
+# submit() then blocks the calling thread, so async callers run it in the threadpool.
+BLOCK_TIMEOUT_SECONDS = 1.0
+
+# Errors caused by the entries themselves: retrying the same rows can never succeed
+REJECTED_ERRORS = (IntegrityError, DataError)
+
+class AuditSink:
+    """Bounded in-memory queue of audit entries drained by a background writer thread."""
+
+    def __init__(
+        self,
+        max_queue: int = 10000,
+        batch_size: int = 200,
+        flush_interval_ms: int = 500,
+        overflow_policy: str = "drop_oldest"
+    ):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown audit overflow policy '{overflow_policy}', expected one of {OVERFLOW_POLICIES}")
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.overflow_policy = overflow_policy
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self._counters = {
+            "submitted": 0,
+            "written": 0,
+            "dropped": 0,
+            "rejected": 0,
+            "batches": 0,
+            "failed_batches": 0,
+        }
+        self._last_flush_ms = None
+        self._last_error = None
+
+    def submit(self, entry: Dict[str, Any]) -> bool:
+        """
+        Queue an audit entry (a dict of AuditLog columns). Never touches the database.
+        Returns False if the entry was dropped because the queue is full.
+        """
+        entry = {column: entry.get(column) for column in AUDIT_COLUMNS}
+        if entry["created_at"] is None:
+            entry["created_at"] = datetime.now(timezone.utc)
+        with self._condition:
+            self._counters["submitted"] += 1
+            if len(self._queue) >= self.max_queue:
+                if self.overflow_policy == "drop_oldest":
+                    self._queue.popleft()
+                    self._counters["dropped"] += 1
+                elif self.overflow_policy == "drop_newest":
+                    self._counters["dropped"] += 1
+                    return False
+                else:  # block
+                    self._condition.notify_all()
+                    has_room = self._condition.wait_for(
+                        lambda: len(self._queue) < self.max_queue or self._stopping, BLOCK_TIMEOUT_SECONDS
+                    )
+                    if not has_room or len(self._queue) >= self.max_queue:
+                        self._counters["dropped"] += 1
+                        return False
+            self._queue.append(entry)
+            if len(self._queue) >= self.batch_size:
+                self._condition.notify_all()
+        return True
+
+    def start(self):
+        """Start the background writer thread (idempotent)."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="audit-sink-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Stop the writer thread after flushing everything still queued."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+        # Anything left (thread not started or timed out) is written synchronously
+        self.flush()
+
+    def flush(self):
+        """Write all queued entries now, in batches, from the calling thread."""
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return
+            if not self._write(batch):
+                return
+
+    def _take_batch(self):
+        with self._condition:
+            count = min(self.batch_size, len(self._queue))
+            batch = [self._queue.popleft() for _ in range(count)]
+            if batch:
+                self._condition.notify_all()  # Wake submitters blocked on a full queue
+            return batch
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._stopping or len(self._queue) >= self.batch_size, self.flush_interval
+                )
+                stopping = self._stopping
+            batch = self._take_batch()
+            if batch and not self._write(batch):
+                if stopping:
+                    return  # stop() makes a final synchronous attempt
+                # Database unavailable: back off before retrying the re-queued batch
+                time.sleep(self.flush_interval)
+                continue
+            if stopping and not self._queue:
+                return
+
+    def _insert(self, rows):
+        db = SessionLocal()
+        try:
+            db.execute(insert(AuditLog), rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _requeue(self, rows, error: Exception):
+        """Put unwritten rows back at the front of the queue (as far as there is room)."""
+        with self._condition:
+            self._counters["failed_batches"] += 1
+            self._last_error = str(error)
+            room = self.max_queue - len(self._queue)
+            requeue = rows[:max(room, 0)]
+            self._queue.extendleft(reversed(requeue))
+            self._counters["dropped"] += len(rows) - len(requeue)
+        logger.error(f"Failed to write {len(rows)} audit log entries: {error}")
+
+    def _write(self, batch) -> bool:
+        """
+        Bulk-insert one batch. Returns False if the database was unavailable, in which case
+        the unwritten entries are back at the front of the queue.
+        """
+        started = time.perf_counter()
+        written = len(batch)
+        try:
+            self._insert(batch)
+        except REJECTED_ERRORS as e:
+            logger.warning(f"Audit log batch of {len(batch)} rejected, writing entries one by one: {e}")
+            written = 0
+            for index, entry in enumerate(batch):
+                try:
+                    self._insert([entry])
+                except REJECTED_ERRORS as e:
+                    with self._condition:
+                        self._counters["rejected"] += 1
+                        self._last_error = str(e)
+                    logger.error(f"Dropped audit log entry '{entry['action']}' rejected by the database: {e}")
+                except Exception as e:
+                    with self._condition:
+                        self._counters["written"] += written
+                    self._requeue(batch[index:], e)
+                    return False
+                else:
+                    written += 1
+        except Exception as e:
+            self._requeue(batch, e)
+            return False
+        with self._condition:
+            self._counters["written"] += written
+            self._counters["batches"] += 1
+            self._last_flush_ms = round((time.perf_counter() - started) * 1000, 2)
+        return True
+
+    def metrics(self) -> Dict[str, Any]:
+        """Counters and queue state for monitoring."""
+        with self._condition:
+            return {
+                **self._counters,
+                "queued": len(self._queue),
+                "max_queue": self.max_queue,
+                "batch_size": self.batch_size,
+                "flush_interval_ms": int(self.flush_interval * 1000),
+                "overflow_policy": self.overflow_policy,
+                "last_flush_ms": self._last_flush_ms,
+                "last_error": self._last_error,
+                "running": bool(self._thread and self._thread.is_alive()),
+            }
+
+audit_sink = AuditSink(
+    max_queue=settings.audit_queue_size,
+    batch_size=settings.audit_batch_size,
+    flush_interval_ms=settings.audit_flush_interval_ms,
+    overflow_policy=settings.audit_overflow_policy,
+)
@@ -3,17 +3,23 @@ Authentication utilities: password hashing, JWT token creation, and user authent
 """
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, Response, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
 from db import get_db
-from models import User
+from models import User, UserRole
 import bcrypt
 
 # OAuth2 scheme for token extraction
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
+# HttpOnly cookie that lets <img> tags load stored files and signatures. It holds a token
+# scoped to those GET endpoints, which get_current_user does not accept as a bearer token.
+MEDIA_COOKIE = "media_token"
+MEDIA_COOKIE_PATH = "/api"
+MEDIA_SCOPE = "media"
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Verify a password against a bcrypt hash.
@@ -94,13 +100,16 @@ def authenticate_user(db: Session, email: str, password: str) -> User | bool:
     return user
 
 async def get_current_user(
+    request: Request,
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
 ) -> User:
     """
     Get the current authenticated user from JWT token.
+    The actor is also stored on request.state for the audit middleware.
     
     Args:
+        request: Incoming request
         token: JWT token from Authorization header
         db: Database session
         
@@ -118,7 +127,7 @@ async def get_current_user(
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
-        if email is None:
+        if email is None or payload.get("scope") is not None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
@@ -126,6 +135,74 @@ async def get_current_user(
     user = db.query(User).filter(User.email == email).first()
     if user is None:
         raise credentials_exception
+    # Plain values: the ORM instance is expired by the handler's commit
+    request.state.audit_actor = {"id": user.id, "email": user.email}
+    return user
+
+def set_media_cookie(response: Response, request: Request, email: str):
+    """
+    Issue the media cookie alongside an access token, with the same lifetime.
+    
+    Args:
+        response: Response to set the cookie on
+        request: Incoming request (decides whether the cookie is HTTPS-only)
+        email: Email of the authenticated user
+    """
+    scheme = request.headers.get("x-forwarded-proto", request.url.scheme)
+    response.set_cookie(
+        MEDIA_COOKIE,
+        create_access_token(data={"sub": email, "scope": MEDIA_SCOPE}),
+        max_age=ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        path=MEDIA_COOKIE_PATH,
+        httponly=True,
+        samesite="lax",
+        secure=scheme == "https",
+    )
+
+def clear_media_cookie(response: Response):
+    """Remove the media cookie (on logout)."""
+    response.delete_cookie(MEDIA_COOKIE, path=MEDIA_COOKIE_PATH)
+
+async def get_media_user(
+    request: Request,
+    db: Session = Depends(get_db)
+) -> User:
+    """
+    Get the active user allowed to read stored files and signatures: from the bearer token
+    when the frontend fetches them, otherwise from the media cookie (<img> tags).
+    
+    Args:
+        request: Incoming request
+        db: Database session
+        
+    Returns:
+        Active User object
+        
+    Raises:
+        HTTPException: If neither credential is valid or the user is inactive
+    """
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    expected_scope = None
+    if scheme.lower() != "bearer" or not token:
+        token = request.cookies.get(MEDIA_COOKIE)
+        expected_scope = MEDIA_SCOPE
+    if not token:
+        raise credentials_exception
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise credentials_exception
+    email = payload.get("sub")
+    if email is None or payload.get("scope") != expected_scope:
+        raise credentials_exception
+    user = db.query(User).filter(User.email == email).first()
+    if user is None or not user.is_active:
+        raise credentials_exception
     return user
 
 async def get_current_active_user(
@@ -150,3 +227,48 @@ async def get_current_active_user(
         )
     return current_user
 
+
+async def get_current_admin_user(
+    current_user: User = Depends(get_current_active_user)
+) -> User:
+    """
+    Get the current authenticated user and require the admin role.
+    
+    Args:
+        current_user: Current active user from get_current_active_user dependency
+        
+    Returns:
+        Admin User object
+        
+    Raises:
+        HTTPException: If user is not an admin
+    """
+    if current_user.role != UserRole.admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required"
+        )
+    return current_user
+
+
+async def get_current_manager_user(
+    current_user: User = Depends(get_current_active_user)
+) -> User:
+    """
+    Get the current authenticated user and require the manager or admin role.
+    
+    Args:
+        current_user: Current active user from get_current_active_user dependency
+        
+    Returns:
+        Manager or admin User object
+        
+    Raises:
+        HTTPException: If user is neither a manager nor an admin
+    """
+    if current_user.role not in (UserRole.manager, UserRole.admin):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Manager privileges required"
+        )
+    return current_user
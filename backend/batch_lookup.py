@@ -0,0 +1,19 @@
+"""
+Helpers for batch lookups by id set (GET /api/users?ids=1,2,3, GET /api/customers?ids=...).
+A page of visits references a handful of users and customers; the client resolves them all
+with one request (and one IN query) instead of one request per id.
+"""
+from typing import List
+from fastapi import HTTPException
+
+MAX_BATCH_IDS = 500
+
+def parse_id_list(ids: str) -> List[int]:
+    """Parse a comma-separated id list into distinct integer ids."""
+    try:
+        parsed = {int(value) for value in ids.split(",") if value.strip()}
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of integers")
+    if len(parsed) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids can be looked up at once")
+    return sorted(parsed)
@@ -0,0 +1,219 @@
+"""
+Response compression with zstd, brotli or gzip, chosen from Accept-Encoding.
+Replaces Starlette's GZipMiddleware, which compressed every response type at one level:
+- The level is picked per content type (COMPRESSION_LEVELS overrides the defaults below);
+  types without a policy (images, PDFs, archives, octet streams) are sent as they are.
+- Bodies that are already encoded, partial (206) or marked no-transform are not touched.
+- JSON carrying inline base64 images compresses poorly, so it gets the cheapest level.
+- Streaming responses (e.g. NDJSON/CSV exports) are compressed chunk by chunk and flushed,
+  so the client still receives data as it is produced.
+brotli and zstd are used when the brotli / zstandard packages are installed.
+Measure with: python compression_benchmark.py
+"""
+import zlib
+from typing import Dict, List, Optional
+from starlette.datastructures import Headers, MutableHeaders
+from config import settings
+
+# Levels per content type; a prefix ending in "/" matches the whole family
+DEFAULT_LEVELS: Dict[str, Dict[str, int]] = {
+    "application/json": {"zstd": 3, "br": 4, "gzip": 6},
+    "application/x-ndjson": {"zstd": 3, "br": 4, "gzip": 6},
+    "application/msgpack": {"zstd": 3, "br": 4, "gzip": 6},
+    "application/javascript": {"zstd": 6, "br": 6, "gzip": 6},
+    "application/xml": {"zstd": 3, "br": 5, "gzip": 6},
+    "image/svg+xml": {"zstd": 6, "br": 6, "gzip": 6},
+    "text/": {"zstd": 3, "br": 5, "gzip": 6},
+}
+
+# For payloads that are mostly base64 image data: little to gain, so spend little CPU
+FAST_LEVELS = {"zstd": 1, "br": 1, "gzip": 1}
+INLINE_IMAGE_MARKER = b";base64,"
+
+def available_encodings() -> List[str]:
+    """Encodings whose compressor can be loaded in this environment."""
+    encodings = ["gzip"]
+    try:
+        import brotli  # noqa: F401
+        encodings.append("br")
+    except ImportError:
+        pass
+    try:
+        import zstandard  # noqa: F401
+        encodings.append("zstd")
+    except ImportError:
+        pass
+    return encodings
+
+def parse_accept_encoding(value: str) -> Dict[str, float]:
+    """Accept-Encoding header -> {coding: q}; q=0 is kept, it refuses the coding."""
+    accepted = {}
+    for part in value.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, number = param.strip().partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(number)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+def choose_encoding(accept_encoding: str, preference: List[str]) -> Optional[str]:
+    """
+    Highest-q coding the client accepts; ties go to the server's preference order.
+    "*" only stands for codings the header does not name, so "gzip;q=0, *" still refuses gzip.
+    """
+    accepted = parse_accept_encoding(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    candidates = [
+        (accepted.get(coding, wildcard), -rank, coding)
+        for rank, coding in enumerate(preference)
+    ]
+    best = max((candidate for candidate in candidates if candidate[0] > 0), default=None)
+    return best[2] if best else None
+
+class Compressor:
+    """Incremental compressor for one response body."""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == "br":
+            import brotli
+            self._brotli = brotli.Compressor(quality=level)
+        elif encoding == "zstd":
+            import zstandard
+            self._zstd_flush_block = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+            self._zstd = zstandard.ZstdCompressor(level=level).compressobj()
+        else:
+            self._zlib = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        """Compress a chunk; with flush, everything so far is made decodable by the client."""
+        if self.encoding == "br":
+            return self._brotli.process(data) + (self._brotli.flush() if flush else b"")
+        if self.encoding == "zstd":
+            return self._zstd.compress(data) + (self._zstd.flush(self._zstd_flush_block) if flush else b"")
+        return self._zlib.compress(data) + (self._zlib.flush(zlib.Z_SYNC_FLUSH) if flush else b"")
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.finish()
+        if self.encoding == "zstd":
+            return self._zstd.flush()
+        return self._zlib.flush()
+
+def compress_body(body: bytes, encoding: str, level: int) -> bytes:
+    compressor = Compressor(encoding, level)
+    return compressor.compress(body) + compressor.finish()
+
+class CompressionMiddleware:
+    """Pure ASGI middleware negotiating zstd/br/gzip per response."""
+
+    def __init__(self, app, minimum_size: int = None, encodings: List[str] = None, levels: Dict[str, Dict[str, int]] = None):
+        self.app = app
+        self.minimum_size = minimum_size if minimum_size is not None else settings.compression_min_size
+        installed = available_encodings()
+        preference = encodings or [e.strip() for e in settings.compression_encodings.split(",") if e.strip()]
+        self.encodings = [encoding for encoding in preference if encoding in installed]
+        overrides = levels if levels is not None else settings.compression_levels
+        # Merged per encoding, so {"application/json": {"br": 5}} keeps the zstd and gzip levels
+        self.levels = {
+            content_type: {**DEFAULT_LEVELS.get(content_type, {}), **overrides.get(content_type, {})}
+            for content_type in {**DEFAULT_LEVELS, **overrides}
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+    def level_for(self, content_type: str, encoding: str) -> Optional[int]:
+        media_type = content_type.split(";")[0].strip().lower()
+        policy = self.levels.get(media_type)
+        if policy is None:
+            family = media_type.split("/")[0] + "/"
+            policy = self.levels.get(family)
+        return (policy or {}).get(encoding)
+
+class CompressionResponder:
+    """Holds back http.response.start until the first body chunk shows whether to compress."""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.downstream = send
+        self.start_message = None
+        self.compressor: Optional[Compressor] = None
+        self.passthrough = False
+
+    async def send(self, message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            self.start_message = message
+            return
+        if self.passthrough:
+            await self.downstream(message)
+            return
+        if self.compressor is None:
+            if message_type != "http.response.body":
+                # Zero-copy file sends and other extensions are not compressed
+                await self._start_uncompressed(message)
+                return
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            level = self._decide(body, more_body)
+            if level is None:
+                await self._start_uncompressed(message)
+                return
+            self.compressor = Compressor(self.encoding, level)
+            headers = MutableHeaders(raw=list(self.start_message["headers"]))
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                del headers["Content-Length"]
+                compressed = self.compressor.compress(body, flush=True)
+            else:
+                compressed = self.compressor.compress(body) + self.compressor.finish()
+                headers["Content-Length"] = str(len(compressed))
+            self.start_message["headers"] = headers.raw
+            await self.downstream(self.start_message)
+            await self.downstream({"type": "http.response.body", "body": compressed, "more_body": more_body})
+            return
+
+        more_body = message.get("more_body", False)
+        chunk = self.compressor.compress(message.get("body", b""), flush=more_body)
+        if not more_body:
+            chunk += self.compressor.finish()
+        await self.downstream({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+    def _decide(self, body: bytes, more_body: bool) -> Optional[int]:
+        """Compression level for this response, or None to send it unchanged."""
+        status = self.start_message["status"]
+        headers = Headers(raw=self.start_message["headers"])
+        if status < 200 or status in (204, 206, 304):
+            return None
+        if "content-encoding" in headers or "no-transform" in headers.get("cache-control", ""):
+            return None
+        if not more_body and len(body) < self.middleware.minimum_size:
+            return None
+        level = self.middleware.level_for(headers.get("content-type", ""), self.encoding)
+        if level is not None and INLINE_IMAGE_MARKER in body:
+            return FAST_LEVELS[self.encoding]
+        return level
+
+    async def _start_uncompressed(self, message):
+        self.passthrough = True
+        await self.downstream(self.start_message)
+        await self.downstream(message)
@@ -0,0 +1,77 @@
+"""
+Compression benchmark: bytes saved vs CPU time per response, per encoding and level.
+Payload samples are real API responses rendered from the configured database
+(visit summaries, full visits, customers, audit logs); captured response bodies can be
+added with --file. Encodings whose package (brotli, zstandard) is missing are skipped.
+Run from the backend directory: python compression_benchmark.py [--file body.json ...]
+"""
+import argparse
+import statistics
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+from compression import Compressor, available_encodings, DEFAULT_LEVELS
+
+LEVELS = {"gzip": [1, 6, 9], "br": [1, 4, 6, 9, 11], "zstd": [1, 3, 6, 12, 19]}
+
+def database_samples(limit: int) -> Dict[str, bytes]:
+    """Serialize the same payloads the list/detail endpoints return."""
+    from db import SessionLocal
+    from models import ShopVisit, Customer, AuditLog
+    from schemas import ShopVisitSummary, ShopVisitResponse, CustomerResponse, AuditLogResponse
+    from serialization import dump_model_list
+    samples = {}
+    with SessionLocal() as db:
+        visits = db.query(ShopVisit).order_by(ShopVisit.created_at.desc()).limit(limit).all()
+        samples[f"visit summaries ({len(visits)})"] = dump_model_list(ShopVisitSummary, visits)
+        samples[f"full visits ({min(len(visits), 50)})"] = dump_model_list(ShopVisitResponse, visits[:50])
+        customers = db.query(Customer).limit(limit).all()
+        samples[f"customers ({len(customers)})"] = dump_model_list(CustomerResponse, customers)
+        logs = db.query(AuditLog).order_by(AuditLog.created_at.desc()).limit(limit).all()
+        samples[f"audit logs ({len(logs)})"] = dump_model_list(AuditLogResponse, logs)
+    return {name: body for name, body in samples.items() if len(body) > 2}
+
+def measure(body: bytes, encoding: str, level: int, runs: int) -> Tuple[int, float]:
+    """(compressed size, median CPU seconds) for one body."""
+    timings = []
+    size = 0
+    for _ in range(runs):
+        start = time.process_time()
+        compressor = Compressor(encoding, level)
+        size = len(compressor.compress(body) + compressor.finish())
+        timings.append(time.process_time() - start)
+    return size, statistics.median(timings)
+
+def report(name: str, body: bytes, encodings: List[str], runs: int):
+    default_level = DEFAULT_LEVELS["application/json"]
+    print(f"\n{name}: {len(body) / 1024:.1f} KB")
+    print(f"  {'encoding':<10}{'level':>6}{'size KB':>10}{'saved':>8}{'CPU ms':>9}{'KB saved/ms':>13}")
+    for encoding in encodings:
+        for level in LEVELS[encoding]:
+            size, cpu = measure(body, encoding, level, runs)
+            saved = len(body) - size
+            per_ms = saved / 1024 / (cpu * 1000) if cpu > 0 else float("inf")
+            marker = " *" if default_level.get(encoding) == level else ""
+            print(f"  {encoding:<10}{level:>6}{size / 1024:>10.1f}{saved / len(body):>8.0%}{cpu * 1000:>9.2f}{per_ms:>13.1f}{marker}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare response compression ratio and CPU cost")
+    parser.add_argument("--file", action="append", default=[], help="Captured response body to include")
+    parser.add_argument("--limit", type=int, default=1000, help="Rows per database sample")
+    parser.add_argument("--runs", type=int, default=5, help="Measured runs per level")
+    parser.add_argument("--no-db", action="store_true", help="Only benchmark --file samples")
+    args = parser.parse_args()
+
+    samples = {} if args.no_db else database_samples(args.limit)
+    for path in args.file:
+        samples[Path(path).name] = Path(path).read_bytes()
+    if not samples:
+        parser.error("no samples: the database is empty and no --file was given")
+
+    encodings = [encoding for encoding in ("gzip", "br", "zstd") if encoding in available_encodings()]
+    print(f"Encodings: {', '.join(encodings)} (* = level used for JSON responses)")
+    for name, body in samples.items():
+        report(name, body, encodings, args.runs)
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pathlib import Path
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import AnyUrl, field_validator
@@ -12,6 +12,51 @@ class Settings(BaseSettings):
     # Non-sensitive fields with defaults
     algorithm: str = "HS256"
     access_token_expire_minutes: Optional[int] = 30
+    # Serve requests immediately and run migrations in the background after startup
+    fast_start: bool = False
+    # Background audit log writer (see audit_sink.py)
+    audit_queue_size: int = 10000
+    audit_batch_size: int = 200
+    audit_flush_interval_ms: int = 500
+    audit_overflow_policy: str = "drop_oldest"  # drop_oldest, drop_newest or block
+    # Audit log retention (see audit_archive.py)
+    audit_retention_days: int = 365
+    audit_archive_dir: str = "archives/audit_logs"
+    audit_archive_compression: str = "gzip"  # gzip or zstd (requires the zstandard package)
+    # File uploads (see file_storage.py and upload_limits.py)
+    upload_dir: str = "uploads"
+    upload_max_bytes: int = 25 * 1024 * 1024  # Per upload request
+    upload_max_total_bytes: int = 200 * 1024 * 1024  # All uploads in flight in this worker
+    upload_max_concurrent: int = 8
+    file_gc_grace_hours: int = 24  # Unreferenced uploads younger than this are kept (visit not saved yet)
+    # Visit photo processing (see image_pipeline.py)
+    image_workers: int = 0  # Worker processes, 0 = one per CPU core
+    image_queue_size: int = 32  # Images processed or waiting at once; later uploads wait for a slot
+    image_max_edge: int = 2560  # Longest edge of the stored full-size photo
+    image_jpeg_quality: int = 85
+    # Response compression (see compression.py)
+    compression_encodings: str = "zstd,br,gzip"  # Server preference among the codings a client accepts
+    compression_min_size: int = 1000  # Smaller complete responses are sent uncompressed
+    compression_levels: Dict[str, Dict[str, int]] = {}  # JSON, e.g. {"application/json": {"br": 5}}
+    # Cache of GET responses (see response_cache.py)
+    response_cache_backend: str = "memory"  # memory, redis or off
+    response_cache_url: str = "redis://localhost:6379/0"  # Any Redis-compatible server (redis backend)
+    response_cache_ttl_seconds: int = 300
+    response_cache_max_bytes: int = 64 * 1024 * 1024  # Memory backend, per worker
+    # Server-side visit report PDFs (see pdf_renderer.py)
+    pdf_workers: int = 2  # Worker processes, each keeping one headless Chromium open
+    pdf_queue_size: int = 8  # Reports rendered or waiting at once; later downloads wait for a slot
+    pdf_render_timeout_seconds: int = 30
+    pdf_cache_dir: str = "cache/pdf"
+    pdf_cache_max_bytes: int = 512 * 1024 * 1024
+    pdf_template_path: str = ""  # Default: public/pdf/visit-report-template.html of the repository
+    pdf_chartjs_path: str = "vendor/chart.umd.min.js"  # Served instead of the template's CDN Chart.js
+    # Batch report exports (see report_export.py)
+    report_export_dir: str = "exports"
+    report_export_concurrency: int = 2  # PDFs rendered at once per export job
+    report_export_ttl_hours: int = 24  # Finished exports are deleted after this long
+    # Daily visit rollup for dashboards (see visit_rollup.py)
+    visit_rollup_timezone: str = "UTC"  # Visits are counted on their visit_date day in this zone
 
     model_config = SettingsConfigDict(
         env_file=str(Path(__file__).resolve().parent.parent / ".env.conf"),
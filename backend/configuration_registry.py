@@ -0,0 +1,145 @@
+"""
+Process-local, versioned cache of the configurations table.
+Configuration rows change a few times a month but are read by every form on mount,
+so list_configurations is served from memory instead of querying PostgreSQL.
+
+Consistency across workers:
+- Mutating handlers call notify_change() inside their transaction, which issues
+  pg_notify('configurations_changed'); PostgreSQL delivers it on commit.
+- Every worker runs a listener thread (LISTEN configurations_changed) that bumps
+  the local version, so the next read reloads the table.
+- ETags are derived from the loaded content, not the local counter, so every
+  worker hands out the same ETag for the same data.
+"""
+import hashlib
+import json
+import logging
+import select
+import threading
+from typing import List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from db import engine
+from models import Configuration
+from schemas import ConfigurationResponse
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "configurations_changed"
+
+class ConfigurationRegistry:
+    """In-memory copy of all configuration rows, reloaded when the version changes."""
+
+    def __init__(self):
+        self._load_lock = threading.Lock()
+        self._version_lock = threading.Lock()
+        self.version = 1
+        self._loaded_version = 0
+        self._rows: List[ConfigurationResponse] = []
+        self._by_type = {}
+        self.digest = ""
+        self._stop = threading.Event()
+        self._listener: Optional[threading.Thread] = None
+
+    def invalidate(self):
+        """Bump the version so the next read reloads from the database."""
+        with self._version_lock:
+            self.version += 1
+
+    def notify_change(self, db: Session):
+        """Tell every worker (including this one) to reload once the current transaction commits."""
+        db.execute(text("SELECT pg_notify(:channel, '')"), {"channel": NOTIFY_CHANNEL})
+
+    def _ensure_loaded(self, db: Session):
+        if self._loaded_version == self.version:
+            return
+        with self._load_lock:
+            version = self.version
+            if self._loaded_version == version:
+                return  # Another thread reloaded while we waited for the lock
+            rows = db.query(Configuration).order_by(Configuration.display_order, Configuration.id).all()
+            loaded = [ConfigurationResponse.model_validate(row) for row in rows]
+            by_type = {}
+            for row in loaded:
+                by_type.setdefault(row.config_type, []).append(row)
+            content = json.dumps([row.model_dump(mode="json") for row in loaded], sort_keys=True)
+            self._rows, self._by_type = loaded, by_type
+            self.digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+            # If a change arrived during the load, version moved on and we reload next time
+            self._loaded_version = version
+            logger.info(f"Configuration registry loaded {len(loaded)} rows (version {version})")
+
+    def get_rows(self, db: Session) -> List[ConfigurationResponse]:
+        """All configuration rows ordered by display_order."""
+        self._ensure_loaded(db)
+        return self._rows
+
+    def list(
+        self,
+        db: Session,
+        config_type: Optional[str] = None,
+        is_active: Optional[bool] = None,
+        skip: int = 0,
+        limit: int = 100
+    ) -> Tuple[List[ConfigurationResponse], str]:
+        """
+        Filter the cached rows the same way list_configurations filters the table.
+        Returns the rows and an ETag for this exact result.
+        """
+        self._ensure_loaded(db)
+        rows = self._by_type.get(config_type, []) if config_type else self._rows
+        digest = self.digest
+        if is_active is not None:
+            rows = [row for row in rows if row.is_active == is_active]
+        rows = rows[skip:skip + limit]
+        query_key = f"{digest}|{config_type}|{is_active}|{skip}|{limit}"
+        etag = '"' + hashlib.sha256(query_key.encode("utf-8")).hexdigest()[:32] + '"'
+        return rows, etag
+
+    def start_listener(self):
+        """Start the background LISTEN thread (idempotent)."""
+        if self._listener and self._listener.is_alive():
+            return
+        self._stop.clear()
+        self._listener = threading.Thread(
+            target=self._listen, name="configuration-registry-listener", daemon=True
+        )
+        self._listener.start()
+
+    def stop_listener(self):
+        """Stop the background LISTEN thread."""
+        self._stop.set()
+        if self._listener:
+            self._listener.join(timeout=1)
+
+    def _listen(self):
+        while not self._stop.is_set():
+            dbapi_connection = None
+            try:
+                # Dedicated connection, detached so it never returns to the pool
+                pooled = engine.raw_connection()
+                pooled.detach()
+                dbapi_connection = pooled.dbapi_connection
+                dbapi_connection.autocommit = True
+                with dbapi_connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                # Changes may have happened while we were not listening
+                self.invalidate()
+                while not self._stop.is_set():
+                    if select.select([dbapi_connection], [], [], 5.0) == ([], [], []):
+                        continue
+                    dbapi_connection.poll()
+                    if dbapi_connection.notifies:
+                        dbapi_connection.notifies.clear()
+                        self.invalidate()
+            except Exception as e:
+                logger.warning(f"Configuration change listener error, retrying: {e}")
+                self._stop.wait(5.0)
+            finally:
+                if dbapi_connection is not None:
+                    try:
+                        dbapi_connection.close()
+                    except Exception:
+                        pass
+
+configuration_registry = ConfigurationRegistry()
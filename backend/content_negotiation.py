@@ -0,0 +1,202 @@
+"""
+MessagePack as an opt-in alternative to JSON, for field tablets on metered mobile links.
+- Accept: application/msgpack (preferred over application/json) turns any JSON response
+  into MessagePack; browsers, which send application/json or */*, keep getting JSON.
+- Content-Type: application/msgpack request bodies are decoded and handed to the routers
+  as JSON, so the same Pydantic schemas validate them.
+The transcoding happens at the ASGI level, so every router (and error response) supports
+it without changes, and cached responses stay JSON. Requires the msgpack package.
+Measure with: python msgpack_benchmark.py
+"""
+import json
+import logging
+from typing import Dict
+from starlette.datastructures import Headers, MutableHeaders
+
+logger = logging.getLogger(__name__)
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MAX_REQUEST_BYTES = 25 * 1024 * 1024
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+class InvalidRequestBody(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+def json_loads(data: bytes):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+def json_dumps(value) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+def parse_accept(value: str) -> Dict[str, float]:
+    """Accept header -> {media type: q}."""
+    accepted = {}
+    for part in value.split(","):
+        media_type, _, params = part.strip().partition(";")
+        media_type = media_type.strip().lower()
+        if not media_type:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, number = param.strip().partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(number)
+                except ValueError:
+                    q = 0.0
+        accepted[media_type] = max(q, accepted.get(media_type, 0.0))
+    return accepted
+
+def prefers_msgpack(accept: str) -> bool:
+    """True if the client lists MessagePack at least as high as JSON."""
+    accepted = parse_accept(accept)
+    msgpack_q = max((accepted.get(media_type, 0.0) for media_type in MSGPACK_TYPES), default=0.0)
+    json_q = accepted.get("application/json", accepted.get("*/*", 0.0))
+    return msgpack_q > 0 and msgpack_q >= json_q
+
+def is_msgpack(content_type: str) -> bool:
+    return content_type.split(";")[0].strip().lower() in MSGPACK_TYPES
+
+def is_json(content_type: str) -> bool:
+    return content_type.split(";")[0].strip().lower() == "application/json"
+
+def is_negotiated(message) -> bool:
+    """A JSON response (or a 304 revalidating one) could have been MessagePack for another Accept."""
+    return message["status"] == 304 or is_json(Headers(raw=message["headers"]).get("content-type", ""))
+
+def vary_on_accept(message):
+    headers = MutableHeaders(raw=list(message["headers"]))
+    headers.add_vary_header("Accept")
+    return {**message, "headers": headers.raw}
+
+def json_responder(send):
+    """Wrap send so JSON responses carry Vary: Accept like their MessagePack variants."""
+    async def send_with_vary(message):
+        if message["type"] == "http.response.start" and is_negotiated(message):
+            message = vary_on_accept(message)
+        await send(message)
+    return send_with_vary
+
+class MsgPackMiddleware:
+    """Pure ASGI middleware translating MessagePack request and response bodies."""
+
+    def __init__(self, app):
+        self.app = app
+        if msgpack is None:
+            logger.warning("msgpack is not installed, MessagePack content negotiation is disabled")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or msgpack is None:
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        if is_msgpack(headers.get("content-type", "")):
+            try:
+                scope, receive = await self._decode_request(scope, receive)
+            except InvalidRequestBody as e:
+                await self._error(send, e.status_code, e.detail)
+                return
+        # Both variants say Vary: Accept, so HTTP caches keep JSON and MessagePack apart
+        if prefers_msgpack(headers.get("accept", "")):
+            send = MsgPackResponder(send).send
+        else:
+            send = json_responder(send)
+        await self.app(scope, receive, send)
+
+    async def _decode_request(self, scope, receive):
+        """Read the whole MessagePack body and replay it as JSON."""
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > MAX_REQUEST_BYTES:
+                raise InvalidRequestBody(413, "Request body too large")
+            chunks.append(chunk)
+            if not message.get("more_body", False):
+                break
+        try:
+            body = json_dumps(msgpack.unpackb(b"".join(chunks), raw=False, strict_map_key=False))
+        except Exception:
+            # Malformed data, or values JSON cannot carry (binary, non-string map keys)
+            raise InvalidRequestBody(400, "Invalid MessagePack body")
+
+        headers = MutableHeaders(raw=[
+            (key, value) for key, value in scope["headers"] if key not in (b"content-type", b"content-length")
+        ])
+        headers["content-type"] = "application/json"
+        headers["content-length"] = str(len(body))
+        scope = {**scope, "headers": headers.raw}
+        sent = False
+
+        async def replay():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        return scope, replay
+
+    async def _error(self, send, status_code: int, detail: str):
+        body = json.dumps({"detail": detail}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+class MsgPackResponder:
+    """Buffers a JSON response and re-encodes it as MessagePack; other responses pass through."""
+
+    def __init__(self, send):
+        self.downstream = send
+        self.start_message = None
+        self.chunks = None
+
+    async def send(self, message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            content_type = Headers(raw=message["headers"]).get("content-type", "")
+            if is_json(content_type):
+                self.start_message = message
+                self.chunks = []
+                return
+            await self.downstream(vary_on_accept(message) if is_negotiated(message) else message)
+            return
+        if self.chunks is None or message_type != "http.response.body":
+            await self.downstream(message)
+            return
+
+        self.chunks.append(message.get("body", b""))
+        if message.get("more_body", False):
+            return
+        body = b"".join(self.chunks)
+        headers = MutableHeaders(raw=list(self.start_message["headers"]))
+        headers.add_vary_header("Accept")
+        if body:
+            body = msgpack.packb(json_loads(body), use_bin_type=True)
+            headers["content-type"] = MSGPACK_MEDIA_TYPE
+            headers["content-length"] = str(len(body))
+        self.start_message["headers"] = headers.raw
+        await self.downstream(self.start_message)
+        await self.downstream({"type": "http.response.body", "body": body, "more_body": False})
@@ -0,0 +1,59 @@
+"""
+Sparse fieldsets: ?fields=id,visit_status,visit_date on list and detail endpoints.
+The requested names are validated against the endpoint's full response schema; only those
+columns are loaded (SQLAlchemy load_only) and only those keys are serialized, using a
+response model derived from the full one.
+"""
+from functools import lru_cache
+from typing import Optional, Tuple, Type
+from fastapi import HTTPException
+from pydantic import BaseModel, ConfigDict, create_model
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only
+from schemas import SignatureReference
+
+def parse_fields(fields: Optional[str], schema: Type[BaseModel]) -> Optional[Tuple[str, ...]]:
+    """
+    Validate a comma-separated field list against schema. Returns None when no fields were
+    requested (the endpoint's default shape applies); "id" is always included.
+    """
+    if fields is None:
+        return None
+    names = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = sorted(names - set(schema.model_fields))
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(schema.model_fields)}"
+        )
+    names.add("id")
+    # Ordered as in the schema, so equal field sets share one derived model
+    return tuple(name for name in schema.model_fields if name in names)
+
+@lru_cache(maxsize=256)
+def partial_schema(schema: Type[BaseModel], names: Tuple[str, ...]) -> Type[BaseModel]:
+    """Response model with just the given fields of schema (same types and defaults)."""
+    base = None
+    if issubclass(schema, SignatureReference) and "signature" in names:
+        # Keeps the validator that turns signature_id into a /api/signatures/{id} URL
+        base = SignatureReference
+    definitions = {
+        name: (schema.model_fields[name].annotation, schema.model_fields[name])
+        for name in names
+        if base is None or name not in base.model_fields
+    }
+    if base is not None:
+        return create_model(f"{schema.__name__}Fields", __base__=base, **definitions)
+    return create_model(
+        f"{schema.__name__}Fields",
+        __config__=ConfigDict(from_attributes=True),
+        **definitions
+    )
+
+def load_columns(model, schema: Type[BaseModel], names: Tuple[str, ...]):
+    """
+    load_only() option for the columns behind the requested fields of schema. Fields that
+    are not columns (e.g. User.avatar_url, which comes from a join) are skipped here.
+    """
+    columns = inspect(model).columns.keys()
+    return load_only(*[getattr(model, name) for name in partial_schema(schema, names).model_fields if name in columns])
@@ -0,0 +1,153 @@
+"""
+Reference counting, garbage collection and dedup savings for stored files.
+Uploads are referenced by URL (/api/files/{id}) from visit photos, configuration values
+(company logo) and profile avatars. A GC run recounts those references into
+stored_files.ref_count and deletes files that are unreferenced and were last uploaded
+more than FILE_GC_GRACE_HOURS ago (a photo is uploaded before its visit is saved).
+Can be run as a standalone script (e.g. from cron) or triggered from the admin router.
+"""
+import logging
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import text, bindparam
+from config import settings
+from db import engine
+from file_storage import blob_path
+
+logger = logging.getLogger(__name__)
+
+FILE_ID_PATTERN = r"/api/files/([0-9a-fA-F-]{36})"
+
+# (table, column) pairs that can hold file URLs
+FILE_REFERENCE_COLUMNS = [
+    ("shop_visits", "visit_photos"),
+    ("configurations", "config_name"),
+    ("user_profiles", "avatar_url"),
+]
+
+def count_references(conn) -> Counter:
+    """File id -> number of references across FILE_REFERENCE_COLUMNS."""
+    counts = Counter()
+    for table_name, column_name in FILE_REFERENCE_COLUMNS:
+        result = conn.execute(text(f"""
+            SELECT lower((regexp_matches({column_name}::text, :pattern, 'g'))[1]) AS file_id
+            FROM {table_name}
+            WHERE {column_name}::text LIKE '%/api/files/%'
+        """), {"pattern": FILE_ID_PATTERN})
+        counts.update(row.file_id for row in result)
+    return counts
+
+def update_ref_counts(conn, counts: Counter):
+    """Store the current reference counts on the uploaded (non-variant) rows."""
+    now = datetime.now(timezone.utc)
+    conn.execute(text("""
+        UPDATE stored_files SET ref_count = 0, refs_counted_at = :now
+        WHERE source_id IS NULL
+    """), {"now": now})
+    if counts:
+        conn.execute(
+            text("UPDATE stored_files SET ref_count = :count WHERE id = :file_id AND source_id IS NULL"),
+            [{"file_id": file_id, "count": count} for file_id, count in counts.items()]
+        )
+
+def collect_garbage(grace_hours: Optional[int] = None, dry_run: bool = False) -> dict:
+    """
+    Recount references and delete orphaned files (rows and blobs, variants included).
+    Rows are deleted and committed first; blobs are unlinked afterwards, so a crash can
+    at worst leave an unreachable blob on disk, never a row pointing at a missing blob.
+    """
+    grace_hours = grace_hours if grace_hours is not None else settings.file_gc_grace_hours
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=grace_hours)
+
+    with engine.connect() as conn:
+        counts = count_references(conn)
+        update_ref_counts(conn, counts)
+        orphans = conn.execute(text("""
+            SELECT f.id, f.storage_path, f.size,
+                   coalesce(array_agg(v.storage_path) FILTER (WHERE v.id IS NOT NULL), '{}') AS variant_paths,
+                   coalesce(sum(v.size), 0) AS variant_bytes
+            FROM stored_files f
+            LEFT JOIN stored_files v ON v.source_id = f.id
+            WHERE f.source_id IS NULL
+              AND f.ref_count = 0
+              AND coalesce(f.last_uploaded_at, f.created_at) < :cutoff
+            GROUP BY f.id
+        """), {"cutoff": cutoff}).fetchall()
+
+        orphan_ids = [row.id for row in orphans]
+        reclaimed = sum((row.size or 0) + (row.variant_bytes or 0) for row in orphans)
+        if dry_run or not orphan_ids:
+            conn.commit()  # Keep the refreshed reference counts
+        else:
+            delete_ids = {"ids": orphan_ids}
+            conn.execute(text("DELETE FROM stored_files WHERE source_id IN :ids").bindparams(bindparam("ids", expanding=True)), delete_ids)
+            conn.execute(text("DELETE FROM stored_files WHERE id IN :ids").bindparams(bindparam("ids", expanding=True)), delete_ids)
+            conn.commit()
+            for row in orphans:
+                for relative_path in [row.storage_path, *row.variant_paths]:
+                    try:
+                        blob_path(relative_path).unlink(missing_ok=True)
+                    except OSError as e:
+                        logger.warning(f"Could not delete {relative_path}: {e}")
+
+    action = "Would delete" if dry_run else "Deleted"
+    logger.info(f"✓ {action} {len(orphan_ids)} orphaned files ({reclaimed / (1024 * 1024):.1f} MB), "
+                f"{len(counts)} files referenced")
+    return {
+        "referenced_files": len(counts),
+        "orphaned_files": len(orphan_ids),
+        "reclaimed_bytes": reclaimed,
+        "dry_run": dry_run,
+        "cutoff": cutoff.isoformat(),
+    }
+
+def storage_report() -> dict:
+    """Stored bytes, duplicate uploads avoided by content-hash dedup and bytes that saved."""
+    with engine.connect() as conn:
+        row = conn.execute(text("""
+            WITH families AS (
+                SELECT f.id, f.upload_count, f.ref_count,
+                       f.size + coalesce(sum(v.size), 0) AS family_bytes,
+                       f.upload_size
+                FROM stored_files f
+                LEFT JOIN stored_files v ON v.source_id = f.id
+                WHERE f.source_id IS NULL
+                GROUP BY f.id
+            )
+            SELECT count(*) AS unique_files,
+                   coalesce(sum(coalesce(upload_count, 1)), 0) AS total_uploads,
+                   coalesce(sum(family_bytes), 0) AS stored_bytes,
+                   coalesce(sum((coalesce(upload_count, 1) - 1) * family_bytes), 0) AS saved_bytes,
+                   coalesce(sum((coalesce(upload_count, 1) - 1) * coalesce(upload_size, 0)), 0) AS duplicate_upload_bytes,
+                   count(*) FILTER (WHERE ref_count = 0) AS unreferenced_files,
+                   coalesce(sum(family_bytes) FILTER (WHERE ref_count = 0), 0) AS unreferenced_bytes
+            FROM families
+        """)).mappings().one()
+    report = {key: int(value) for key, value in row.items()}
+    report["duplicate_uploads"] = report["total_uploads"] - report["unique_files"]
+    stored_plus_saved = report["stored_bytes"] + report["saved_bytes"]
+    report["saved_percent"] = round(report["saved_bytes"] / stored_plus_saved * 100, 1) if stored_plus_saved else 0.0
+    return report
+
+def main():
+    """Main function for standalone script execution."""
+    import argparse
+    import json
+    import sys
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    parser = argparse.ArgumentParser(description="Garbage-collect unreferenced uploads and report dedup savings")
+    parser.add_argument("--grace-hours", type=int, default=settings.file_gc_grace_hours)
+    parser.add_argument("--dry-run", action="store_true", help="Only recount references and report what would be deleted")
+    parser.add_argument("--report", action="store_true", help="Print the storage/dedup report and exit")
+    args = parser.parse_args()
+    if not args.report:
+        collect_garbage(args.grace_hours, args.dry_run)
+    print(json.dumps(storage_report(), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Disk storage for uploaded files.
+The file part of a multipart upload is parsed straight off the request stream into a
+temporary file inside the upload directory, hashed (SHA-256) on the fly, and atomically
+renamed into place. The body is written to disk once (Starlette's form parsing would
+spool it to its own temporary file first) and worker memory stays flat regardless of
+file size.
+"""
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import NamedTuple, Optional, Tuple
+from fastapi import HTTPException, Request
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+from config import settings
+
+UPLOAD_DIR = Path(settings.upload_dir)
+TMP_DIR = UPLOAD_DIR / "tmp"  # Same filesystem as the blobs, so os.replace is atomic
+CHUNK_SIZE = 1024 * 1024
+# Responses need a login, so only the user's own browser may cache them. Content under an id
+# only changes when repair_upload re-points a row whose blob went missing; a day bounds that.
+MEDIA_CACHE_CONTROL = "private, max-age=86400, immutable"
+
+UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+TMP_DIR.mkdir(parents=True, exist_ok=True)
+
+class StreamedUpload(NamedTuple):
+    sha256: str
+    size: int
+    tmp_path: Path
+    filename: Optional[str] = None
+    content_type: Optional[str] = None
+
+def upload_too_large() -> HTTPException:
+    limit_mb = settings.upload_max_bytes / (1024 * 1024)
+    return HTTPException(status_code=413, detail=f"File too large. Maximum upload size is {limit_mb:.0f} MB")
+
+def _decode(value: bytes) -> str:
+    try:
+        return value.decode("utf-8")
+    except UnicodeDecodeError:
+        return value.decode("latin-1")
+
+class FilePartCollector:
+    """python-multipart callbacks that keep the data of one file field and skip every other part."""
+
+    def __init__(self, field_name: str):
+        self.field_name = field_name
+        self.filename: Optional[str] = None
+        self.content_type: Optional[str] = None
+        self.found = False
+        self.pending = []  # Data of the file part not yet written to disk
+        self._in_file = False
+        self._headers = {}
+        self._header_name = b""
+        self._header_value = b""
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self):
+        self._headers = {}
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        self._headers[self._header_name.lower()] = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._in_file = (
+            not self.found
+            and b"filename" in options
+            and _decode(options.get(b"name", b"")) == self.field_name
+        )
+        if self._in_file:
+            self.found = True
+            self.filename = _decode(options[b"filename"])
+            self.content_type = _decode(self._headers.get(b"content-type", b"")) or None
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self._in_file:
+            self.pending.append(data[start:end])
+
+    def on_part_end(self):
+        self._in_file = False
+
+async def stream_upload(request: Request, field_name: str = "file", max_bytes: int = None) -> StreamedUpload:
+    """
+    Write the file field of a multipart/form-data request to a temporary file in CHUNK_SIZE
+    pieces as the body arrives, hashing as it goes; other fields are skipped.
+    Raises 413 as soon as the file exceeds max_bytes and 400 for a body without that file.
+    """
+    max_bytes = max_bytes or settings.upload_max_bytes
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not params.get(b"boundary"):
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+    collector = FilePartCollector(field_name)
+    parser = MultipartParser(params[b"boundary"], collector.callbacks())
+    hasher = hashlib.sha256()
+    size = 0
+    buffer = bytearray()
+    fd, tmp_name = tempfile.mkstemp(dir=TMP_DIR, prefix="upload-")
+    tmp_path = Path(tmp_name)
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            async for chunk in request.stream():
+                try:
+                    parser.write(chunk)
+                except MultipartParseError:
+                    raise HTTPException(status_code=400, detail="Malformed multipart upload")
+                for data in collector.pending:
+                    size += len(data)
+                    if size > max_bytes:
+                        raise upload_too_large()
+                    hasher.update(data)
+                    buffer += data
+                collector.pending.clear()
+                if len(buffer) >= CHUNK_SIZE:
+                    await run_in_threadpool(tmp.write, buffer)
+                    buffer = bytearray()
+            parser.finalize()
+            if not collector.found:
+                raise HTTPException(status_code=400, detail=f"No file in the '{field_name}' field")
+            await run_in_threadpool(tmp.write, buffer)
+            await run_in_threadpool(tmp.flush)
+            await run_in_threadpool(os.fsync, tmp.fileno())
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return StreamedUpload(hasher.hexdigest(), size, tmp_path, collector.filename, collector.content_type)
+
+def blob_path(relative_path: str) -> Path:
+    """Absolute location of a stored file."""
+    return UPLOAD_DIR / relative_path
+
+def commit_temp(streamed: StreamedUpload, relative_path: str) -> Path:
+    """Atomically move a streamed temp file to its final location."""
+    destination = blob_path(relative_path)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(streamed.tmp_path, destination)
+    return destination
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single "bytes=start-end" Range header into an inclusive (start, end) pair.
+    Returns None when the header is absent, malformed or asks for several ranges (the whole
+    file is served then); raises ValueError when the range cannot be satisfied.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_text, _, end_text = header[len("bytes="):].strip().partition("-")
+    if not (start_text or end_text) or not all(t.isdigit() for t in (start_text, end_text) if t):
+        return None
+    if not start_text:
+        # Suffix range: the last N bytes
+        length = int(end_text)
+        if length == 0 or size == 0:
+            raise ValueError("range not satisfiable")
+        return max(size - length, 0), size - 1
+    start = int(start_text)
+    end = int(end_text) if end_text else size - 1
+    if end_text and end < start:
+        return None
+    if start >= size:
+        raise ValueError("range not satisfiable")
+    return start, min(end, size - 1)
+
+class StoredFileResponse(Response):
+    """
+    Send a whole file or one byte range of it.
+    Uses the ASGI zero-copy send extension (sendfile) when the server offers it and falls
+    back to reading CHUNK_SIZE pieces in a worker thread otherwise.
+    """
+
+    def __init__(self, path: Path, media_type: str, headers: dict, byte_range: Optional[Tuple[int, int]] = None, send_body: bool = True):
+        size = path.stat().st_size
+        self.path = path
+        self.send_body = send_body
+        if byte_range is None:
+            self.start, self.length = 0, size
+            status_code = 200
+        else:
+            self.start, self.length = byte_range[0], byte_range[1] - byte_range[0] + 1
+            status_code = 206
+        super().__init__(status_code=status_code, media_type=media_type, headers=headers)
+        self.headers["content-length"] = str(self.length)
+        self.headers["accept-ranges"] = "bytes"
+        if byte_range is not None:
+            self.headers["content-range"] = f"bytes {byte_range[0]}-{byte_range[1]}/{size}"
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if not self.send_body or self.length == 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+        with open(self.path, "rb") as f:
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({"type": "http.response.zerocopysend", "file": f.fileno(), "offset": self.start, "count": self.length})
+                return
+            await run_in_threadpool(f.seek, self.start)
+            remaining = self.length
+            while remaining > 0:
+                chunk = await run_in_threadpool(f.read, min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
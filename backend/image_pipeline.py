@@ -0,0 +1,201 @@
+"""
+Upload-time processing of visit photos.
+Phone photos (4-12 MB) are decoded once in a worker process, rotated according to their
+EXIF orientation, stripped of all metadata (including GPS), re-encoded at a capped
+resolution and downscaled into medium and thumbnail variants.
+Work runs in a ProcessPoolExecutor so decoding never blocks the event loop, and a bounded
+queue makes bursts of uploads wait for a slot instead of piling up unbounded work.
+Run `python image_pipeline.py [photos...]` for throughput numbers (images/sec per core).
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Longest edge in pixels for each variant; "full" replaces the original upload
+IMAGE_VARIANTS = {
+    "full": settings.image_max_edge,
+    "medium": 1024,
+    "thumb": 256,
+}
+
+PROCESSABLE_TYPES = {"image/jpeg", "image/jpg", "image/png", "image/webp", "image/tiff", "image/bmp"}
+
+def is_processable(content_type: Optional[str]) -> bool:
+    return (content_type or "").lower() in PROCESSABLE_TYPES
+
+def process_image(source_path: str, upload_dir: str, stem: str, variants: Dict[str, int], quality: int) -> List[dict]:
+    """
+    Produce every variant of one image. Runs inside a worker process.
+    Each variant is written to <upload_dir>/<stem>-<variant>.<ext> and described by
+    {variant, storage_path, content_type, size, width, height, sha256}.
+    """
+    from PIL import Image, ImageOps
+
+    results = []
+    with Image.open(source_path) as image:
+        largest = max(variants.values())
+        if image.format == "JPEG":
+            # Let libjpeg decode at a reduced scale when the photo is far above the largest variant
+            image.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        image = image.convert("RGBA" if has_alpha else "RGB")
+        fmt, ext, content_type = ("PNG", "png", "image/png") if has_alpha else ("JPEG", "jpg", "image/jpeg")
+
+        # Largest first, each smaller variant is resized from the previous one
+        for variant, edge in sorted(variants.items(), key=lambda item: -item[1]):
+            if image.width > edge or image.height > edge:
+                image = image.copy()
+                image.thumbnail((edge, edge), Image.LANCZOS)
+            relative_path = f"{stem}-{variant}.{ext}"
+            destination = Path(upload_dir) / relative_path
+            tmp_path = destination.with_name(destination.name + ".tmp")
+            save_options = {"optimize": True}
+            if fmt == "JPEG":
+                save_options.update(quality=quality, progressive=True)
+            # No exif= argument, so no metadata survives the re-encode
+            image.save(tmp_path, format=fmt, **save_options)
+            with open(tmp_path, "rb") as f:
+                sha256 = hashlib.sha256(f.read()).hexdigest()
+            os.replace(tmp_path, destination)
+            results.append({
+                "variant": variant,
+                "storage_path": relative_path,
+                "content_type": content_type,
+                "size": destination.stat().st_size,
+                "width": image.width,
+                "height": image.height,
+                "sha256": sha256,
+            })
+    return results
+
+class ImagePipeline:
+    """Process pool plus a bounded queue of pending image jobs, with throughput counters."""
+
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                logger.info(f"Started image pipeline with {self.workers} worker processes")
+            return self._executor
+
+    async def process(self, source_path: Path, stem: str) -> List[dict]:
+        """Queue one image and wait for its variants; raises if it could not be processed."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.queue_size)
+        self.pending += 1
+        queued_at = time.perf_counter()
+        try:
+            async with self._slots:
+                started = time.perf_counter()
+                self.wait_seconds += started - queued_at
+                loop = asyncio.get_running_loop()
+                try:
+                    results = await loop.run_in_executor(
+                        self._get_executor(), process_image,
+                        str(source_path), settings.upload_dir, stem, IMAGE_VARIANTS, settings.image_jpeg_quality
+                    )
+                except Exception:
+                    self.failed += 1
+                    raise
+                self.processed += 1
+                self.busy_seconds += time.perf_counter() - started
+                return results
+        finally:
+            self.pending -= 1
+
+    def metrics(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "pending": self.pending,
+            "processed": self.processed,
+            "failed": self.failed,
+            "avg_process_ms": round(self.busy_seconds / self.processed * 1000, 1) if self.processed else None,
+            "avg_wait_ms": round(self.wait_seconds / self.processed * 1000, 1) if self.processed else None,
+        }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+image_pipeline = ImagePipeline(settings.image_workers, settings.image_queue_size)
+
+def make_sample_photo(path: Path, size=(4032, 3024)):
+    """Write a noisy 12 MP JPEG, roughly what a phone camera produces."""
+    from PIL import Image
+    image = Image.effect_noise(size, 64).convert("RGB")
+    image.save(path, format="JPEG", quality=92)
+
+def main():
+    """Measure pipeline throughput on the given photos (or generated 12 MP samples)."""
+    import argparse
+    import sys
+    import tempfile
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    parser = argparse.ArgumentParser(description="Image pipeline throughput benchmark")
+    parser.add_argument("photos", nargs="*", help="JPEG/PNG files to process (default: generated samples)")
+    parser.add_argument("--samples", type=int, default=16, help="Number of generated photos when none are given")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        photos = [Path(p) for p in args.photos]
+        if not photos:
+            logger.info(f"Generating {args.samples} sample 12 MP photos...")
+            photos = [Path(work_dir) / f"sample-{i}.jpg" for i in range(args.samples)]
+            for photo in photos:
+                make_sample_photo(photo)
+        input_mb = sum(p.stat().st_size for p in photos) / (1024 * 1024)
+
+        def run(workers: int) -> float:
+            start = time.perf_counter()
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                jobs = [
+                    pool.submit(process_image, str(photo), work_dir, f"out-{workers}-{i}", IMAGE_VARIANTS, settings.image_jpeg_quality)
+                    for i, photo in enumerate(photos)
+                ]
+                outputs = [job.result() for job in jobs]
+            elapsed = time.perf_counter() - start
+            output_mb = sum(v["size"] for result in outputs for v in result) / (1024 * 1024)
+            rate = len(photos) / elapsed
+            logger.info(
+                f"{workers:>2} worker(s): {rate:6.2f} images/sec, {rate / workers:5.2f} images/sec per core "
+                f"({input_mb:.1f} MB in -> {output_mb:.1f} MB out)"
+            )
+            return rate
+
+        single = run(1)
+        if args.workers > 1:
+            parallel = run(args.workers)
+            logger.info(f"Scaling: {parallel / single:.2f}x with {args.workers} workers")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+"""
+Index usage advisor.
+Reads PostgreSQL statistics (pg_stat_user_indexes, pg_stat_user_tables and, when the
+extension is installed, pg_stat_statements) to report unused and duplicate indexes,
+tables that are mostly read by sequential scans, and the most expensive queries.
+Also suggests composite/partial indexes that match the filter combinations used by
+the list endpoints in routers/shop_visits.py and routers/audit_logs.py.
+Can be run as a standalone script or called from the admin router.
+"""
+import logging
+from sqlalchemy import text
+from db import engine
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Tables owned by this application - statistics for other tables are ignored
+APP_TABLES = ["users", "user_profiles", "customers", "shop_visits", "configurations", "audit_logs"]
+
+# Indexes that mirror the real filter + ORDER BY combinations of the list endpoints.
+# list_shop_visits: customer_id / is_draft / visit_status, ordered by created_at DESC
+# list_audit_logs: actor_user_id / target_user_id, ordered by created_at DESC
+SUGGESTED_INDEXES = [
+    {
+        "table": "shop_visits",
+        "name": "idx_shop_visits_customer_created_at",
+        "columns": ["customer_id", "created_at DESC"],
+        "where": None,
+        "reason": "list_shop_visits?customer_id=... ordered by created_at DESC",
+        "supersedes": ["idx_shop_visits_customer_id"],
+    },
+    {
+        "table": "shop_visits",
+        "name": "idx_shop_visits_drafts_created_at",
+        "columns": ["created_at DESC"],
+        "where": "is_draft = true",
+        "reason": "list_shop_visits?is_draft=true - drafts are a small fraction of visits",
+        "supersedes": ["idx_shop_visits_is_draft", "idx_shop_visits_draft_created_at"],
+    },
+    {
+        "table": "shop_visits",
+        "name": "idx_shop_visits_followups_created_at",
+        "columns": ["created_at DESC"],
+        "where": "follow_up_required = true",
+        "reason": "follow-up views only read visits with follow_up_required = true",
+        "supersedes": ["idx_shop_visits_follow_up_required", "idx_shop_visits_followup_created_at"],
+    },
+    {
+        "table": "audit_logs",
+        "name": "idx_audit_logs_actor_created_at",
+        "columns": ["actor_user_id", "created_at DESC", "id DESC"],
+        "where": None,
+        "reason": "list_audit_logs?actor_user_id=... ordered by created_at DESC",
+        "supersedes": ["idx_audit_logs_actor_user_id"],
+    },
+    {
+        "table": "audit_logs",
+        "name": "idx_audit_logs_target_created_at",
+        "columns": ["target_user_id", "created_at DESC", "id DESC"],
+        "where": None,
+        "reason": "list_audit_logs?target_user_id=... ordered by created_at DESC",
+        "supersedes": [],
+    },
+]
+
+def stat_statements_available(conn) -> bool:
+    """Check if the pg_stat_statements extension is installed in this database."""
+    result = conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_stat_statements')"
+    ))
+    return bool(result.scalar())
+
+def get_index_stats(conn):
+    """Return usage statistics and column lists for every index on the application tables."""
+    result = conn.execute(text("""
+        SELECT
+            s.relname AS table_name,
+            s.indexrelname AS index_name,
+            s.idx_scan AS scans,
+            s.idx_tup_read AS tuples_read,
+            pg_relation_size(s.indexrelid) AS size_bytes,
+            i.indisunique AS is_unique,
+            i.indisprimary AS is_primary,
+            i.indkey::text AS column_numbers,
+            pg_get_expr(i.indpred, i.indrelid) AS predicate,
+            i.indexprs IS NOT NULL AS has_expressions,
+            pg_get_indexdef(s.indexrelid) AS definition
+        FROM pg_stat_user_indexes s
+        JOIN pg_index i ON i.indexrelid = s.indexrelid
+        WHERE s.relname = ANY(:tables)
+        ORDER BY s.relname, s.indexrelname
+    """), {"tables": APP_TABLES})
+    return [dict(row._mapping) for row in result]
+
+def find_unused_indexes(index_stats):
+    """Indexes never chosen by the planner since the statistics were last reset."""
+    unused = []
+    for idx in index_stats:
+        if idx["is_primary"] or idx["is_unique"]:
+            continue  # Constraint-backing indexes are needed even without scans
+        if idx["scans"] == 0:
+            unused.append({
+                "table": idx["table_name"],
+                "index": idx["index_name"],
+                "size_bytes": idx["size_bytes"],
+                "definition": idx["definition"],
+            })
+    return sorted(unused, key=lambda i: i["size_bytes"], reverse=True)
+
+def find_duplicate_indexes(index_stats):
+    """
+    Indexes that are identical to, or a leading-column prefix of, another index
+    on the same table with the same predicate. The shorter index is redundant.
+    """
+    duplicates = []
+    by_table = {}
+    for idx in index_stats:
+        if idx["has_expressions"]:
+            continue
+        by_table.setdefault(idx["table_name"], []).append(idx)
+
+    for table_name, indexes in by_table.items():
+        for idx in indexes:
+            if idx["is_primary"] or idx["is_unique"]:
+                continue
+            columns = idx["column_numbers"].split()
+            for other in indexes:
+                if other["index_name"] == idx["index_name"] or other["predicate"] != idx["predicate"]:
+                    continue
+                other_columns = other["column_numbers"].split()
+                if other_columns[:len(columns)] != columns:
+                    continue
+                # Exact duplicates: only report one of the pair
+                if len(other_columns) == len(columns) and other["index_name"] < idx["index_name"]:
+                    continue
+                duplicates.append({
+                    "table": table_name,
+                    "index": idx["index_name"],
+                    "covered_by": other["index_name"],
+                    "size_bytes": idx["size_bytes"],
+                    "definition": idx["definition"],
+                })
+                break
+    return duplicates
+
+def get_table_scan_stats(conn):
+    """Sequential vs index scan counts for each application table."""
+    result = conn.execute(text("""
+        SELECT
+            relname AS table_name,
+            seq_scan,
+            seq_tup_read,
+            COALESCE(idx_scan, 0) AS idx_scan,
+            n_live_tup AS live_rows,
+            n_tup_ins + n_tup_upd + n_tup_del AS writes
+        FROM pg_stat_user_tables
+        WHERE relname = ANY(:tables)
+        ORDER BY seq_tup_read DESC
+    """), {"tables": APP_TABLES})
+    return [dict(row._mapping) for row in result]
+
+def get_top_queries(conn, limit: int = 20):
+    """
+    Most expensive statements by total execution time that touch the application tables.
+    Requires pg_stat_statements; column names differ between PostgreSQL 12 and 13+.
+    """
+    table_filter = " OR ".join(f"query ILIKE '%{table}%'" for table in APP_TABLES)
+    for time_column in ("total_exec_time", "total_time"):
+        mean_column = time_column.replace("total", "mean")
+        try:
+            with conn.begin_nested():
+                result = conn.execute(text(f"""
+                    SELECT
+                        query,
+                        calls,
+                        {time_column} AS total_ms,
+                        {mean_column} AS mean_ms,
+                        rows,
+                        shared_blks_hit,
+                        shared_blks_read
+                    FROM pg_stat_statements
+                    WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+                    AND ({table_filter})
+                    ORDER BY {time_column} DESC
+                    LIMIT :limit
+                """), {"limit": limit})
+                return [dict(row._mapping) for row in result]
+        except Exception as e:
+            logger.debug(f"pg_stat_statements query with '{time_column}' failed: {e}")
+    return []
+
+def build_suggestions(index_stats, table_scans):
+    """Compare the suggested indexes with what exists and explain what each one replaces."""
+    existing = {idx["index_name"]: idx for idx in index_stats}
+    seq_scans = {t["table_name"]: t for t in table_scans}
+    suggestions = []
+    for suggestion in SUGGESTED_INDEXES:
+        columns_sql = ", ".join(suggestion["columns"])
+        definition = f'CREATE INDEX "{suggestion["name"]}" ON "{suggestion["table"]}" ({columns_sql})'
+        if suggestion["where"]:
+            definition += f" WHERE {suggestion['where']}"
+        table_stats = seq_scans.get(suggestion["table"], {})
+        suggestions.append({
+            "table": suggestion["table"],
+            "index": suggestion["name"],
+            "definition": definition,
+            "reason": suggestion["reason"],
+            "exists": suggestion["name"] in existing,
+            "table_seq_scans": table_stats.get("seq_scan"),
+            # Existing indexes made redundant once this one is in place
+            "can_drop": [
+                {"index": name, "scans": existing[name]["scans"], "size_bytes": existing[name]["size_bytes"]}
+                for name in suggestion["supersedes"] if name in existing
+            ],
+        })
+    return suggestions
+
+def build_report(top: int = 20) -> dict:
+    """
+    Build the full advisor report.
+    Returns a dict that the admin endpoint returns as-is and the CLI prints.
+    """
+    with engine.connect() as conn:
+        index_stats = get_index_stats(conn)
+        table_scans = get_table_scan_stats(conn)
+        has_statements = stat_statements_available(conn)
+        top_queries = get_top_queries(conn, top) if has_statements else []
+        stats_reset = conn.execute(text(
+            "SELECT stats_reset FROM pg_stat_database WHERE datname = current_database()"
+        )).scalar()
+
+    return {
+        "stats_reset": stats_reset.isoformat() if stats_reset else None,
+        "pg_stat_statements": has_statements,
+        "unused_indexes": find_unused_indexes(index_stats),
+        "duplicate_indexes": find_duplicate_indexes(index_stats),
+        "table_scans": table_scans,
+        "top_queries": top_queries,
+        "suggestions": build_suggestions(index_stats, table_scans),
+    }
+
+def apply_suggestions() -> int:
+    """Create every suggested index that does not exist yet. Returns the number created."""
+    from add_performance_indexes import create_index_if_not_exists
+    created = 0
+    with engine.connect() as conn:
+        for suggestion in SUGGESTED_INDEXES:
+            created += create_index_if_not_exists(
+                conn, suggestion["table"], suggestion["name"],
+                suggestion["columns"], where=suggestion["where"]
+            )
+    return created
+
+def print_report(report: dict):
+    """Print the advisor report in a human readable form."""
+    def mb(size_bytes):
+        return f"{(size_bytes or 0) / (1024 * 1024):.2f} MB"
+
+    print("=" * 60)
+    print("Index Usage Advisor")
+    print("=" * 60)
+    print(f"Statistics collected since: {report['stats_reset'] or 'unknown'}")
+
+    print("\n🗑️  Unused indexes (0 scans):")
+    for idx in report["unused_indexes"] or []:
+        print(f"  - {idx['table']}.{idx['index']} ({mb(idx['size_bytes'])})")
+    if not report["unused_indexes"]:
+        print("  none")
+
+    print("\n♊ Duplicate / prefix-redundant indexes:")
+    for idx in report["duplicate_indexes"]:
+        print(f"  - {idx['table']}.{idx['index']} is covered by {idx['covered_by']} ({mb(idx['size_bytes'])})")
+    if not report["duplicate_indexes"]:
+        print("  none")
+
+    print("\n📊 Table scans:")
+    for table in report["table_scans"]:
+        print(f"  - {table['table_name']}: {table['seq_scan']} seq scans "
+              f"({table['seq_tup_read']} rows read), {table['idx_scan']} index scans, "
+              f"{table['live_rows']} live rows")
+
+    print("\n⏱️  Top queries by total time:")
+    if not report["pg_stat_statements"]:
+        print("  pg_stat_statements is not installed "
+              "(add it to shared_preload_libraries and run CREATE EXTENSION pg_stat_statements)")
+    for query in report["top_queries"]:
+        statement = " ".join(query["query"].split())[:120]
+        print(f"  - {query['total_ms']:.0f} ms total, {query['calls']} calls, "
+              f"{query['mean_ms']:.2f} ms avg: {statement}")
+
+    print("\n💡 Suggested indexes:")
+    for suggestion in report["suggestions"]:
+        status = "✓ exists" if suggestion["exists"] else "✗ missing"
+        print(f"  [{status}] {suggestion['definition']}")
+        print(f"      {suggestion['reason']}")
+        for old in suggestion["can_drop"]:
+            print(f"      → makes {old['index']} redundant ({old['scans']} scans, {mb(old['size_bytes'])})")
+    print("=" * 60)
+
+def main():
+    """Main function for standalone script execution."""
+    import argparse
+    import json
+    import sys
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    parser = argparse.ArgumentParser(description="Report unused/duplicate indexes and suggest better ones")
+    parser.add_argument("--top", type=int, default=20, help="Number of top queries to show")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--apply", action="store_true", help="Create the suggested indexes that are missing")
+    args = parser.parse_args()
+
+    if args.apply:
+        created = apply_suggestions()
+        logger.info(f"✓ Created {created} suggested indexes")
+
+    report = build_report(args.top)
+    if args.json:
+        print(json.dumps(report, indent=2, default=str))
+    else:
+        print_report(report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Cached company logo serving.
+The logo is stored in the company_settings/company_logo configuration row, either as a
+data URL or as a reference to an uploaded file (/api/files/{id}).
+Decoding it (and downscaling it for favicons and PDF headers) happens once per
+configuration change instead of on every /favicon.ico request.
+"""
+import base64
+import hashlib
+import io
+import logging
+import re
+import threading
+from typing import NamedTuple, Optional
+from sqlalchemy.orm import Session
+from configuration_registry import configuration_registry
+from models import StoredFile
+from file_storage import blob_path
+
+logger = logging.getLogger(__name__)
+
+# Bounding boxes (width, height) for the downscaled variants; None keeps the original
+LOGO_VARIANTS = {
+    "original": None,
+    "favicon-32": (32, 32),
+    "favicon-64": (64, 64),
+    "pdf": (400, 120),
+}
+
+FILE_URL_PATTERN = re.compile(r"/api/files/([0-9a-fA-F-]{36})")
+
+class LogoImage(NamedTuple):
+    content: bytes
+    media_type: str
+    etag: str
+
+def make_logo_image(content: bytes, media_type: str) -> LogoImage:
+    """Wrap image bytes with a strong ETag derived from the content."""
+    return LogoImage(content, media_type, '"' + hashlib.sha256(content).hexdigest()[:32] + '"')
+
+def decode_data_url(data_url: str) -> Optional[LogoImage]:
+    """Decode a data:image/...;base64 URL into raw bytes."""
+    if not data_url or not data_url.startswith("data:image"):
+        return None
+    header, encoded = data_url.split(",", 1)
+
+    # Determine content type from data URL
+    if "image/png" in header:
+        media_type = "image/png"
+    elif "image/jpeg" in header or "image/jpg" in header:
+        media_type = "image/jpeg"
+    elif "image/svg+xml" in header:
+        media_type = "image/svg+xml"
+    else:
+        media_type = "image/png"
+    return make_logo_image(base64.b64decode(encoded), media_type)
+
+def load_logo_source(value: str, db: Session) -> Optional[LogoImage]:
+    """Resolve the configured logo value (data URL or uploaded file URL) to image bytes."""
+    if not value:
+        return None
+    match = FILE_URL_PATTERN.search(value)
+    if match is None:
+        return decode_data_url(value)
+    stored = db.query(StoredFile).filter(StoredFile.id == match.group(1)).first()
+    if stored is None or not (stored.content_type or "").startswith("image"):
+        return None
+    with open(blob_path(stored.storage_path), "rb") as f:
+        return make_logo_image(f.read(), stored.content_type)
+
+def downscale(original: LogoImage, box) -> LogoImage:
+    """Resize a raster logo to fit inside box, keeping the aspect ratio. SVGs are returned as-is."""
+    if original.media_type == "image/svg+xml":
+        return original
+    try:
+        from PIL import Image
+    except ImportError:
+        logger.warning("Pillow is not installed, serving the original logo for all variants")
+        return original
+    with Image.open(io.BytesIO(original.content)) as image:
+        if image.width <= box[0] and image.height <= box[1]:
+            return original
+        image = image.convert("RGBA")
+        image.thumbnail(box, Image.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, format="PNG", optimize=True)
+    return make_logo_image(output.getvalue(), "image/png")
+
+class LogoCache:
+    """Decoded logo and its variants, rebuilt when the configuration registry reloads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._source_digest = None
+        self._variants = {}
+
+    def get(self, db: Session, variant: str = "original") -> Optional[LogoImage]:
+        """Return the requested logo variant, or None if no logo is configured."""
+        rows = configuration_registry.get_rows(db)
+        digest = configuration_registry.digest
+        with self._lock:
+            if digest != self._source_digest:
+                self._variants = {}
+                self._source_digest = digest
+            if variant in self._variants:
+                return self._variants[variant]
+
+            original = self._variants.get("original")
+            if "original" not in self._variants:
+                logo_config = next((
+                    row for row in rows
+                    if row.config_type == "company_settings"
+                    and row.config_value == "company_logo"
+                    and row.is_active
+                ), None)
+                try:
+                    original = load_logo_source(logo_config.config_name, db) if logo_config else None
+                except Exception as e:
+                    logger.warning(f"Could not decode company logo: {e}")
+                    original = None
+                self._variants["original"] = original
+
+            image = original
+            box = LOGO_VARIANTS[variant]
+            if original is not None and box is not None:
+                try:
+                    image = downscale(original, box)
+                except Exception as e:
+                    logger.warning(f"Could not resize company logo to {variant}: {e}")
+            self._variants[variant] = image
+            return image
+
+logo_cache = LogoCache()
@@ -1,15 +1,14 @@
+import asyncio
 import logging
+from functools import lru_cache
 from fastapi import FastAPI, Response, Request, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.exceptions import RequestValidationError
-from jinja2 import Template
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from sqlalchemy.exc import IntegrityError, DatabaseError, SQLAlchemyError
 from config import settings
 from db import engine, Base, get_db
-from migration import run_migrations
 from routers import (
     auth,
     customers,
@@ -18,9 +17,25 @@ from routers import (
     audit_logs,
     user_profiles,
     users,
-    files
+    files,
+    signatures,
+    report_exports,
+    analytics,
+    admin
 )
 from models import Configuration
+from configuration_registry import configuration_registry
+from audit_sink import audit_sink
+from audit_middleware import AuditMiddleware, capture_mutation_fields
+from upload_limits import UploadLimitMiddleware
+from compression import CompressionMiddleware
+from content_negotiation import MsgPackMiddleware
+from logo import logo_cache
+from image_pipeline import image_pipeline
+from pdf_renderer import pdf_renderer
+from report_export import report_exporter
+from serialization import ORJSONResponse
+from response_cache import response_cache
 from sqlalchemy.orm import Session
 from exception_handlers import (
     validation_exception_handler,
@@ -29,7 +44,7 @@ from exception_handlers import (
     general_exception_handler
 )
 from datetime import datetime, timezone
-import base64
+from typing import Literal
 
 # Configure logging
 logging.basicConfig(
@@ -38,7 +53,8 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="CANNA Visit Report API", version="1.0.0")
+# Responses are encoded with orjson (see serialization.py)
+app = FastAPI(title="CANNA Visit Report API", version="1.0.0", default_response_class=ORJSONResponse)
 
 def is_browser_request(request: Request) -> bool:
     """Check if request is from a browser (not API client)"""
@@ -56,8 +72,34 @@ def load_error_template() -> str:
     with open(template_path, "r", encoding="utf-8") as f:
         return f.read()
 
-# Add GZip compression for API responses (reduces payload size significantly)
-app.add_middleware(GZipMiddleware, minimum_size=1000)
+@lru_cache(maxsize=1)
+def get_error_template():
+    """Compile the error page template once; Jinja2 is only imported when first needed"""
+    from jinja2 import Template
+    return Template(load_error_template())
+
+def run_startup_migrations():
+    """Run database migrations to add any missing tables and columns"""
+    # Imported here so the migration and index modules don't slow down worker import
+    from migration import run_migrations
+    try:
+        run_migrations()
+        logger.info("Database migrations completed successfully")
+    except Exception as e:
+        logger.error(f"Database migration failed: {e}", exc_info=True)
+        # Continue anyway - tables might already exist
+
+# Record successful POST/PUT/DELETE requests into the audit log (via the background sink)
+app.add_middleware(AuditMiddleware)
+
+# Reject oversized uploads before their body is read and cap concurrent upload memory/disk use
+app.add_middleware(UploadLimitMiddleware)
+
+# Opt-in MessagePack request/response bodies (Accept / Content-Type: application/msgpack)
+app.add_middleware(MsgPackMiddleware)
+
+# Compress responses with zstd, brotli or gzip, at a level chosen per content type
+app.add_middleware(CompressionMiddleware)
 
 # CORS from config - Allow specific origins for network access
 # If no allowed origins are configured, allow all (for development/network access)
@@ -91,13 +133,29 @@ async def on_startup():
     else:
         logger.warning("JWT Secret Key is using default value. Set SECRET_KEY in .env.conf for production!")
     
-    # Run database migrations to add any missing tables and columns
-    try:
-        run_migrations()
-        logger.info("Database migrations completed successfully")
-    except Exception as e:
-        logger.error(f"Database migration failed: {e}", exc_info=True)
-        # Continue anyway - tables might already exist
+    # Keep the in-memory configuration cache in sync with other workers
+    configuration_registry.start_listener()
+    response_cache.start_listener()
+    # Background writer for server-side audit entries
+    audit_sink.start()
+    
+    if settings.fast_start:
+        # Start serving right away; migrations are idempotent and run in a worker thread
+        logger.info("Fast start enabled: running database migrations in the background")
+        asyncio.get_running_loop().run_in_executor(None, run_startup_migrations)
+    else:
+        run_startup_migrations()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    configuration_registry.stop_listener()
+    response_cache.stop_listener()
+    # Write out audit entries that are still queued
+    audit_sink.stop()
+    image_pipeline.shutdown()
+    # Running report exports are recorded as interrupted before their render pool goes away
+    await report_exporter.shutdown()
+    pdf_renderer.shutdown()
 
 # Root-level test routes
 @app.get("/")
@@ -146,52 +204,57 @@ def hello(name: str = "world"):
     return {"message": f"Hello, {name}!"}
 
 # Include routers
+# Mutations on audited routers record their changed field names for AuditMiddleware
+audited = [Depends(capture_mutation_fields)]
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
-app.include_router(customers.router, prefix="/api/customers", tags=["customers"])
-app.include_router(shop_visits.router, prefix="/api/shop-visits", tags=["shop-visits"])
-app.include_router(configurations.router, prefix="/api/configurations", tags=["configurations"])
+app.include_router(customers.router, prefix="/api/customers", tags=["customers"], dependencies=audited)
+app.include_router(shop_visits.router, prefix="/api/shop-visits", tags=["shop-visits"], dependencies=audited)
+app.include_router(configurations.router, prefix="/api/configurations", tags=["configurations"], dependencies=audited)
 app.include_router(audit_logs.router, prefix="/api/audit-logs", tags=["audit-logs"])
-app.include_router(user_profiles.router, prefix="/api/user-profiles", tags=["user-profiles"])
-app.include_router(users.router, prefix="/api/users", tags=["users"])
-app.include_router(files.router, prefix="/api/files", tags=["files"])
+app.include_router(user_profiles.router, prefix="/api/user-profiles", tags=["user-profiles"], dependencies=audited)
+app.include_router(users.router, prefix="/api/users", tags=["users"], dependencies=audited)
+app.include_router(files.router, prefix="/api/files", tags=["files"], dependencies=audited)
+app.include_router(signatures.router, prefix="/api/signatures", tags=["signatures"])
+app.include_router(report_exports.router, prefix="/api/report-exports", tags=["report-exports"], dependencies=audited)
+app.include_router(analytics.router, prefix="/api/analytics", tags=["analytics"])
+app.include_router(admin.router, prefix="/api/admin", tags=["admin"], dependencies=audited)
+
+def logo_response(request: Request, variant: str, db: Session) -> Response:
+    """Serve a cached logo variant with a strong ETag, answering 304 when the client has it"""
+    try:
+        logo = logo_cache.get(db, variant)
+    except Exception as e:
+        logger.warning(f"Could not load company logo: {e}")
+        logo = None
+    if logo is None:
+        # Return 204 No Content if no logo found (silent fail for favicon)
+        return Response(status_code=204)
+    
+    headers = {
+        "ETag": logo.etag,
+        # Cached for a day, revalidated cheaply by ETag after that (the logo rarely changes)
+        "Cache-Control": "public, max-age=86400, stale-while-revalidate=604800",
+    }
+    if logo.etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=logo.content, media_type=logo.media_type, headers=headers)
 
 # Favicon endpoint - serve company logo as favicon
 @app.get("/favicon.ico")
 @app.head("/favicon.ico")
-async def get_favicon(db: Session = Depends(get_db)):
-    """Serve company logo as favicon"""
-    try:
-        logo_config = db.query(Configuration).filter(
-            Configuration.config_type == "company_settings",
-            Configuration.config_value == "company_logo",
-            Configuration.is_active == True
-        ).first()
-        
-        if logo_config and logo_config.config_name:
-            logo_data = logo_config.config_name
-            
-            # Check if it's a data URL (base64 encoded)
-            if logo_data.startswith("data:image"):
-                # Extract base64 data
-                header, encoded = logo_data.split(",", 1)
-                image_data = base64.b64decode(encoded)
-                
-                # Determine content type from data URL
-                if "image/png" in header:
-                    media_type = "image/png"
-                elif "image/jpeg" in header or "image/jpg" in header:
-                    media_type = "image/jpeg"
-                elif "image/svg+xml" in header:
-                    media_type = "image/svg+xml"
-                else:
-                    media_type = "image/png"
-                
-                return Response(content=image_data, media_type=media_type)
-    except Exception:
-        pass
-    
-    # Return 204 No Content if no logo found (silent fail for favicon)
-    return Response(status_code=204)
+def get_favicon(request: Request, db: Session = Depends(get_db)):
+    """Serve a downscaled company logo as favicon"""
+    return logo_response(request, "favicon-64", db)
+
+@app.get("/api/logo")
+@app.head("/api/logo")
+def get_logo(
+    request: Request,
+    variant: Literal["original", "favicon-32", "favicon-64", "pdf"] = "original",
+    db: Session = Depends(get_db)
+):
+    """Serve the company logo: original, favicon sizes or PDF header size"""
+    return logo_response(request, variant, db)
 
 # Register centralized exception handlers
 # Order matters: more specific handlers should be registered first
@@ -252,10 +315,8 @@ async def http_exception_handler_html(request: Request, exc: StarletteHTTPExcept
                     # Production: same origin
                     frontend_url = f"{scheme}://{host}"
         
-        # Load and render HTML template
-        template_content = load_error_template()
-        template = Template(template_content)
-        html_content = template.render(
+        # Render the cached HTML template
+        html_content = get_error_template().render(
             status_code=exc.status_code,
             icon=icon,
             title=title,
@@ -8,20 +8,12 @@ from sqlalchemy.engine import Engine
 from sqlalchemy.exc import ProgrammingError
 from db import engine, Base
 from models import (
-    User, UserProfile, Customer, ShopVisit, Configuration, AuditLog
+    User, UserProfile, Customer, ShopVisit, Configuration, AuditLog, StoredFile, Signature
 )
 import logging
+from datetime import datetime, timezone
 import sys
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
-
 logger = logging.getLogger(__name__)
 
 def get_table_columns(engine: Engine, table_name: str):
@@ -203,7 +195,9 @@ def run_migrations():
         Customer,
         ShopVisit,
         Configuration,
-        AuditLog
+        AuditLog,
+        StoredFile,
+        Signature
     ]
     
     migrations_applied = False
@@ -233,6 +227,21 @@ def run_migrations():
     logger.info("Migration check completed")
     logger.info("=" * 60)
     
+    # Dashboard rollup of shop_visits, maintained by a trigger (see visit_rollup.py)
+    try:
+        from visit_rollup import ensure_rollup
+        ensure_rollup(engine)
+    except Exception as e:
+        logger.error(f"✗ Error setting up the visit rollup: {e}")
+    
+    # Keep upcoming monthly partitions in place for tables that have been partitioned
+    for table_name in PARTITIONED_TABLES:
+        try:
+            if is_partitioned(engine, table_name):
+                ensure_future_partitions(engine, table_name)
+        except Exception as e:
+            logger.error(f"✗ Error creating future partitions for '{table_name}': {e}")
+    
     # Create performance indexes after migrations
     try:
         from add_performance_indexes import create_performance_indexes
@@ -304,3 +313,299 @@ def migrate_county_to_country(engine: Engine):
         except Exception as e:
             logger.warning(f"Could not migrate county to country for table '{table_name}': {e}")
 
+
+# Tables that can be converted to monthly range partitions on created_at
+PARTITIONED_TABLES = ['shop_visits', 'audit_logs']
+
+# Number of months ahead of the current month to keep partitions for
+PARTITION_MONTHS_AHEAD = 3
+
+def is_partitioned(engine: Engine, table_name: str) -> bool:
+    """Check if a table is a partitioned (parent) table."""
+    with engine.connect() as conn:
+        result = conn.execute(text("""
+            SELECT EXISTS (
+                SELECT 1 FROM pg_partitioned_table p
+                JOIN pg_class c ON c.oid = p.partrelid
+                WHERE c.relname = :table_name
+            )
+        """), {"table_name": table_name})
+        return bool(result.scalar())
+
+def add_months(year: int, month: int, months: int):
+    """Return (year, month) shifted by the given number of months."""
+    index = year * 12 + (month - 1) + months
+    return index // 12, index % 12 + 1
+
+def month_partition_name(table_name: str, year: int, month: int) -> str:
+    """Name of the monthly partition, e.g. shop_visits_p202405."""
+    return f"{table_name}_p{year:04d}{month:02d}"
+
+def create_month_partition(conn, table_name: str, year: int, month: int, parent_name: str = None) -> bool:
+    """
+    Create the partition holding one calendar month of rows if it doesn't exist.
+    Partitions are always named after table_name; parent_name is the partitioned table to
+    attach to while it is still being built under another name (defaults to table_name).
+    """
+    parent_name = parent_name or table_name
+    partition_name = month_partition_name(table_name, year, month)
+    next_year, next_month = add_months(year, month, 1)
+    exists = conn.execute(
+        text("SELECT to_regclass(:name) IS NOT NULL"), {"name": partition_name}
+    ).scalar()
+    if exists:
+        return False
+    try:
+        conn.execute(text(f"""
+            CREATE TABLE "{partition_name}" PARTITION OF "{parent_name}"
+            FOR VALUES FROM ('{year:04d}-{month:02d}-01') TO ('{next_year:04d}-{next_month:02d}-01')
+        """))
+        conn.commit()
+        logger.info(f"✓ Created partition '{partition_name}'")
+        return True
+    except Exception as e:
+        # Usually means rows for this month already landed in the default partition
+        conn.rollback()
+        logger.warning(f"✗ Could not create partition '{partition_name}': {e}")
+        return False
+
+def rename_build_partitions(conn, table_name: str) -> int:
+    """
+    Rename partitions still carrying the "<table>_partitioned_p..." names of the build table
+    (conversions made before partitions were named after the final table). Otherwise
+    ensure_future_partitions finds no partition under the expected name and fails to create
+    one overlapping the existing range.
+    """
+    build_prefix = f"{table_name}_partitioned_p"
+    names = conn.execute(text("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(:table_name) AND starts_with(c.relname, :prefix)
+    """), {"table_name": table_name, "prefix": build_prefix}).scalars().all()
+    for name in names:
+        conn.execute(text(f'ALTER TABLE "{name}" RENAME TO "{table_name}_p{name[len(build_prefix):]}"'))
+    conn.commit()
+    if names:
+        logger.info(f"✓ Renamed {len(names)} partitions of '{table_name}'")
+    return len(names)
+
+def ensure_future_partitions(engine: Engine, table_name: str, months_ahead: int = PARTITION_MONTHS_AHEAD) -> int:
+    """Create partitions for the current month and the next `months_ahead` months."""
+    now = datetime.now(timezone.utc)
+    created = 0
+    with engine.connect() as conn:
+        rename_build_partitions(conn, table_name)
+        for offset in range(months_ahead + 1):
+            year, month = add_months(now.year, now.month, offset)
+            created += create_month_partition(conn, table_name, year, month)
+    return created
+
+def _sync_trigger_sql(table_name: str, target_name: str, columns) -> str:
+    """
+    Trigger function that mirrors writes on the original table into the new
+    partitioned table while the batched copy is running.
+    """
+    column_list = ", ".join(f'"{c}"' for c in columns)
+    values_list = ", ".join(f'NEW."{c}"' for c in columns)
+    update_list = ", ".join(f'"{c}" = EXCLUDED."{c}"' for c in columns if c not in ("id", "created_at"))
+    return f"""
+        CREATE OR REPLACE FUNCTION "{table_name}_partition_sync"() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                DELETE FROM "{target_name}" WHERE id = OLD.id;
+                RETURN OLD;
+            END IF;
+            IF TG_OP = 'UPDATE' THEN
+                DELETE FROM "{target_name}" WHERE id = OLD.id AND created_at <> NEW.created_at;
+            END IF;
+            INSERT INTO "{target_name}" ({column_list}) VALUES ({values_list})
+            ON CONFLICT (id, created_at) DO UPDATE SET {update_list};
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """
+
+def convert_to_partitioned(engine: Engine, table_name: str, batch_size: int = 5000, drop_legacy: bool = False):
+    """
+    Convert an existing table into a table partitioned by month on created_at, online.
+    
+    1. Builds "<table>_partitioned" with the same columns, defaults and foreign keys,
+       a (id, created_at) primary key, monthly partitions and a default partition.
+    2. Installs a trigger on the original table that mirrors every insert, update and
+       delete into the new table, so the application keeps writing normally.
+    3. Copies existing rows in id-ordered batches, committing after each batch.
+    4. Swaps the tables inside one short transaction holding an exclusive lock.
+    
+    The original table is kept as "<table>_legacy" unless drop_legacy is set.
+    """
+    if table_name not in PARTITIONED_TABLES:
+        raise ValueError(f"Table '{table_name}' is not configured for partitioning")
+    if is_partitioned(engine, table_name):
+        logger.info(f"Table '{table_name}' is already partitioned, skipping")
+        return False
+    
+    target_name = f"{table_name}_partitioned"
+    columns = list(get_table_columns(engine, table_name).keys())
+    column_list = ", ".join(f'"{c}"' for c in columns)
+    
+    logger.info("=" * 60)
+    logger.info(f"Converting '{table_name}' to monthly partitions...")
+    logger.info("=" * 60)
+    
+    with engine.connect() as conn:
+        # The partition key must be NOT NULL - backfill missing timestamps in batches
+        while True:
+            updated = conn.execute(text(f"""
+                UPDATE "{table_name}" SET created_at = COALESCE(updated_at, now())
+                WHERE id IN (SELECT id FROM "{table_name}" WHERE created_at IS NULL LIMIT :batch)
+            """), {"batch": batch_size}).rowcount
+            conn.commit()
+            if not updated:
+                break
+            logger.info(f"  Backfilled created_at for {updated} rows")
+        
+        # Build the partitioned copy of the table
+        conn.execute(text(f'DROP TABLE IF EXISTS "{target_name}" CASCADE'))
+        conn.execute(text(f"""
+            CREATE TABLE "{target_name}" (LIKE "{table_name}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+            PARTITION BY RANGE (created_at)
+        """))
+        conn.execute(text(f'ALTER TABLE "{target_name}" ALTER COLUMN created_at SET NOT NULL'))
+        conn.execute(text(f'ALTER TABLE "{target_name}" ADD PRIMARY KEY (id, created_at)'))
+        foreign_keys = conn.execute(text("""
+            SELECT conname, pg_get_constraintdef(oid) AS definition
+            FROM pg_constraint
+            WHERE conrelid = to_regclass(:table_name) AND contype = 'f'
+        """), {"table_name": table_name}).fetchall()
+        for fk in foreign_keys:
+            conn.execute(text(f'ALTER TABLE "{target_name}" ADD CONSTRAINT "{fk.conname}" {fk.definition}'))
+        conn.execute(text(f'CREATE TABLE "{table_name}_pdefault" PARTITION OF "{target_name}" DEFAULT'))
+        conn.commit()
+        
+        # One partition per month from the oldest row up to PARTITION_MONTHS_AHEAD, named after
+        # the final table so they need no renaming at the swap
+        oldest = conn.execute(text(f'SELECT min(created_at) FROM "{table_name}"')).scalar()
+        now = datetime.now(timezone.utc)
+        year, month = (oldest.year, oldest.month) if oldest else (now.year, now.month)
+        last_year, last_month = add_months(now.year, now.month, PARTITION_MONTHS_AHEAD)
+        while (year, month) <= (last_year, last_month):
+            create_month_partition(conn, table_name, year, month, parent_name=target_name)
+            year, month = add_months(year, month, 1)
+        
+        # Mirror concurrent writes while copying
+        conn.exec_driver_sql(_sync_trigger_sql(table_name, target_name, columns))
+        conn.execute(text(f"""
+            CREATE TRIGGER "{table_name}_partition_sync"
+            AFTER INSERT OR UPDATE OR DELETE ON "{table_name}"
+            FOR EACH ROW EXECUTE FUNCTION "{table_name}_partition_sync"()
+        """))
+        conn.commit()
+        logger.info(f"✓ Created '{target_name}' with sync trigger")
+        
+        # Copy existing rows in batches; rows already mirrored by the trigger win
+        max_id = conn.execute(text(f'SELECT COALESCE(max(id), 0) FROM "{table_name}"')).scalar()
+        last_id = 0
+        copied = 0
+        while last_id < max_id:
+            upto = last_id + batch_size
+            copied += conn.execute(text(f"""
+                INSERT INTO "{target_name}" ({column_list})
+                SELECT {column_list} FROM "{table_name}" WHERE id > :last_id AND id <= :upto
+                ON CONFLICT (id, created_at) DO NOTHING
+            """), {"last_id": last_id, "upto": upto}).rowcount
+            conn.commit()
+            last_id = upto
+            logger.info(f"  Copied {copied} rows (id <= {min(upto, max_id)} of {max_id})")
+        
+        # A row deleted while its batch was in flight can be copied after the trigger ran
+        removed = conn.execute(text(f"""
+            DELETE FROM "{target_name}" n
+            WHERE NOT EXISTS (SELECT 1 FROM "{table_name}" o WHERE o.id = n.id)
+        """)).rowcount
+        conn.commit()
+        if removed:
+            logger.info(f"  Removed {removed} rows deleted during the copy")
+        
+        # Swap tables in one short transaction
+        legacy_name = f"{table_name}_legacy"
+        sequence_name = conn.execute(
+            text("SELECT pg_get_serial_sequence(:table_name, 'id')"), {"table_name": table_name}
+        ).scalar()
+        legacy_indexes = conn.execute(
+            text("SELECT indexname FROM pg_indexes WHERE tablename = :table_name"), {"table_name": table_name}
+        ).scalars().all()
+        conn.execute(text("SET LOCAL lock_timeout = '10s'"))
+        conn.execute(text(f'LOCK TABLE "{table_name}" IN ACCESS EXCLUSIVE MODE'))
+        conn.execute(text(f'DROP TRIGGER "{table_name}_partition_sync" ON "{table_name}"'))
+        conn.execute(text(f'DROP FUNCTION "{table_name}_partition_sync"()'))
+        conn.execute(text(f'ALTER TABLE "{table_name}" RENAME TO "{legacy_name}"'))
+        # Index names are schema-wide - free them up for the partitioned table
+        for index_name in legacy_indexes:
+            conn.execute(text(f'ALTER INDEX "{index_name}" RENAME TO "{index_name[:56]}_legacy"'))
+        conn.execute(text(f'ALTER TABLE "{target_name}" RENAME TO "{table_name}"'))
+        conn.execute(text(f'ALTER INDEX "{target_name}_pkey" RENAME TO "{table_name}_pkey"'))
+        if table_name == "shop_visits":
+            # Move the dashboard rollup trigger to the live table (see visit_rollup.py)
+            from visit_rollup import TRIGGER_NAME, create_trigger_sql
+            conn.execute(text(f'DROP TRIGGER IF EXISTS {TRIGGER_NAME} ON "{legacy_name}"'))
+            conn.execute(text(create_trigger_sql(table_name)))
+        if sequence_name:
+            conn.execute(text(f'ALTER SEQUENCE {sequence_name} OWNED BY "{table_name}".id'))
+        conn.commit()
+        logger.info(f"✓ Swapped '{table_name}' to the partitioned table, old data kept in '{legacy_name}'")
+        
+        if drop_legacy:
+            conn.execute(text(f'DROP TABLE "{legacy_name}"'))
+            conn.commit()
+            logger.info(f"✓ Dropped '{legacy_name}'")
+    
+    # Recreate the performance indexes on the partitioned table (propagated to every partition)
+    from add_performance_indexes import create_performance_indexes
+    create_performance_indexes()
+    return True
+
+def main():
+    """Command line entry point for partition maintenance."""
+    import argparse
+    # Logging is configured here rather than at import time so importing this
+    # module from main.py doesn't override the application's logging setup
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
+    parser = argparse.ArgumentParser(description="Database migration utilities")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    partition_parser = subparsers.add_parser("partition", help="Convert tables to monthly partitions on created_at")
+    partition_parser.add_argument("tables", nargs="*", default=PARTITIONED_TABLES, choices=PARTITIONED_TABLES)
+    partition_parser.add_argument("--batch-size", type=int, default=5000)
+    partition_parser.add_argument("--drop-legacy", action="store_true", help="Drop the original table after the swap")
+    
+    ensure_parser = subparsers.add_parser("ensure-partitions", help="Create upcoming monthly partitions")
+    ensure_parser.add_argument("--months-ahead", type=int, default=PARTITION_MONTHS_AHEAD)
+    
+    subparsers.add_parser("migrate", help="Run the startup migrations")
+    
+    signatures_parser = subparsers.add_parser("signatures", help="Move inline base64 signatures into the signatures table")
+    signatures_parser.add_argument("--batch-size", type=int, default=500)
+    
+    args = parser.parse_args()
+    if args.command == "partition":
+        for table_name in args.tables:
+            convert_to_partitioned(engine, table_name, batch_size=args.batch_size, drop_legacy=args.drop_legacy)
+    elif args.command == "ensure-partitions":
+        for table_name in PARTITIONED_TABLES:
+            if is_partitioned(engine, table_name):
+                ensure_future_partitions(engine, table_name, args.months_ahead)
+    elif args.command == "signatures":
+        from signatures import migrate_inline_signatures
+        migrate_inline_signatures(engine, batch_size=args.batch_size)
+    else:
+        run_migrations()
+
+if __name__ == "__main__":
+    main()
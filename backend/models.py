@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, Float, DateTime, Text, JSON, ForeignKey, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, Boolean, Float, Date, DateTime, Text, JSON, ForeignKey, LargeBinary, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from db import Base
@@ -103,7 +103,8 @@ class ShopVisit(Base):
     gps_coordinates = Column(JSON)
     
     # Signature
-    signature = Column(Text)  # Base64 encoded
+    signature = Column(Text)  # Legacy base64 data URL; new signatures are stored in signatures
+    signature_id = Column(String(36), ForeignKey("signatures.id"))
     signature_signer_name = Column(String(255))
     signature_date = Column(DateTime(timezone=True))
     
@@ -120,6 +121,25 @@ class ShopVisit(Base):
     
     customer = relationship("Customer", back_populates="visits")
 
+class VisitDailyRollup(Base):
+    __tablename__ = "visit_daily_rollup"
+    
+    # Totals of shop_visits per day x rep x region x status x purpose, kept current by a
+    # trigger on shop_visits (see visit_rollup.py). Unknown values are stored as 0 / ''.
+    day = Column(Date, primary_key=True)  # Calendar day of visit_date in VISIT_ROLLUP_TIMEZONE
+    user_id = Column(Integer, primary_key=True, default=0)  # created_by
+    region = Column(String(100), primary_key=True, default="")
+    visit_status = Column(String(20), primary_key=True, default="")
+    visit_purpose = Column(String(100), primary_key=True, default="")
+    visit_count = Column(Integer, nullable=False, server_default="0")
+    order_value_sum = Column(Float, nullable=False, server_default="0")
+    order_count = Column(Integer, nullable=False, server_default="0")  # Visits with an order value
+    satisfaction_sum = Column(Integer, nullable=False, server_default="0")
+    satisfaction_count = Column(Integer, nullable=False, server_default="0")
+    score_sum = Column(Integer, nullable=False, server_default="0")
+    score_count = Column(Integer, nullable=False, server_default="0")
+    follow_up_count = Column(Integer, nullable=False, server_default="0")
+
 class Configuration(Base):
     __tablename__ = "configurations"
     
@@ -146,6 +166,43 @@ class AuditLog(Base):
     user_agent = Column(Text)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+class StoredFile(Base):
+    __tablename__ = "stored_files"
+    
+    id = Column(String(36), primary_key=True)  # UUID handed out as fileId
+    sha256 = Column(String(64), nullable=False, index=True)  # Content hash computed while streaming
+    size = Column(Integer, nullable=False)
+    content_type = Column(String(255))
+    filename = Column(String(255))  # Original client filename
+    storage_path = Column(String(500), nullable=False)  # Relative to the upload directory
+    variant = Column(String(20))  # "medium"/"thumb" for derived images, NULL for the uploaded file
+    source_id = Column(String(36), ForeignKey("stored_files.id", ondelete="CASCADE"), index=True)
+    width = Column(Integer)
+    height = Column(Integer)
+    # Deduplication: hash and size of the bytes as uploaded, and how often they were uploaded
+    upload_sha256 = Column(String(64))  # Unique, see add_performance_indexes.py
+    upload_size = Column(Integer)
+    upload_count = Column(Integer, default=1)
+    last_uploaded_at = Column(DateTime(timezone=True))
+    # References from visits/configurations/profiles, recounted by file_gc.py
+    ref_count = Column(Integer)
+    refs_counted_at = Column(DateTime(timezone=True))
+    created_by = Column(Integer, ForeignKey("users.id"))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class Signature(Base):
+    __tablename__ = "signatures"
+    
+    id = Column(String(36), primary_key=True)  # UUID, served at /api/signatures/{id}
+    sha256 = Column(String(64), nullable=False, unique=True)  # Identical signatures are stored once
+    kind = Column(String(10), nullable=False)  # "strokes" or "png"
+    width = Column(Integer)
+    height = Column(Integer)
+    strokes = Column(JSON)  # [[x0, y0, dx1, dy1, dx2, dy2, ...], ...] integer pixel deltas
+    png = Column(LargeBinary)  # Raster signatures (captured before strokes were recorded)
+    created_by = Column(Integer, ForeignKey("users.id"))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
 class UserProfile(Base):
     __tablename__ = "user_profiles"
     
@@ -157,7 +214,8 @@ class UserProfile(Base):
     bio = Column(Text)
     preferences = Column(JSON, default=dict)
     # User signature (one-time submission)
-    signature = Column(Text)  # Base64 encoded signature
+    signature = Column(Text)  # Legacy base64 data URL; new signatures are stored in signatures
+    signature_id = Column(String(36), ForeignKey("signatures.id"))
     signature_signer_name = Column(String(255))
     signature_date = Column(DateTime(timezone=True))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -175,6 +233,12 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
+    @property
+    def avatar_url(self):
+        """Avatar from the profile, only when the profile was eager-loaded (never triggers a query)."""
+        profile = self.__dict__.get("profile")
+        return profile.avatar_url if profile is not None else None
+    
     profile = relationship("UserProfile", backref="user", uselist=False)
     created_visits = relationship("ShopVisit", foreign_keys=[ShopVisit.created_by])
 
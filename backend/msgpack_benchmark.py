@@ -0,0 +1,72 @@
+"""
+MessagePack vs JSON for visit payloads: size on the wire and client-side decode time.
+Uses full ShopVisitResponse bodies (sales data, product lists, GPS, photos) built from
+transient rows, so no database is needed. Sizes are shown raw and gzip-compressed,
+since responses are compressed as well (see compression.py).
+Run from the backend directory: python msgpack_benchmark.py [--rows 200] [--runs 50]
+"""
+import argparse
+import gzip
+import json
+import statistics
+import time
+import msgpack
+from schemas import ShopVisitResponse
+from serialization import dump_model_list
+from serialization_benchmark import build_rows
+
+def enrich(rows):
+    """Fill the large fields tablets sync: product lists, sales data and GPS."""
+    for i, row in enumerate(rows):
+        row.products_discussed = ["Terra Vega", "Terra Flores", "Coco A", "Coco B", "PK 13/14", "Boost"]
+        row.training_topics = ["feeding schedules", "ph control"]
+        row.sales_data = {
+            "products": [
+                {"sku": f"CAN-{n:04d}", "name": f"Product {n}", "qty": n % 7 + 1, "price": 12.95 + n, "discount": 0.1}
+                for n in range(25)
+            ],
+            "total": 4321.5,
+            "currency": "EUR",
+        }
+        row.gps_coordinates = {"latitude": 52.3702 + i / 1e4, "longitude": 4.8952 - i / 1e4, "accuracy": 12.5}
+    return rows
+
+def median_seconds(fn, runs: int) -> float:
+    fn()
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+def report(label: str, json_body: bytes, runs: int):
+    msgpack_body = msgpack.packb(json.loads(json_body), use_bin_type=True)
+    print(f"\n{label}")
+    print(f"  {'format':<10}{'size KB':>10}{'gzip KB':>10}{'decode ms':>11}")
+    decoders = [("json", json_body, lambda: json.loads(json_body))]
+    try:
+        import orjson
+        decoders.append(("orjson", json_body, lambda: orjson.loads(json_body)))
+    except ImportError:
+        pass
+    decoders.append(("msgpack", msgpack_body, lambda: msgpack.unpackb(msgpack_body, raw=False)))
+    for name, body, decode in decoders:
+        decode_ms = median_seconds(decode, runs) * 1000
+        print(f"  {name:<10}{len(body) / 1024:>10.1f}{len(gzip.compress(body, 6)) / 1024:>10.1f}{decode_ms:>11.3f}")
+    gzip_ratio = len(gzip.compress(msgpack_body, 6)) / len(gzip.compress(json_body, 6))
+    print(f"  msgpack size vs json: {len(msgpack_body) / len(json_body) - 1:+.0%} uncompressed, {gzip_ratio - 1:+.0%} gzipped")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare MessagePack and JSON visit payloads")
+    parser.add_argument("--rows", type=int, default=200, help="Visits in the list payload")
+    parser.add_argument("--runs", type=int, default=50, help="Measured decode runs")
+    args = parser.parse_args()
+
+    rows = enrich(build_rows(args.rows))
+    single = dump_model_list(ShopVisitResponse, rows[:1])[1:-1]  # One visit body, without the list brackets
+    report("Single visit body", single, args.runs)
+    report(f"List of {args.rows} full visits", dump_model_list(ShopVisitResponse, rows), args.runs)
+
+if __name__ == "__main__":
+    main()
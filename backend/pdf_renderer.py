@@ -0,0 +1,440 @@
+"""
+Server-side rendering of visit reports to PDF.
+Reports are printed from the same public/pdf/visit-report-template.html the browser export
+(generateVisitReportPDF.jsx) opens: templates/visit_report_pdf.html is rendered with Jinja2
+and injected into the page, calling populateReport() with the same visit data, with the logo
+and signatures inlined as data URLs. The template fills itself in and draws its Chart.js
+charts with JavaScript, so headless Chromium (Playwright) prints it.
+Each worker process of a ProcessPoolExecutor keeps one browser open, and a bounded queue
+makes bursts of downloads wait for a slot instead of blocking the event loop.
+Rendered PDFs are cached on disk (PDF_CACHE_DIR) keyed by visit id + updated_at, plus a
+digest of the template, the company settings and the names and signature of the creator and
+assigned user, so a re-download is a file read.
+The browser never goes online: the template's Chart.js (loaded from a CDN in the browser
+export) is served from the local copy at PDF_CHARTJS_PATH, and any other request is aborted.
+Requires the playwright package and its browser (playwright install --with-deps chromium).
+Run `python pdf_renderer.py <visit_id> [...]` for render timings.
+"""
+import asyncio
+import base64
+import hashlib
+import importlib.util
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from config import settings
+from configuration_registry import configuration_registry
+from logo import logo_cache
+from models import ShopVisit, User, UserProfile
+from schemas import ShopVisitResponse
+from signatures import signature_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEMPLATE_PATH = Path(__file__).resolve().parent.parent / "public" / "pdf" / "visit-report-template.html"
+TEMPLATES_DIR = Path(__file__).resolve().parent / "templates"
+BOOTSTRAP_TEMPLATE = "visit_report_pdf.html"
+SETTLE_MS = 600  # populateVisitData draws the charts 400 ms after filling in the page
+SCOPE = "Review of shop performance, product visibility, and commercial opportunities."
+READY_CHECK = "() => window.__reportError || (window.__reportReady && Array.from(document.images).every(img => img.complete))"
+PDF_OPTIONS = {"format": "A4", "print_background": True, "prefer_css_page_size": True}
+CHARTJS_URL = re.compile(r"/chart\.js@[^/]+/dist/chart\.umd(\.min)?\.js$")
+
+# Defaults the browser export applies to empty fields (formData.x || default)
+FIELD_DEFAULTS = {
+    "visit_duration": 60,
+    "product_visibility_score": 0,
+    "overall_satisfaction": 0,
+    "calculated_score": 0,
+    "order_value": 0,
+    "products_discussed": [],
+    "training_topics": [],
+    "support_materials_items": [],
+    "sales_data": {},
+}
+NULLABLE_TEXT_FIELDS = {"follow_up_stage", "signature", "signature_signer_name"}
+TEXT_FIELDS = {
+    name for name, field in ShopVisitResponse.model_fields.items()
+    if field.annotation == Optional[str] and name not in NULLABLE_TEXT_FIELDS
+}
+
+# One headless browser per worker process, started by the first job the worker runs.
+# Chromium exits with the worker: its Playwright driver stops when the pipe closes.
+_playwright = None
+_browser = None
+
+def _get_browser():
+    global _playwright, _browser
+    if _browser is None or not _browser.is_connected():
+        from playwright.sync_api import sync_playwright
+        if _playwright is None:
+            _playwright = sync_playwright().start()
+        _browser = _playwright.chromium.launch(args=["--disable-dev-shm-usage"])
+    return _browser
+
+def _route_request(route, chartjs: Optional[str]):
+    """Serve Chart.js from the local copy and keep every other request off the network."""
+    if CHARTJS_URL.search(route.request.url):
+        if chartjs:
+            route.fulfill(path=chartjs, content_type="application/javascript")
+        else:
+            route.continue_()  # No local copy: fetched from the CDN (needs outbound internet)
+        return
+    route.abort()
+
+def render_html(html: str, timeout_ms: int, chartjs: Optional[str] = None) -> bytes:
+    """Print one populated report page to PDF. Runs inside a worker process."""
+    try:
+        page = _get_browser().new_page()
+        try:
+            page.route("**/*", lambda route: _route_request(route, chartjs))
+            page.set_content(html, wait_until="load", timeout=timeout_ms)
+            page.wait_for_function(READY_CHECK, timeout=timeout_ms)
+            error = page.evaluate("() => window.__reportError || null")
+            if error:
+                raise RuntimeError(f"Report template failed: {error}")
+            return page.pdf(**PDF_OPTIONS)
+        finally:
+            page.close()
+    except Exception as e:
+        # Playwright errors do not always survive pickling back to the parent process
+        raise RuntimeError(str(e)) from None
+
+@lru_cache(maxsize=1)
+def get_bootstrap_template():
+    """Compile the injected script once; Jinja2 is only imported when first needed"""
+    from jinja2 import Environment, FileSystemLoader
+    return Environment(loader=FileSystemLoader(str(TEMPLATES_DIR)), autoescape=True).get_template(BOOTSTRAP_TEMPLATE)
+
+def report_template_path() -> Path:
+    return Path(settings.pdf_template_path) if settings.pdf_template_path else DEFAULT_TEMPLATE_PATH
+
+def chartjs_path() -> Optional[str]:
+    """The local Chart.js served to the browser, or None if it is not there."""
+    path = Path(settings.pdf_chartjs_path) if settings.pdf_chartjs_path else None
+    return str(path.resolve()) if path and path.is_file() else None
+
+@lru_cache(maxsize=2)
+def _read_report_template(path: str, mtime_ns: int, chartjs: Optional[str], chartjs_mtime_ns: int) -> Tuple[str, str]:
+    html = Path(path).read_text(encoding="utf-8")
+    bootstrap = (TEMPLATES_DIR / BOOTSTRAP_TEMPLATE).read_text(encoding="utf-8")
+    chartjs_digest = hashlib.sha256(Path(chartjs).read_bytes()).hexdigest() if chartjs else "cdn"
+    digest = hashlib.sha256(
+        f"{html}|{bootstrap}|{chartjs_digest}|{sorted(PDF_OPTIONS.items())}".encode("utf-8")
+    ).hexdigest()
+    return html, digest
+
+def load_report_template() -> Tuple[str, str]:
+    """(template HTML, digest); re-read when the template or Chart.js changes on disk."""
+    path = report_template_path()
+    chartjs = chartjs_path()
+    chartjs_mtime_ns = Path(chartjs).stat().st_mtime_ns if chartjs else 0
+    return _read_report_template(str(path), path.stat().st_mtime_ns, chartjs, chartjs_mtime_ns)
+
+def people_version(db: Session, created_by: Optional[int], assigned_user_id: Optional[int]) -> str:
+    """
+    What the report shows of its people besides the visit row: the creator's and assigned
+    user's names (users.updated_at) and the creator's profile signature.
+    """
+    user_ids = [user_id for user_id in (created_by, assigned_user_id) if user_id]
+    changed = dict(db.query(User.id, User.updated_at).filter(User.id.in_(user_ids)).all()) if user_ids else {}
+    profile = db.query(UserProfile.signature_id, UserProfile.updated_at).filter(
+        UserProfile.user_id == created_by
+    ).first() if created_by else None
+    parts = (changed.get(created_by), changed.get(assigned_user_id), *(profile or (None, None)))
+    return "|".join(str(part) for part in parts)
+
+def image_data_url(content: bytes, media_type: str) -> str:
+    return f"data:{media_type};base64,{base64.b64encode(content).decode()}"
+
+def signature_data_url(db: Session, signature_id: Optional[str], legacy: Optional[str]) -> Optional[str]:
+    """Stored signatures as inline SVG; legacy inline data URLs are used as they are."""
+    if signature_id:
+        rendered = signature_cache.get(db, signature_id, "svg")
+        if rendered is not None:
+            return image_data_url(rendered[0], rendered[1])
+    return legacy if legacy and legacy.startswith("data:image") else None
+
+def build_report_data(db: Session, visit: ShopVisit) -> Dict[str, Any]:
+    """The visitData object generateVisitReportPDF.jsx hands to the template."""
+    data = ShopVisitResponse.model_validate(visit).model_dump(mode="json", exclude={"visit_photos", "gps_coordinates"})
+    for name in TEXT_FIELDS:
+        if data.get(name) is None:
+            data[name] = ""
+    for name, default in FIELD_DEFAULTS.items():
+        if not data.get(name):
+            data[name] = default
+
+    company = {
+        row.config_value: row.config_name for row in configuration_registry.get_rows(db)
+        if row.config_type == "company_settings" and row.is_active
+    }
+    logo = logo_cache.get(db, "pdf")
+    # The report is signed by the rep who created the visit, not by whoever downloads it
+    creator = db.get(User, visit.created_by) if visit.created_by else None
+    profile = creator.profile if creator else None
+    creator_name = creator.full_name if creator and creator.full_name else None
+    assigned = db.get(User, visit.follow_up_assigned_user_id) if visit.follow_up_assigned_user_id else None
+
+    data.update({
+        "visitor_name": creator_name or "N/A",
+        "created_by_name": creator_name or "N/A",
+        "department": visit.region or "",
+        "scope": SCOPE,
+        "follow_up_assigned_user_name": assigned.full_name if assigned else None,
+        "company_logo": image_data_url(logo.content, logo.media_type) if logo else None,
+        "company_name": company.get("company_name") or "CANNA",
+        "signature": signature_data_url(db, visit.signature_id, visit.signature),
+        "visitor_signature": signature_data_url(db, profile.signature_id, profile.signature) if profile else None,
+        "visitor_signature_name": (profile.signature_signer_name if profile else None) or creator_name,
+    })
+    return data
+
+def build_report_html(db: Session, visit: ShopVisit) -> str:
+    """The report template with the visit data filled in, ready to print."""
+    html, _ = load_report_template()
+    bootstrap = get_bootstrap_template().render(visit=build_report_data(db, visit), settle_ms=SETTLE_MS)
+    head, marker, tail = html.rpartition("</body>")
+    if not marker:
+        return html + bootstrap
+    return f"{head}{bootstrap}{marker}{tail}"
+
+class RenderedPdf(NamedTuple):
+    content: bytes
+    etag: str
+    filename: str
+
+class PdfRenderer:
+    """Process pool of headless browsers, a bounded queue of render jobs and the on-disk PDF cache."""
+
+    def __init__(self, workers: int, queue_size: int, cache_dir: str, cache_max_bytes: int):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.cache_dir = Path(cache_dir)
+        self.cache_max_bytes = cache_max_bytes
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+        self._cache_lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.pending = 0
+        self.rendered = 0
+        self.failed = 0
+        self.cache_hits = 0
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0
+
+    @property
+    def available(self) -> bool:
+        return importlib.util.find_spec("playwright") is not None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                logger.info(f"Started PDF renderer with {self.workers} worker processes")
+                if chartjs_path() is None:
+                    logger.warning(f"No Chart.js at {settings.pdf_chartjs_path}, PDF rendering loads it from the CDN")
+            return self._executor
+
+    def cache_key(self, db: Session, visit_id: int, changed_at, people: str = "") -> str:
+        _, template_digest = load_report_template()
+        configuration_registry.get_rows(db)  # Loads the digest of the company settings
+        version = hashlib.sha256(
+            f"{template_digest}|{configuration_registry.digest}|{people}".encode()
+        ).hexdigest()[:16]
+        stamp = int(changed_at.timestamp() * 1_000_000) if changed_at else 0
+        return f"visit-{visit_id}-{stamp}-{version}"
+
+    def _cache_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.pdf"
+
+    def _read_cached(self, key: str) -> Optional[bytes]:
+        path = self._cache_path(key)
+        try:
+            content = path.read_bytes()
+            os.utime(path)  # Pruning removes the least recently used files first
+            return content
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"Could not read cached PDF {path.name}: {e}")
+            return None
+
+    def _store(self, key: str, visit_id: int, content: bytes):
+        """Write the PDF atomically, drop older versions of the visit and prune to the size limit."""
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            path = self._cache_path(key)
+            temp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            temp_path.write_bytes(content)
+            os.replace(temp_path, path)
+            with self._cache_lock:
+                for old in self.cache_dir.glob(f"visit-{visit_id}-*.pdf"):
+                    if old != path:
+                        old.unlink(missing_ok=True)
+                self._prune()
+        except OSError as e:
+            logger.warning(f"Could not cache PDF for visit {visit_id}: {e}")
+
+    def _prune(self):
+        files = []
+        for path in self.cache_dir.glob("*.pdf"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.cache_max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def _prepare(self, db: Session, visit_id: int) -> Optional[Tuple[str, str, Optional[bytes], Optional[str]]]:
+        """(cache key, filename, cached PDF, page HTML); the full visit is only loaded on a miss."""
+        row = db.query(
+            ShopVisit.updated_at, ShopVisit.created_at, ShopVisit.visit_date,
+            ShopVisit.created_by, ShopVisit.follow_up_assigned_user_id
+        ).filter(ShopVisit.id == visit_id).first()
+        if row is None:
+            return None
+        people = people_version(db, row.created_by, row.follow_up_assigned_user_id)
+        key = self.cache_key(db, visit_id, row.updated_at or row.created_at, people)
+        filename = f"visit-report-{visit_id}" + (f"-{row.visit_date:%Y-%m-%d}" if row.visit_date else "") + ".pdf"
+        cached = self._read_cached(key)
+        if cached is not None:
+            return key, filename, cached, None
+        visit = db.query(ShopVisit).filter(ShopVisit.id == visit_id).first()
+        if visit is None:
+            return None
+        return key, filename, None, build_report_html(db, visit)
+
+    async def render_visit(self, db: Session, visit_id: int) -> Optional[RenderedPdf]:
+        """The visit's report PDF from the cache, or rendered in the pool; None if the visit does not exist."""
+        prepared = await run_in_threadpool(self._prepare, db, visit_id)
+        if prepared is None:
+            return None
+        key, filename, content, html = prepared
+        etag = '"' + hashlib.sha256(key.encode()).hexdigest()[:32] + '"'
+        if content is not None:
+            self.cache_hits += 1
+            return RenderedPdf(content, etag, filename)
+
+        # Concurrent downloads of the same visit share one render; shield() keeps it running
+        # for the others when one client disconnects
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._render(key, visit_id, html))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        content = await asyncio.shield(task)
+        return RenderedPdf(content, etag, filename)
+
+    async def _render(self, key: str, visit_id: int, html: str) -> bytes:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.queue_size)
+        self.pending += 1
+        queued_at = time.perf_counter()
+        try:
+            async with self._slots:
+                started = time.perf_counter()
+                self.wait_seconds += started - queued_at
+                loop = asyncio.get_running_loop()
+                try:
+                    content = await loop.run_in_executor(
+                        self._get_executor(), render_html, html, settings.pdf_render_timeout_seconds * 1000, chartjs_path()
+                    )
+                except BrokenProcessPool:
+                    # A worker died (e.g. Chromium was OOM-killed); start a fresh pool next time
+                    self.failed += 1
+                    self.shutdown(wait=False)
+                    raise
+                except Exception:
+                    self.failed += 1
+                    raise
+                self.rendered += 1
+                self.busy_seconds += time.perf_counter() - started
+        finally:
+            self.pending -= 1
+        await run_in_threadpool(self._store, key, visit_id, content)
+        return content
+
+    def metrics(self) -> dict:
+        cached_files = list(self.cache_dir.glob("*.pdf")) if self.cache_dir.exists() else []
+        return {
+            "available": self.available,
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "pending": self.pending,
+            "rendered": self.rendered,
+            "failed": self.failed,
+            "cache_hits": self.cache_hits,
+            "cached_files": len(cached_files),
+            "cache_bytes": sum(path.stat().st_size for path in cached_files if path.exists()),
+            "cache_max_bytes": self.cache_max_bytes,
+            "avg_render_ms": round(self.busy_seconds / self.rendered * 1000, 1) if self.rendered else None,
+            "avg_wait_ms": round(self.wait_seconds / self.rendered * 1000, 1) if self.rendered else None,
+        }
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait, cancel_futures=True)
+                self._executor = None
+
+pdf_renderer = PdfRenderer(settings.pdf_workers, settings.pdf_queue_size, settings.pdf_cache_dir, settings.pdf_cache_max_bytes)
+
+def main():
+    """Time cold (browser start) and warm renders of the given visits, bypassing the cache."""
+    import argparse
+    import statistics
+    import sys
+    from db import SessionLocal
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    parser = argparse.ArgumentParser(description="Visit report PDF render timings")
+    parser.add_argument("visit_ids", nargs="+", type=int)
+    parser.add_argument("--runs", type=int, default=3, help="Renders per visit (the very first one starts the browser)")
+    parser.add_argument("--output", help="Directory to write the rendered PDFs to")
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        pages = {}
+        for visit_id in args.visit_ids:
+            visit = db.query(ShopVisit).filter(ShopVisit.id == visit_id).first()
+            if visit is None:
+                parser.error(f"visit {visit_id} not found")
+            pages[visit_id] = build_report_html(db, visit)
+
+    timeout_ms = settings.pdf_render_timeout_seconds * 1000
+    chartjs = chartjs_path()
+    if chartjs is None:
+        logger.warning(f"No Chart.js at {settings.pdf_chartjs_path}, the browser loads it from the CDN")
+    for visit_id, html in pages.items():
+        timings = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            content = render_html(html, timeout_ms, chartjs)
+            timings.append(time.perf_counter() - start)
+        print(f"visit {visit_id}: {len(html) / 1024:.0f} KB HTML -> {len(content) / 1024:.0f} KB PDF, "
+              f"first {timings[0] * 1000:.0f} ms, median {statistics.median(timings) * 1000:.0f} ms")
+        if args.output:
+            Path(args.output).mkdir(parents=True, exist_ok=True)
+            (Path(args.output) / f"visit-report-{visit_id}.pdf").write_bytes(content)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Batch export of visit reports as one ZIP of PDFs.
+A job is created with report filters (region, month, status, rep, customer) and runs in the
+background of the worker that received it. Matching visits are read in keyset batches, their
+PDFs are rendered through pdf_renderer (sharing its worker pool and PDF cache with single
+downloads) at most REPORT_EXPORT_CONCURRENCY at a time, and each PDF is appended to a ZIP on
+disk as soon as it is ready, so memory stays at a few PDFs however many visits match.
+Job state is kept next to the ZIP in REPORT_EXPORT_DIR as <job id>.json, so every worker can
+report progress, serve the download or cancel the job (through a <job id>.cancel marker the
+running job checks after each PDF). Finished exports are deleted after REPORT_EXPORT_TTL_HOURS.
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import uuid
+import zipfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+from starlette.concurrency import run_in_threadpool
+from config import settings
+from db import SessionLocal
+from models import ShopVisit, VisitStatus
+from pdf_renderer import pdf_renderer
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 200
+MAX_ERRORS = 50  # Failures listed in the job state; later ones are only counted
+STALE_AFTER_SECONDS = 600  # A running job without progress for this long died with its worker
+ACTIVE_STATUSES = ("queued", "running")
+JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+class ExportCancelled(Exception):
+    pass
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+def filter_visits(query, filters: Dict[str, Any]):
+    """Apply ReportExportCreate filters to a ShopVisit query."""
+    if filters.get("visit_status"):
+        query = query.filter(ShopVisit.visit_status == VisitStatus(filters["visit_status"]))
+    if filters.get("region"):
+        query = query.filter(ShopVisit.region == filters["region"])
+    if filters.get("month"):
+        start = datetime.strptime(filters["month"], "%Y-%m").replace(tzinfo=timezone.utc)
+        end = (start + timedelta(days=32)).replace(day=1)
+        query = query.filter(ShopVisit.visit_date >= start, ShopVisit.visit_date < end)
+    if filters.get("created_by"):
+        query = query.filter(ShopVisit.created_by == filters["created_by"])
+    if filters.get("customer_id"):
+        query = query.filter(ShopVisit.customer_id == filters["customer_id"])
+    return query
+
+def count_visits(filters: Dict[str, Any]) -> int:
+    with SessionLocal() as db:
+        return filter_visits(db.query(ShopVisit.id), filters).count()
+
+def next_batch(filters: Dict[str, Any], after_id: int) -> list:
+    """The next BATCH_SIZE matching visits after after_id (id, shop name and date only)."""
+    with SessionLocal() as db:
+        query = db.query(ShopVisit.id, ShopVisit.shop_name, ShopVisit.visit_date)
+        return filter_visits(query, filters).filter(ShopVisit.id > after_id).order_by(ShopVisit.id).limit(BATCH_SIZE).all()
+
+def entry_name(visit) -> str:
+    """ZIP member name: <visit date>_<shop name>_<visit id>.pdf"""
+    shop = re.sub(r"[^A-Za-z0-9]+", "-", visit.shop_name or "").strip("-")[:60] or "visit"
+    day = f"{visit.visit_date:%Y-%m-%d}" if visit.visit_date else "undated"
+    return f"{day}_{shop}_{visit.id}.pdf"
+
+class ReportExporter:
+    """Background export jobs of this worker plus the job files shared by all workers."""
+
+    def __init__(self, export_dir: str, concurrency: int, ttl_hours: int):
+        self.export_dir = Path(export_dir)
+        self.concurrency = max(1, concurrency)
+        self.ttl = timedelta(hours=ttl_hours)
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def _path(self, job_id: str, suffix: str) -> Path:
+        return self.export_dir / f"{job_id}{suffix}"
+
+    def _save(self, state: Dict[str, Any]):
+        state["updated_at"] = utcnow().isoformat()
+        path = self._path(state["id"], ".json")
+        temp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        temp_path.write_text(json.dumps(state), encoding="utf-8")
+        os.replace(temp_path, path)
+
+    def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job state as shown to clients, or None if there is no such job."""
+        if not JOB_ID_PATTERN.match(job_id):
+            return None
+        try:
+            state = json.loads(self._path(job_id, ".json").read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return None
+        if state["status"] in ACTIVE_STATUSES and job_id not in self._tasks:
+            updated_at = datetime.fromisoformat(state["updated_at"])
+            if (utcnow() - updated_at).total_seconds() > STALE_AFTER_SECONDS:
+                state["status"] = "failed"
+                state["error"] = "The export was interrupted (server restart)"
+        state["download_url"] = f"/api/report-exports/{job_id}/download" if state["status"] == "completed" else None
+        return state
+
+    def list(self, user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """All jobs, newest first; only those of user_id if given."""
+        if not self.export_dir.exists():
+            return []
+        jobs = [self.load(path.stem) for path in self.export_dir.glob("*.json")]
+        jobs = [job for job in jobs if job and (user_id is None or job["created_by"] == user_id)]
+        return sorted(jobs, key=lambda job: job["created_at"], reverse=True)
+
+    def zip_path(self, job_id: str) -> Path:
+        return self._path(job_id, ".zip")
+
+    async def start(self, filters: Dict[str, Any], user_id: int) -> Dict[str, Any]:
+        """Create a job and run it in the background of this worker."""
+        await run_in_threadpool(self.prune)
+        job_id = uuid.uuid4().hex
+        state = {
+            "id": job_id,
+            "status": "queued",
+            "filters": filters,
+            "created_by": user_id,
+            "created_at": utcnow().isoformat(),
+            "finished_at": None,
+            "total": None,
+            "done": 0,
+            "failed": 0,
+            "errors": [],
+            "size": None,
+            "error": None,
+        }
+        self.export_dir.mkdir(parents=True, exist_ok=True)
+        await run_in_threadpool(self._save, state)
+        task = asyncio.create_task(self._run(state))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+        return self.load(job_id)
+
+    def cancel(self, job_id: str):
+        """Ask the job to stop; whichever worker runs it notices after its next PDF."""
+        self._path(job_id, ".cancel").touch()
+
+    def delete(self, job_id: str):
+        for suffix in (".json", ".zip", ".zip.part", ".cancel"):
+            self._path(job_id, suffix).unlink(missing_ok=True)
+
+    def _cancelled(self, job_id: str) -> bool:
+        return self._path(job_id, ".cancel").exists()
+
+    def prune(self):
+        """Delete finished jobs older than the TTL, and jobs whose worker died long ago."""
+        cutoff = utcnow() - self.ttl
+        for job in self.list():
+            finished_at = job["finished_at"] or job["updated_at"]
+            if job["status"] not in ACTIVE_STATUSES and datetime.fromisoformat(finished_at) < cutoff:
+                self.delete(job["id"])
+
+    async def _render(self, visit):
+        """(visit, PDF bytes or None, error message or None); failures do not stop the export."""
+        try:
+            db = SessionLocal()
+            try:
+                pdf = await pdf_renderer.render_visit(db, visit.id)
+            finally:
+                await run_in_threadpool(db.close)
+        except Exception as e:
+            logger.warning(f"Could not render visit {visit.id} for export: {e}")
+            return visit, None, str(e) or type(e).__name__
+        if pdf is None:
+            return visit, None, "Visit no longer exists"
+        return visit, pdf.content, None
+
+    async def _collect(self, state: Dict[str, Any], archive: zipfile.ZipFile, pending: Set[asyncio.Task]) -> Set[asyncio.Task]:
+        """Wait for at least one render, append the finished PDFs and record progress."""
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            visit, content, error = task.result()
+            if content is None:
+                state["failed"] += 1
+                if len(state["errors"]) < MAX_ERRORS:
+                    state["errors"].append({"visit_id": visit.id, "error": error})
+                continue
+            await run_in_threadpool(archive.writestr, entry_name(visit), content)
+            state["done"] += 1
+        await run_in_threadpool(self._save, state)
+        if await run_in_threadpool(self._cancelled, state["id"]):
+            raise ExportCancelled()
+        return pending
+
+    async def _run(self, state: Dict[str, Any]):
+        job_id = state["id"]
+        part_path = self._path(job_id, ".zip.part")
+        pending: Set[asyncio.Task] = set()
+        try:
+            state["total"] = await run_in_threadpool(count_visits, state["filters"])
+            state["status"] = "running"
+            await run_in_threadpool(self._save, state)
+            # PDFs are already compressed, so they are stored as they are
+            with zipfile.ZipFile(part_path, "w", zipfile.ZIP_STORED) as archive:
+                after_id = 0
+                while True:
+                    batch = await run_in_threadpool(next_batch, state["filters"], after_id)
+                    if not batch:
+                        break
+                    after_id = batch[-1].id
+                    for visit in batch:
+                        while len(pending) >= self.concurrency:
+                            pending = await self._collect(state, archive, pending)
+                        pending.add(asyncio.ensure_future(self._render(visit)))
+                while pending:
+                    pending = await self._collect(state, archive, pending)
+            os.replace(part_path, self.zip_path(job_id))
+            state["status"] = "completed"
+            state["size"] = self.zip_path(job_id).stat().st_size
+        except ExportCancelled:
+            state["status"] = "cancelled"
+        except asyncio.CancelledError:
+            state["status"] = "failed"
+            state["error"] = "The export was interrupted (server shutdown)"
+            raise
+        except Exception as e:
+            logger.error(f"Report export {job_id} failed: {e}", exc_info=True)
+            state["status"] = "failed"
+            state["error"] = str(e)
+        finally:
+            for task in pending:
+                task.cancel()
+            part_path.unlink(missing_ok=True)
+            self._path(job_id, ".cancel").unlink(missing_ok=True)
+            state["finished_at"] = utcnow().isoformat()
+            try:
+                self._save(state)
+            except OSError as e:
+                logger.error(f"Could not save state of report export {job_id}: {e}")
+
+    async def shutdown(self):
+        """Stop the jobs of this worker; they are recorded as interrupted."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+report_exporter = ReportExporter(settings.report_export_dir, settings.report_export_concurrency, settings.report_export_ttl_hours)
@@ -0,0 +1,332 @@
+"""
+Shared cache of serialized GET responses for read-heavy endpoints.
+Dashboard, Layout and Analytics re-request the same visit, customer and user lists many
+times a minute; a hit skips the database query and serialization (authentication still
+runs on every request).
+
+- Endpoints opt in with @response_cache.cached("<namespace>"). Entries are keyed by
+  namespace, path, sorted query parameters and the caller's role.
+- Each router declares invalidates("<namespace>", ...) as a router dependency. A mutating
+  request on that router bumps the namespace generation once its transaction commits, so
+  every older entry of the namespace stops matching (and ages out of the LRU / TTL).
+- Backends: "memory" (per-process LRU bounded by RESPONSE_CACHE_MAX_BYTES; other workers
+  learn about writes through pg_notify) or "redis" (any Redis-compatible server, shared by
+  all workers; generations are INCR counters). "off" disables caching.
+"""
+import functools
+import hashlib
+import inspect
+import logging
+import select
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+from fastapi import Depends, Request, Response
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from config import settings
+from db import engine, get_db
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "response_cache_invalidated"
+PENDING_KEY = "response_cache_pending"
+KEY_PREFIX = "rc:"
+ENTRY_OVERHEAD_BYTES = 200  # Rough per-entry bookkeeping cost counted against max_bytes
+
+class MemoryBackend:
+    """Process-local LRU of (media_type, body) bounded by total bytes, with per-entry TTL."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, str, bytes]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self.bytes = 0
+        self.evictions = 0
+
+    def generation(self, namespace: str) -> int:
+        return self._generations.get(namespace, 0)
+
+    def bump(self, namespace: str):
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+
+    def get(self, key: str) -> Optional[Tuple[str, bytes]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, media_type, body = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return media_type, body
+
+    def set(self, key: str, media_type: str, body: bytes, ttl: int):
+        size = len(key) + len(body) + ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes // 4:
+            return  # One huge response should not flush the whole cache
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, media_type, body)
+            self.bytes += size
+            while self.bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: str):
+        _, _, body = self._entries.pop(key)
+        self.bytes -= len(key) + len(body) + ENTRY_OVERHEAD_BYTES
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "entries": len(self._entries),
+            "memory_bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
+
+class RedisBackend:
+    """
+    Redis-compatible backend shared by all workers. Any client with get/set/incr/info
+    (redis-py against Redis, Valkey, KeyDB, or a local stand-in such as fakeredis) works.
+    """
+
+    def __init__(self, url: str = None, client=None):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url or settings.response_cache_url)
+        self.client = client
+
+    def generation(self, namespace: str) -> int:
+        return int(self.client.get(f"{KEY_PREFIX}gen:{namespace}") or 0)
+
+    def bump(self, namespace: str):
+        self.client.incr(f"{KEY_PREFIX}gen:{namespace}")
+
+    def get(self, key: str) -> Optional[Tuple[str, bytes]]:
+        value = self.client.get(key)
+        if value is None:
+            return None
+        media_type, _, body = value.partition(b"\n")
+        return media_type.decode(), body
+
+    def set(self, key: str, media_type: str, body: bytes, ttl: int):
+        self.client.set(key, media_type.encode() + b"\n" + body, ex=ttl)
+
+    def stats(self) -> dict:
+        stats = {"backend": "redis"}
+        try:
+            memory = self.client.info("memory")
+            stats["memory_bytes"] = memory.get("used_memory")
+            stats["max_bytes"] = memory.get("maxmemory")
+        except Exception as e:
+            stats["error"] = str(e)
+        return stats
+
+class ResponseCache:
+    def __init__(self, backend_name: str = None, ttl: int = None):
+        self.backend_name = backend_name or settings.response_cache_backend
+        self.ttl = ttl or settings.response_cache_ttl_seconds
+        self.backend = None
+        self._backend_lock = threading.Lock()
+        self._counter_lock = threading.Lock()
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        self.errors = 0
+        self._stop = threading.Event()
+        self._listener: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend_name in ("memory", "redis")
+
+    def get_backend(self):
+        """Backend instance, created on first use (the redis client is only imported then)."""
+        if self.backend is None:
+            with self._backend_lock:
+                if self.backend is None:
+                    if self.backend_name == "redis":
+                        self.backend = RedisBackend()
+                    else:
+                        self.backend = MemoryBackend(settings.response_cache_max_bytes)
+        return self.backend
+
+    def key(self, namespace: str, request: Request, role: Optional[str]) -> str:
+        backend = self.get_backend()
+        query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+        digest = hashlib.sha256(f"{request.url.path}?{query}|{role}".encode()).hexdigest()[:32]
+        return f"{KEY_PREFIX}{namespace}:{backend.generation(namespace)}:{digest}"
+
+    def _count(self, counters: Dict[str, int], namespace: str):
+        with self._counter_lock:
+            counters[namespace] = counters.get(namespace, 0) + 1
+
+    def cached(self, namespace: str, ttl: int = None):
+        """
+        Decorator for GET endpoints that return a fastapi Response (e.g. model_response()).
+        Successful JSON responses are stored; a hit returns the stored bytes directly.
+        The endpoint needs a current_user parameter (its role is part of the key); a
+        Request parameter is added to its signature if it has none.
+        """
+        def decorator(endpoint):
+            if inspect.iscoroutinefunction(endpoint):
+                raise TypeError("response_cache.cached supports sync endpoints only")
+            signature = inspect.signature(endpoint)
+            adds_request = "request" not in signature.parameters
+            if adds_request:
+                signature = signature.replace(parameters=[
+                    *signature.parameters.values(),
+                    inspect.Parameter("request", inspect.Parameter.KEYWORD_ONLY, annotation=Request)
+                ])
+
+            @functools.wraps(endpoint)
+            def wrapper(*args, **kwargs):
+                request = kwargs.pop("request") if adds_request else kwargs["request"]
+                if not self.enabled:
+                    return endpoint(*args, **kwargs)
+                user = kwargs.get("current_user")
+                role = getattr(getattr(user, "role", None), "value", None)
+                try:
+                    key = self.key(namespace, request, role)
+                    hit = self.get_backend().get(key)
+                except Exception as e:
+                    logger.warning(f"Response cache unavailable: {e}")
+                    self.errors += 1
+                    return endpoint(*args, **kwargs)
+                if hit is not None:
+                    self._count(self.hits, namespace)
+                    media_type, body = hit
+                    return Response(content=body, media_type=media_type, headers={"X-Cache": "HIT"})
+
+                self._count(self.misses, namespace)
+                result = endpoint(*args, **kwargs)
+                if isinstance(result, Response) and result.status_code == 200 and result.media_type:
+                    try:
+                        self.get_backend().set(key, result.media_type, result.body, ttl or self.ttl)
+                    except Exception as e:
+                        logger.warning(f"Could not store cached response: {e}")
+                        self.errors += 1
+                    result.headers["X-Cache"] = "MISS"
+                return result
+
+            wrapper.__signature__ = signature
+            return wrapper
+        return decorator
+
+    def invalidate(self, db: Session, namespaces: Iterable[str]):
+        """
+        Invalidate namespaces when db's transaction commits. With the memory backend the
+        other workers are told through pg_notify, which PostgreSQL delivers on commit.
+        """
+        if not self.enabled:
+            return
+        pending = db.info.setdefault(PENDING_KEY, set())
+        new = set(namespaces) - pending
+        if not new:
+            return
+        pending.update(new)
+        if self.backend_name == "memory":
+            db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": NOTIFY_CHANNEL, "payload": ",".join(sorted(new))})
+
+    def bump(self, namespaces: Iterable[str]):
+        backend = self.get_backend()
+        for namespace in namespaces:
+            try:
+                backend.bump(namespace)
+            except Exception as e:
+                logger.error(f"Could not invalidate cached {namespace} responses: {e}")
+                self.errors += 1
+
+    def metrics(self) -> dict:
+        hits, misses = sum(self.hits.values()), sum(self.misses.values())
+        metrics = {
+            "enabled": self.enabled,
+            "ttl_seconds": self.ttl,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / (hits + misses), 3) if hits + misses else None,
+            "errors": self.errors,
+            "namespaces": {
+                namespace: {
+                    "hits": self.hits.get(namespace, 0),
+                    "misses": self.misses.get(namespace, 0),
+                }
+                for namespace in sorted(set(self.hits) | set(self.misses))
+            },
+        }
+        if self.enabled:
+            metrics.update(self.get_backend().stats())
+        return metrics
+
+    def start_listener(self):
+        """LISTEN for invalidations from other workers (memory backend only, idempotent)."""
+        if self.backend_name != "memory" or (self._listener and self._listener.is_alive()):
+            return
+        self._stop.clear()
+        self._listener = threading.Thread(target=self._listen, name="response-cache-listener", daemon=True)
+        self._listener.start()
+
+    def stop_listener(self):
+        self._stop.set()
+        if self._listener:
+            self._listener.join(timeout=1)
+
+    def _listen(self):
+        while not self._stop.is_set():
+            dbapi_connection = None
+            try:
+                # Dedicated connection, detached so it never returns to the pool
+                pooled = engine.raw_connection()
+                pooled.detach()
+                dbapi_connection = pooled.dbapi_connection
+                dbapi_connection.autocommit = True
+                with dbapi_connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                # Writes may have happened while we were not listening
+                self.get_backend().clear()
+                while not self._stop.is_set():
+                    if select.select([dbapi_connection], [], [], 5.0) == ([], [], []):
+                        continue
+                    dbapi_connection.poll()
+                    while dbapi_connection.notifies:
+                        notify = dbapi_connection.notifies.pop(0)
+                        self.bump(notify.payload.split(","))
+            except Exception as e:
+                logger.warning(f"Response cache invalidation listener error, retrying: {e}")
+                self._stop.wait(5.0)
+            finally:
+                if dbapi_connection is not None:
+                    try:
+                        dbapi_connection.close()
+                    except Exception:
+                        pass
+
+response_cache = ResponseCache()
+
+@event.listens_for(Session, "after_commit")
+def _bump_after_commit(session):
+    namespaces = session.info.pop(PENDING_KEY, None)
+    if namespaces:
+        response_cache.bump(namespaces)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session):
+    session.info.pop(PENDING_KEY, None)
+
+def invalidates(*namespaces: str):
+    """Router dependency: mutating requests on the router invalidate these namespaces."""
+    def dependency(request: Request, db: Session = Depends(get_db)):
+        if request.method not in ("GET", "HEAD", "OPTIONS"):
+            response_cache.invalidate(db, namespaces)
+    return Depends(dependency)
@@ -0,0 +1,97 @@
+from typing import Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, Request
+from models import User
+from auth import get_current_admin_user
+from audit_sink import audit_sink
+from image_pipeline import image_pipeline
+from response_cache import response_cache
+from pdf_renderer import pdf_renderer
+
+router = APIRouter()
+
+@router.get("/index-report")
+def get_index_report(
+    top: int = 20,
+    current_user: User = Depends(get_current_admin_user)
+):
+    """
+    Index usage report: unused and duplicate indexes, sequential scan counts,
+    top queries from pg_stat_statements and suggested composite/partial indexes.
+    """
+    from index_advisor import build_report
+    return build_report(top=min(top, 100))
+
+@router.get("/audit-sink")
+def get_audit_sink_metrics(current_user: User = Depends(get_current_admin_user)):
+    """Queue depth, throughput and drop counters of the background audit log writer."""
+    return audit_sink.metrics()
+
+@router.get("/image-pipeline")
+def get_image_pipeline_metrics(current_user: User = Depends(get_current_admin_user)):
+    """Worker count, queue depth and average processing/wait time of the photo pipeline."""
+    return image_pipeline.metrics()
+
+@router.get("/response-cache")
+def get_response_cache_metrics(current_user: User = Depends(get_current_admin_user)):
+    """Hit ratio per namespace, entries and memory used by the GET response cache."""
+    return response_cache.metrics()
+
+@router.get("/pdf-renderer")
+def get_pdf_renderer_metrics(current_user: User = Depends(get_current_admin_user)):
+    """Render counts, queue depth, average render/wait time and size of the visit PDF cache."""
+    return pdf_renderer.metrics()
+
+@router.post("/audit-retention")
+def run_audit_retention(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    retention_days: Optional[int] = None,
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Archive audit log entries older than the retention period in the background."""
+    from audit_archive import archive_old_audit_logs
+    request.state.audit_parameters = {"retention_days": retention_days}
+    background_tasks.add_task(archive_old_audit_logs, retention_days)
+    return {"message": "Audit log archival started"}
+
+def refresh_visit_rollup(days: int, full: bool):
+    from db import engine
+    from visit_rollup import backfill, invalidate_cached_totals, refresh_recent
+    if full:
+        backfill(engine)
+    else:
+        refresh_recent(engine, days)
+    invalidate_cached_totals()
+
+@router.post("/visit-rollup/refresh")
+def run_visit_rollup_refresh(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    days: int = 3,
+    full: bool = False,
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Recompute the dashboard rollup for the last days (or all history with full=true) in the background."""
+    request.state.audit_parameters = {"days": days, "full": full}
+    background_tasks.add_task(refresh_visit_rollup, days, full)
+    return {"message": "Visit rollup refresh started"}
+
+@router.get("/storage-report")
+def get_storage_report(current_user: User = Depends(get_current_admin_user)):
+    """Stored upload bytes, duplicate uploads avoided by content-hash dedup and bytes saved."""
+    from file_gc import storage_report
+    return storage_report()
+
+@router.post("/file-gc")
+def run_file_gc(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    grace_hours: Optional[int] = None,
+    dry_run: bool = False,
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Recount file references and delete unreferenced uploads in the background."""
+    from file_gc import collect_garbage
+    request.state.audit_parameters = {"grace_hours": grace_hours, "dry_run": dry_run}
+    background_tasks.add_task(collect_garbage, grace_hours, dry_run)
+    return {"message": "File garbage collection started"}
@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import date
+from db import get_db
+from models import User, VisitStatus
+from schemas import VisitRollupRow
+from auth import get_current_user
+from serialization import model_list_response
+from response_cache import response_cache
+from visit_rollup import DIMENSIONS, query_rollup
+
+router = APIRouter()
+
+@router.get("/visit-rollup", response_model=List[VisitRollupRow])
+@response_cache.cached("analytics")
+def get_visit_rollup(
+    group_by: Optional[str] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    user_id: Optional[int] = None,
+    region: Optional[str] = None,
+    visit_status: Optional[VisitStatus] = None,
+    visit_purpose: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Visit counts, order value and satisfaction/score sums from the daily rollup, for days
+    start <= day < end. group_by=day,region (any of day, user_id, region, visit_status,
+    visit_purpose) returns one row per group; without it a single total row is returned.
+    """
+    names = [name.strip() for name in (group_by or "").split(",") if name.strip()]
+    unknown = sorted(set(names) - set(DIMENSIONS))
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown group_by: {', '.join(unknown)}. Available: {', '.join(DIMENSIONS)}"
+        )
+    filters = {
+        "user_id": user_id,
+        "region": region,
+        "visit_status": visit_status.value if visit_status else None,
+        "visit_purpose": visit_purpose,
+    }
+    rows = query_rollup(
+        db,
+        group_by=[name for name in DIMENSIONS if name in names],
+        start=start,
+        end=end,
+        filters={name: value for name, value in filters.items() if value is not None},
+    )
+    return model_list_response(VisitRollupRow, rows)
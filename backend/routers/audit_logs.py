@@ -1,13 +1,30 @@
+import base64
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, tuple_
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from datetime import datetime
 from db import get_db
 from models import AuditLog, User
-from schemas import AuditLogCreate, AuditLogResponse
-from auth import get_current_user
+from schemas import AuditLogCreate, AuditLogResponse, AuditLogPage
+from auth import get_current_user, get_current_admin_user
+from audit_archive import MONTH_PATTERN, load_index, search_archive
+from serialization import model_list_response
 
 router = APIRouter()
 
+def encode_cursor(created_at: datetime, log_id: int) -> str:
+    """Opaque keyset cursor for the (created_at, id) position of the last row on a page."""
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{log_id}".encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        created_at, log_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(log_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @router.post("", response_model=AuditLogResponse)
 @router.post("/", response_model=AuditLogResponse)
 def create_audit_log(
@@ -15,7 +32,7 @@ def create_audit_log(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    db_log = AuditLog(**log.dict())
+    db_log = AuditLog(**log.model_dump())
     db.add(db_log)
     db.commit()
     db.refresh(db_log)
@@ -26,6 +43,8 @@ def create_audit_log(
 def list_audit_logs(
     actor_user_id: Optional[int] = None,
     target_user_id: Optional[int] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
@@ -36,7 +55,79 @@ def list_audit_logs(
         query = query.filter(AuditLog.actor_user_id == actor_user_id)
     if target_user_id:
         query = query.filter(AuditLog.target_user_id == target_user_id)
-    return query.order_by(AuditLog.created_at.desc()).offset(skip).limit(limit).all()
+    # created_at bounds let PostgreSQL prune monthly partitions (see migration.py)
+    if created_after is not None:
+        query = query.filter(AuditLog.created_at >= created_after)
+    if created_before is not None:
+        query = query.filter(AuditLog.created_at < created_before)
+    return model_list_response(AuditLogResponse, query.order_by(AuditLog.created_at.desc()).offset(skip).limit(limit).all())
+
+@router.get("/search", response_model=AuditLogPage)
+def search_audit_logs(
+    action: Optional[str] = None,
+    actor_user_id: Optional[int] = None,
+    target_user_id: Optional[int] = None,
+    target_email_prefix: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Filterable audit log browsing with keyset paging on (created_at, id).
+    Each filter combination is served by a composite index ending in (created_at DESC, id DESC)
+    (see add_performance_indexes.py), so every page costs the same no matter how deep it is.
+    """
+    query = db.query(AuditLog)
+    if action:
+        query = query.filter(AuditLog.action == action)
+    if actor_user_id:
+        query = query.filter(AuditLog.actor_user_id == actor_user_id)
+    if target_user_id:
+        query = query.filter(AuditLog.target_user_id == target_user_id)
+    if target_email_prefix:
+        escaped = target_email_prefix.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        query = query.filter(func.lower(AuditLog.target_email).like(f"{escaped}%", escape="\\"))
+    if created_after is not None:
+        query = query.filter(AuditLog.created_at >= created_after)
+    if created_before is not None:
+        query = query.filter(AuditLog.created_at < created_before)
+    if cursor:
+        cursor_created_at, cursor_id = decode_cursor(cursor)
+        query = query.filter(tuple_(AuditLog.created_at, AuditLog.id) < tuple_(cursor_created_at, cursor_id))
+    
+    effective_limit = max(1, min(limit, 500))
+    # Fetch one extra row to know whether another page exists
+    rows = query.order_by(AuditLog.created_at.desc(), AuditLog.id.desc()).limit(effective_limit + 1).all()
+    items = rows[:effective_limit]
+    next_cursor = None
+    if len(rows) > effective_limit and items[-1].created_at is not None:
+        next_cursor = encode_cursor(items[-1].created_at, items[-1].id)
+    return {"items": items, "next_cursor": next_cursor}
+
+@router.get("/archive")
+def list_audit_log_archives(current_user: User = Depends(get_current_admin_user)):
+    """Archived months with their row counts, id ranges and time ranges."""
+    return load_index()
+
+@router.get("/archive/{month}")
+def search_audit_log_archive(
+    month: str,
+    action: Optional[str] = None,
+    actor_user_id: Optional[int] = None,
+    target_user_id: Optional[int] = None,
+    target_email_prefix: Optional[str] = None,
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Stream the matching entries of one archived month (YYYY-MM) as NDJSON."""
+    if not MONTH_PATTERN.match(month) or month not in load_index():
+        raise HTTPException(status_code=404, detail="Archive not found")
+    return StreamingResponse(
+        search_archive(month, action, actor_user_id, target_user_id, target_email_prefix),
+        media_type="application/x-ndjson"
+    )
 
 @router.get("/{log_id}", response_model=AuditLogResponse)
 def get_audit_log(
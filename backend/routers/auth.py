@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import timedelta
@@ -9,14 +9,21 @@ from auth import (
     authenticate_user,
     get_current_user,
     create_access_token,
-    get_password_hash
+    get_password_hash,
+    set_media_cookie,
+    clear_media_cookie
 )
 from config import ACCESS_TOKEN_EXPIRE_MINUTES
 
 router = APIRouter()
 
 @router.post("/login", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(
+    request: Request,
+    response: Response,
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: Session = Depends(get_db)
+):
     user = authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
@@ -28,10 +35,11 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
     access_token = create_access_token(
         data={"sub": user.email}, expires_delta=access_token_expires
     )
+    set_media_cookie(response, request, user.email)
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/login-json", response_model=Token)
-async def login_json(login_data: LoginRequest, db: Session = Depends(get_db)):
+async def login_json(request: Request, response: Response, login_data: LoginRequest, db: Session = Depends(get_db)):
     user = authenticate_user(db, login_data.email, login_data.password)
     if not user:
         raise HTTPException(
@@ -43,18 +51,32 @@ async def login_json(login_data: LoginRequest, db: Session = Depends(get_db)):
     access_token = create_access_token(
         data={"sub": user.email}, expires_delta=access_token_expires
     )
+    set_media_cookie(response, request, user.email)
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=UserResponse)
-async def read_users_me(current_user: User = Depends(get_current_user)):
+async def read_users_me(request: Request, response: Response, current_user: User = Depends(get_current_user)):
+    # Also (re)issues the media cookie for sessions that started before it existed
+    set_media_cookie(response, request, current_user.email)
     return current_user
 
 @router.post("/refresh", response_model=Token)
-async def refresh_token(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    """Refresh the access token for the current user"""
+async def refresh_token(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Refresh the access token (and the media cookie) for the current user"""
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": current_user.email}, expires_delta=access_token_expires
     )
+    set_media_cookie(response, request, current_user.email)
     return {"access_token": access_token, "token_type": "bearer"}
 
+@router.post("/logout", status_code=204)
+async def logout(response: Response):
+    """Drop the media cookie; the bearer token is discarded by the client"""
+    clear_media_cookie(response)
+
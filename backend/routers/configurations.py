@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import insert, func, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from db import get_db
 from models import Configuration, User
-from schemas import ConfigurationCreate, ConfigurationUpdate, ConfigurationResponse
+from schemas import ConfigurationCreate, ConfigurationUpdate, ConfigurationResponse, ConfigurationBulkUpsert
 from auth import get_current_user
+from configuration_registry import configuration_registry
 
 router = APIRouter()
 
@@ -15,15 +18,19 @@ def create_configuration(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    db_config = Configuration(**config.dict())
+    db_config = Configuration(**config.model_dump())
     db.add(db_config)
+    configuration_registry.notify_change(db)
     db.commit()
+    configuration_registry.invalidate()
     db.refresh(db_config)
     return db_config
 
 @router.get("", response_model=List[ConfigurationResponse])
 @router.get("/", response_model=List[ConfigurationResponse])
 def list_configurations(
+    request: Request,
+    response: Response,
     config_type: Optional[str] = None,
     is_active: Optional[bool] = None,
     skip: int = 0,
@@ -31,12 +38,79 @@ def list_configurations(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    query = db.query(Configuration)
-    if config_type:
-        query = query.filter(Configuration.config_type == config_type)
-    if is_active is not None:
-        query = query.filter(Configuration.is_active == is_active)
-    return query.order_by(Configuration.display_order).offset(skip).limit(limit).all()
+    # Served from the in-memory registry; the ETag changes whenever any configuration changes
+    configs, etag = configuration_registry.list(db, config_type, is_active, skip, limit)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return configs
+
+@router.put("/bulk", response_model=List[ConfigurationResponse])
+def bulk_upsert_configurations(
+    payload: ConfigurationBulkUpsert,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Create or update many items of one config_type in a single transaction.
+    Items are matched by id, or by config_value within the type; display_order defaults
+    to the item's position so a reordered list can be saved in one request.
+    Items that are not listed are left unchanged. Returns the full list for the type.
+    """
+    # Serialize bulk saves of the same type until commit: row locks would not cover values
+    # that don't exist yet, so two saves could both insert the same config_value
+    db.execute(text("SELECT pg_advisory_xact_lock(hashtext('configurations:' || :config_type))"), {"config_type": payload.config_type})
+    existing = {
+        config_value: config_id
+        for config_id, config_value in db.query(Configuration.id, Configuration.config_value)
+        .filter(Configuration.config_type == payload.config_type)
+    }
+    existing_ids = set(existing.values())
+    
+    updates = {}
+    inserts = {}
+    for position, item in enumerate(payload.items):
+        row = {
+            "config_type": payload.config_type,
+            "config_name": item.config_name,
+            "config_value": item.config_value,
+            "is_active": item.is_active if item.is_active is not None else True,
+            "display_order": item.display_order if item.display_order is not None else position,
+        }
+        config_id = item.id or existing.get(item.config_value)
+        if config_id:
+            if config_id not in existing_ids:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Configuration {config_id} does not belong to '{payload.config_type}'"
+                )
+            updates[config_id] = {"id": config_id, **row}  # Last occurrence wins
+        else:
+            inserts[item.config_value] = row
+    
+    if updates:
+        stmt = pg_insert(Configuration).values(list(updates.values()))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Configuration.id],
+            set_={
+                "config_name": stmt.excluded.config_name,
+                "config_value": stmt.excluded.config_value,
+                "is_active": stmt.excluded.is_active,
+                "display_order": stmt.excluded.display_order,
+                "updated_at": func.now(),
+            }
+        )
+        db.execute(stmt)
+    if inserts:
+        db.execute(insert(Configuration).values(list(inserts.values())))
+    
+    configuration_registry.notify_change(db)
+    db.commit()
+    configuration_registry.invalidate()
+    return db.query(Configuration).filter(
+        Configuration.config_type == payload.config_type
+    ).order_by(Configuration.display_order, Configuration.id).all()
 
 @router.get("/{config_id}", response_model=ConfigurationResponse)
 def get_configuration(
@@ -60,11 +134,13 @@ def update_configuration(
     if not config:
         raise HTTPException(status_code=404, detail="Configuration not found")
     
-    update_data = config_update.dict(exclude_unset=True)
+    update_data = config_update.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(config, field, value)
     
+    configuration_registry.notify_change(db)
     db.commit()
+    configuration_registry.invalidate()
     db.refresh(config)
     return config
 
@@ -78,6 +154,8 @@ def delete_configuration(
     if not config:
         raise HTTPException(status_code=404, detail="Configuration not found")
     db.delete(config)
+    configuration_registry.notify_change(db)
     db.commit()
+    configuration_registry.invalidate()
     return {"message": "Configuration deleted successfully"}
 
@@ -1,12 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Union
 from db import get_db
 from models import Customer, User
-from schemas import CustomerCreate, CustomerUpdate, CustomerResponse
+from schemas import CustomerCreate, CustomerUpdate, CustomerResponse, CustomerRef
 from auth import get_current_user
+from batch_lookup import parse_id_list
+from serialization import model_list_response, model_response
+from fieldsets import parse_fields, partial_schema, load_columns
+from response_cache import response_cache, invalidates
 
-router = APIRouter()
+router = APIRouter(dependencies=[invalidates("customers")])
 
 @router.post("", response_model=CustomerResponse)
 @router.post("/", response_model=CustomerResponse)
@@ -23,36 +27,72 @@ def create_customer(
     if not customer.shop_type or not customer.shop_type.strip():
         raise HTTPException(status_code=400, detail="Shop type is required")
     
-    db_customer = Customer(**customer.dict())
+    db_customer = Customer(**customer.model_dump())
     db.add(db_customer)
     db.commit()
     db.refresh(db_customer)
     return db_customer
 
-@router.get("", response_model=List[CustomerResponse])
-@router.get("/", response_model=List[CustomerResponse])
+@router.get("", response_model=Union[List[CustomerResponse], List[CustomerRef]])
+@router.get("/", response_model=Union[List[CustomerResponse], List[CustomerRef]])
+@response_cache.cached("customers")
 def list_customers(
     status: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
+    ids: Optional[str] = None,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
+    """
+    List customers. With ids=1,2,3 the given customers are resolved in one IN query instead,
+    returning only the fields lists need to label a visit (unknown ids are left out).
+    fields=id,shop_name,... selects the returned (and loaded) CustomerResponse fields.
+    """
+    names = parse_fields(fields, CustomerResponse)
+    if names is not None:
+        query = db.query(Customer).options(load_columns(Customer, CustomerResponse, names))
+        if ids is not None:
+            id_list = parse_id_list(ids)
+            query = query.filter(Customer.id.in_(id_list)).order_by(Customer.id)
+        else:
+            if status:
+                query = query.filter(Customer.status == status)
+            query = query.offset(skip).limit(limit)
+        return model_list_response(partial_schema(CustomerResponse, names), query.all())
+    if ids is not None:
+        id_list = parse_id_list(ids)
+        if not id_list:
+            return []
+        customers = db.query(
+            Customer.id, Customer.shop_name, Customer.shop_type, Customer.city, Customer.region,
+            Customer.visit_notes, Customer.status
+        ).filter(Customer.id.in_(id_list)).order_by(Customer.id).all()
+        return model_list_response(CustomerRef, customers)
     query = db.query(Customer)
     if status:
         query = query.filter(Customer.status == status)
-    return query.offset(skip).limit(limit).all()
+    return model_list_response(CustomerResponse, query.offset(skip).limit(limit).all())
 
 @router.get("/{customer_id}", response_model=CustomerResponse)
+@response_cache.cached("customers")
 def get_customer(
     customer_id: int, 
+    fields: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    customer = db.query(Customer).filter(Customer.id == customer_id).first()
+    names = parse_fields(fields, CustomerResponse)
+    query = db.query(Customer)
+    if names is not None:
+        query = query.options(load_columns(Customer, CustomerResponse, names))
+    customer = query.filter(Customer.id == customer_id).first()
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
-    return customer
+    if names is not None:
+        return model_response(partial_schema(CustomerResponse, names), customer)
+    return model_response(CustomerResponse, customer)
 
 @router.put("/{customer_id}", response_model=CustomerResponse)
 def update_customer(
@@ -65,7 +105,7 @@ def update_customer(
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
     
-    update_data = customer_update.dict(exclude_unset=True)
+    update_data = customer_update.model_dump(exclude_unset=True)
     
     # Validate shop_name and shop_type only if they are being updated
     if 'shop_name' in update_data:
@@ -1,68 +1,267 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from fastapi.responses import JSONResponse
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import Optional
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional, Literal, Tuple
 from db import get_db
-from auth import get_current_user
-from models import User
+from auth import get_current_user, get_media_user
+from models import User, StoredFile
+from file_storage import (
+    stream_upload, commit_temp, blob_path, parse_range, StoredFileResponse, MEDIA_CACHE_CONTROL
+)
+from image_pipeline import image_pipeline, is_processable
 import os
+import logging
+from urllib.parse import quote
 import uuid
-import base64
 from datetime import datetime
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
-# Directory to store uploaded files (create if doesn't exist)
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+def find_upload(db: Session, upload_sha256: str) -> Optional[StoredFile]:
+    """The stored upload with identical content, if any (its blob may be missing on disk)."""
+    return db.query(StoredFile).filter(StoredFile.upload_sha256 == upload_sha256).first()
 
-@router.post("/upload")
+def blob_exists(stored: StoredFile) -> bool:
+    return blob_path(stored.storage_path).is_file()
+
+def repair_upload(db: Session, fresh: StoredFile, derived: List[StoredFile]) -> Tuple[Optional[StoredFile], List[str]]:
+    """
+    Point a stored upload whose blob went missing (manual cleanup, restored database) at the
+    blob and variants just written for the same content, keeping its id so existing references
+    work again. Returns the row and the storage paths it no longer uses, or (None, []) when a
+    concurrent upload repaired it first.
+    """
+    stored = db.query(StoredFile).filter(StoredFile.id == fresh.id).with_for_update().populate_existing().first()
+    if stored is None:
+        # Deleted meanwhile (file GC): store this upload as a new row under the same id
+        db.add(fresh)
+        db.add_all(derived)
+        return fresh, []
+    if blob_exists(stored):
+        return None, []
+    old_variants = db.query(StoredFile).filter(StoredFile.source_id == stored.id).all()
+    replaced = [stored.storage_path] + [variant.storage_path for variant in old_variants]
+    for key in ("sha256", "size", "content_type", "storage_path", "width", "height", "upload_size"):
+        setattr(stored, key, getattr(fresh, key))
+    stored.upload_count = (stored.upload_count or 1) + 1
+    stored.last_uploaded_at = func.now()
+    for variant in old_variants:
+        db.delete(variant)
+    db.flush()
+    db.add_all(derived)
+    return stored, replaced
+
+def reuse_upload(db: Session, stored: StoredFile) -> List[StoredFile]:
+    """Count another upload of existing content (keeps it safe from GC) and return its variants."""
+    db.query(StoredFile).filter(StoredFile.id == stored.id).update(
+        {
+            StoredFile.upload_count: func.coalesce(StoredFile.upload_count, 1) + 1,
+            StoredFile.last_uploaded_at: func.now()
+        },
+        synchronize_session=False
+    )
+    db.commit()
+    return db.query(StoredFile).filter(StoredFile.source_id == stored.id).all()
+
+def upload_response(stored: StoredFile, derived: List[StoredFile], filename: Optional[str], deduplicated: bool) -> dict:
+    file_url = f"/api/files/{stored.id}"
+    return {
+        "url": file_url,
+        "file_url": file_url,
+        "fileId": stored.id,
+        "filename": filename,
+        "size": stored.size,
+        "content_type": stored.content_type,
+        "sha256": stored.sha256,
+        "width": stored.width,
+        "height": stored.height,
+        "deduplicated": deduplicated,
+        "variants": {
+            variant.variant: {
+                "fileId": variant.id,
+                "url": f"{file_url}?variant={variant.variant}",
+                "size": variant.size,
+                "width": variant.width,
+                "height": variant.height
+            }
+            for variant in derived
+        }
+    }
+
+# The multipart body is parsed by stream_upload, so describe the form for the API docs here
+UPLOAD_REQUEST_BODY = {
+    "required": True,
+    "content": {
+        "multipart/form-data": {
+            "schema": {
+                "type": "object",
+                "properties": {"file": {"type": "string", "format": "binary"}},
+                "required": ["file"],
+            }
+        }
+    },
+}
+
+@router.post("/upload", openapi_extra={"requestBody": UPLOAD_REQUEST_BODY})
 async def upload_file(
-    file: UploadFile = File(...),
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Upload a file and return a data URL or file path.
-    For now, returns a data URL to avoid file storage setup.
-    In production, you should save files to cloud storage (S3, etc.)
+    Upload a file (multipart field "file"). The file part is written to disk once, as the
+    body arrives (never held in memory as a whole), limited to UPLOAD_MAX_BYTES, and
+    recorded in stored_files.
+    Photos go through the image pipeline: orientation fixed, metadata stripped, re-encoded at
+    a capped resolution, with medium and thumbnail variants listed under "variants".
+    The returned url points at GET /api/files/{fileId}, so the file is fetched (and cached)
+    separately instead of travelling inline in every payload that references it.
+    Content that was uploaded before (same SHA-256) is stored once: the existing id is returned.
     """
+    streamed = await stream_upload(request)
+    existing = find_upload(db, streamed.sha256)
+    if existing is not None and blob_exists(existing):
+        streamed.tmp_path.unlink(missing_ok=True)
+        return upload_response(existing, reuse_upload(db, existing), streamed.filename, deduplicated=True)
+
+    blob_id = str(uuid.uuid4())
+    # A row whose blob is missing keeps its id and is repaired with this upload
+    file_id = existing.id if existing is not None else blob_id
+    file_ext = os.path.splitext(streamed.filename)[1].lower() if streamed.filename else ""
+    mime_type = streamed.content_type or "application/octet-stream"
+    # Shard by hash prefix so no single directory grows unbounded
+    stem = f"{streamed.sha256[:2]}/{blob_id}"
+    relative_path = f"{stem}{file_ext}"
+    written_paths = [relative_path]
+
     try:
-        # Read file content
-        contents = await file.read()
-        
-        # Convert to base64 data URL
-        file_ext = os.path.splitext(file.filename)[1] if file.filename else ""
-        mime_type = file.content_type or "application/octet-stream"
-        
-        # Create data URL
-        base64_content = base64.b64encode(contents).decode('utf-8')
-        data_url = f"data:{mime_type};base64,{base64_content}"
-        
-        # Generate file ID
-        file_id = str(uuid.uuid4())
-        
-        return {
-            "url": data_url,
-            "file_url": data_url,
-            "fileId": file_id,
-            "filename": file.filename,
-            "size": len(contents),
-            "content_type": mime_type
-        }
+        await run_in_threadpool(commit_temp, streamed, relative_path)
+        stored = StoredFile(
+            id=file_id,
+            sha256=streamed.sha256,
+            size=streamed.size,
+            content_type=mime_type,
+            filename=streamed.filename,
+            storage_path=relative_path,
+            upload_sha256=streamed.sha256,
+            upload_size=streamed.size,
+            upload_count=1,
+            created_by=current_user.id
+        )
+        derived = []
+        if is_processable(mime_type):
+            try:
+                variants = await image_pipeline.process(blob_path(relative_path), stem)
+            except Exception as e:
+                # Unreadable or unsupported images are kept exactly as uploaded
+                logger.warning(f"Image processing failed for {streamed.filename}, storing original: {e}")
+                variants = []
+            written_paths += [v["storage_path"] for v in variants]
+            for variant in variants:
+                if variant["variant"] == "full":
+                    # The capped, metadata-free re-encode replaces the original upload
+                    for key in ("sha256", "size", "content_type", "storage_path", "width", "height"):
+                        setattr(stored, key, variant[key])
+                else:
+                    derived.append(StoredFile(
+                        id=str(uuid.uuid4()),
+                        source_id=file_id,
+                        variant=variant["variant"],
+                        sha256=variant["sha256"],
+                        size=variant["size"],
+                        content_type=variant["content_type"],
+                        filename=streamed.filename,
+                        storage_path=variant["storage_path"],
+                        width=variant["width"],
+                        height=variant["height"],
+                        created_by=current_user.id
+                    ))
+        replaced = []
+        if existing is not None:
+            repaired, replaced = repair_upload(db, stored, derived)
+            if repaired is None:
+                # Repaired by a concurrent upload of the same content; hand out that one
+                db.rollback()
+                for path in written_paths:
+                    blob_path(path).unlink(missing_ok=True)
+                existing = find_upload(db, streamed.sha256)
+                return upload_response(existing, reuse_upload(db, existing), streamed.filename, deduplicated=True)
+            stored = repaired
+        else:
+            db.add(stored)
+            db.add_all(derived)
+        db.commit()
+        if stored.storage_path != relative_path:
+            blob_path(relative_path).unlink(missing_ok=True)
+        for path in replaced:
+            blob_path(path).unlink(missing_ok=True)
     except Exception as e:
+        db.rollback()
+        streamed.tmp_path.unlink(missing_ok=True)
+        for path in written_paths:
+            blob_path(path).unlink(missing_ok=True)
+        if isinstance(e, IntegrityError):
+            # An identical file was stored concurrently; hand out that one
+            existing = find_upload(db, streamed.sha256)
+            if existing is not None and blob_exists(existing):
+                return upload_response(existing, reuse_upload(db, existing), streamed.filename, deduplicated=True)
         raise HTTPException(status_code=500, detail=f"File upload failed: {str(e)}")
 
+    return upload_response(stored, derived, streamed.filename, deduplicated=False)
+
 @router.get("/{file_id}")
-async def get_file(
+@router.head("/{file_id}")
+def get_file(
     file_id: str,
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    variant: Optional[Literal["medium", "thumb"]] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_media_user)
 ):
     """
-    Get file by ID (placeholder - in production, retrieve from storage)
+    Serve a stored file (or its medium/thumbnail variant) with Range support.
+    Authenticated by bearer token or, for <img> tags, by the media cookie set at login.
+    The strong ETag is the content hash; browsers may keep the response privately for a
+    day (repair_upload can re-point an id whose blob went missing).
     """
-    raise HTTPException(status_code=404, detail="File not found")
+    stored = db.query(StoredFile).filter(StoredFile.id == file_id).first()
+    if stored is None or stored.source_id is not None:
+        raise HTTPException(status_code=404, detail="File not found")
+    if variant:
+        # Non-image uploads have no variants; the original is the best match
+        stored = db.query(StoredFile).filter(
+            StoredFile.source_id == file_id,
+            StoredFile.variant == variant
+        ).first() or stored
 
+    path = blob_path(stored.storage_path)
+    if not path.is_file():
+        logger.error(f"Stored file {stored.id} is missing on disk at {stored.storage_path}")
+        raise HTTPException(status_code=404, detail="File not found")
 
+    etag = f'"{stored.sha256}"'
+    headers = {"ETag": etag, "Cache-Control": MEDIA_CACHE_CONTROL}
+    if stored.filename:
+        headers["Content-Disposition"] = f"inline; filename*=UTF-8''{quote(stored.filename)}"
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
 
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if if_range is None or if_range.strip() == etag:
+        try:
+            byte_range = parse_range(request.headers.get("range"), stored.size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{stored.size}"})
 
+    return StoredFileResponse(
+        path,
+        media_type=stored.content_type or "application/octet-stream",
+        headers=headers,
+        byte_range=byte_range,
+        send_body=request.method != "HEAD"
+    )
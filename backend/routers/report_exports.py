@@ -0,0 +1,67 @@
+import re
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException
+from models import User, UserRole
+from schemas import ReportExportCreate, ReportExportResponse
+from auth import get_current_manager_user
+from file_storage import StoredFileResponse
+from pdf_renderer import pdf_renderer
+from report_export import report_exporter, ACTIVE_STATUSES
+
+router = APIRouter()
+
+def get_export(job_id: str, current_user: User) -> dict:
+    """The job state, if it exists and belongs to the user (admins see every job)."""
+    job = report_exporter.load(job_id)
+    if job is None or (job["created_by"] != current_user.id and current_user.role != UserRole.admin):
+        raise HTTPException(status_code=404, detail="Report export not found")
+    return job
+
+@router.post("", response_model=ReportExportResponse, status_code=202)
+@router.post("/", response_model=ReportExportResponse, status_code=202)
+async def create_report_export(
+    export: ReportExportCreate,
+    current_user: User = Depends(get_current_manager_user)
+):
+    """
+    Start exporting the PDF reports of all matching visits (by default every completed visit)
+    into one ZIP. Poll GET /api/report-exports/{id} for progress, then download the ZIP.
+    """
+    if not pdf_renderer.available:
+        raise HTTPException(status_code=503, detail="PDF rendering is not available on this server")
+    return await report_exporter.start(export.model_dump(mode="json"), current_user.id)
+
+@router.get("", response_model=List[ReportExportResponse])
+@router.get("/", response_model=List[ReportExportResponse])
+def list_report_exports(current_user: User = Depends(get_current_manager_user)):
+    """Export jobs of the current user (all jobs for admins), newest first."""
+    return report_exporter.list(None if current_user.role == UserRole.admin else current_user.id)
+
+@router.get("/{job_id}", response_model=ReportExportResponse)
+def get_report_export(job_id: str, current_user: User = Depends(get_current_manager_user)):
+    """Status and progress (done / failed / total visits) of an export job."""
+    return get_export(job_id, current_user)
+
+@router.delete("/{job_id}")
+def delete_report_export(job_id: str, current_user: User = Depends(get_current_manager_user)):
+    """Cancel a running export, or delete a finished one and its ZIP."""
+    job = get_export(job_id, current_user)
+    if job["status"] in ACTIVE_STATUSES:
+        report_exporter.cancel(job_id)
+        return {"message": "Report export cancellation requested"}
+    report_exporter.delete(job_id)
+    return {"message": "Report export deleted successfully"}
+
+@router.get("/{job_id}/download")
+def download_report_export(job_id: str, current_user: User = Depends(get_current_manager_user)):
+    """The finished ZIP, streamed from disk."""
+    job = get_export(job_id, current_user)
+    path = report_exporter.zip_path(job_id)
+    if job["status"] != "completed" or not path.exists():
+        raise HTTPException(status_code=409, detail=f"Report export is {job['status']}, not ready for download")
+    filename = "visit-reports" + "".join(
+        "-" + re.sub(r"[^A-Za-z0-9]+", "-", job["filters"][key]).strip("-")
+        for key in ("region", "month") if job["filters"].get(key)
+    ) + ".zip"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    return StoredFileResponse(path, "application/zip", headers)
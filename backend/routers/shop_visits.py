@@ -1,15 +1,22 @@
 import logging
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy.orm import Session, load_only
 from typing import List, Optional
+from datetime import datetime
 from db import get_db
 from models import ShopVisit, User, VisitStatus
 from schemas import ShopVisitCreate, ShopVisitUpdate, ShopVisitResponse, ShopVisitSummary
 from auth import get_current_user
+from signatures import apply_signature
+from serialization import model_list_response, model_response
+from fieldsets import parse_fields, partial_schema, load_columns
+from response_cache import response_cache, invalidates
+from pdf_renderer import pdf_renderer
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+# Visit writes also change the dashboard rollup (see visit_rollup.py)
+router = APIRouter(dependencies=[invalidates("shop-visits", "analytics")])
 
 @router.post("", response_model=ShopVisitResponse)
 @router.post("/", response_model=ShopVisitResponse)
@@ -18,8 +25,8 @@ def create_shop_visit(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    # Create visit with all data - use dict(exclude_unset=False) to include all fields
-    visit_data = visit.dict(exclude_unset=False)
+    # Create visit with all data - use model_dump(exclude_unset=False) to include all fields
+    visit_data = visit.model_dump(exclude_unset=False)
     # Set created_by to current user ID
     visit_data['created_by'] = current_user.id
     
@@ -37,8 +44,10 @@ def create_shop_visit(
     if 'sales_data' in visit_data and visit_data['sales_data'] is None:
         visit_data['sales_data'] = {}
     
-    # Create the visit with all fields
+    # Create the visit with all fields; the signature is stored by reference
+    signature_data = {key: visit_data.pop(key) for key in ("signature", "signature_strokes") if key in visit_data}
     db_visit = ShopVisit(**visit_data)
+    apply_signature(db, db_visit, signature_data, current_user.id)
     db.add(db_visit)
     db.commit()
     db.refresh(db_visit)
@@ -46,37 +55,69 @@ def create_shop_visit(
 
 @router.get("", response_model=List[ShopVisitSummary])
 @router.get("/", response_model=List[ShopVisitSummary])
+@response_cache.cached("shop-visits")
 def list_shop_visits(
     customer_id: Optional[int] = None,
     is_draft: Optional[bool] = None,
     visit_status: Optional[VisitStatus] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
     skip: int = 0,
     limit: int = 100,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
+    """
+    List visits as ShopVisitSummary. fields=id,visit_status,... instead selects any
+    ShopVisitResponse fields (e.g. visit_photos for a gallery), loading only those columns.
+    """
+    names = parse_fields(fields, ShopVisitResponse)
+    schema = ShopVisitSummary if names is None else partial_schema(ShopVisitResponse, names)
     # Optimize query: Use indexed column for ordering and limit result set
     # Use ShopVisitSummary to exclude large fields (visit_photos, sales_data, signature, notes)
     # This reduces payload size from ~2MB to ~50KB for 50 visits
-    query = db.query(ShopVisit)
+    # Only the returned columns are loaded, so the large ones never leave the database
+    if names is None:
+        query = db.query(ShopVisit).options(
+            load_only(*[getattr(ShopVisit, name) for name in ShopVisitSummary.model_fields])
+        )
+    else:
+        query = db.query(ShopVisit).options(load_columns(ShopVisit, ShopVisitResponse, names))
     if customer_id:
         query = query.filter(ShopVisit.customer_id == customer_id)
     if is_draft is not None:
         query = query.filter(ShopVisit.is_draft == is_draft)
     if visit_status is not None:
         query = query.filter(ShopVisit.visit_status == visit_status)
+    # created_at bounds let PostgreSQL prune monthly partitions (see migration.py)
+    if created_after is not None:
+        query = query.filter(ShopVisit.created_at >= created_after)
+    if created_before is not None:
+        query = query.filter(ShopVisit.created_at < created_before)
     # Use created_at for ordering as it's more reliable and indexed
     # visit_date can be null for appointments
     # Limit to reasonable maximum to prevent excessive data loading
     effective_limit = min(limit, 1000)  # Cap at 1000 records max
-    return query.order_by(ShopVisit.created_at.desc()).offset(skip).limit(effective_limit).all()
+    visits = query.order_by(ShopVisit.created_at.desc()).offset(skip).limit(effective_limit).all()
+    return model_list_response(schema, visits)
 
 @router.get("/{visit_id}", response_model=ShopVisitResponse)
+@response_cache.cached("shop-visits")
 def get_shop_visit(
     visit_id: int, 
+    fields: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
+    names = parse_fields(fields, ShopVisitResponse)
+    if names is not None:
+        visit = db.query(ShopVisit).options(
+            load_columns(ShopVisit, ShopVisitResponse, names)
+        ).filter(ShopVisit.id == visit_id).first()
+        if not visit:
+            raise HTTPException(status_code=404, detail="Shop visit not found")
+        return model_response(partial_schema(ShopVisitResponse, names), visit)
     try:
         visit = db.query(ShopVisit).filter(ShopVisit.id == visit_id).first()
         if not visit:
@@ -90,7 +131,7 @@ def get_shop_visit(
         # Refresh to ensure all fields are loaded
         db.refresh(visit)
         
-        return visit
+        return model_response(ShopVisitResponse, visit)
     except HTTPException:
         # Re-raise HTTP exceptions (like 404) as-is
         raise
@@ -100,6 +141,37 @@ def get_shop_visit(
         # Return 500 with CORS headers by raising HTTPException
         raise HTTPException(status_code=500, detail=error_msg)
 
+@router.get("/{visit_id}/pdf")
+async def get_shop_visit_pdf(
+    visit_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    The visit report as PDF, rendered on the server from the same template as the browser
+    export (see pdf_renderer.py). Cached per visit version, so re-downloads come from disk.
+    """
+    if not pdf_renderer.available:
+        raise HTTPException(status_code=503, detail="PDF rendering is not available on this server")
+    try:
+        pdf = await pdf_renderer.render_visit(db, visit_id)
+    except Exception as e:
+        logger.error(f"Error rendering PDF for shop visit {visit_id}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Could not render the visit report. Please try again later.")
+    if pdf is None:
+        raise HTTPException(status_code=404, detail="Shop visit not found")
+
+    headers = {
+        "ETag": pdf.etag,
+        # Revalidated on every download; the ETag changes whenever the visit is edited
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": f'inline; filename="{pdf.filename}"',
+    }
+    if pdf.etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=pdf.content, media_type="application/pdf", headers=headers)
+
 @router.put("/{visit_id}", response_model=ShopVisitResponse)
 def update_shop_visit(
     visit_id: int,
@@ -113,7 +185,7 @@ def update_shop_visit(
             raise HTTPException(status_code=404, detail="Shop visit not found")
         
         # Get update data to check what fields are being updated
-        update_data = visit_update.dict(exclude_unset=True)
+        update_data = visit_update.model_dump(exclude_unset=True)
         
         # Define follow-up fields that can be edited even when status is "done"
         follow_up_fields = {'follow_up_notes', 'follow_up_assigned_user_id', 'follow_up_stage', 'follow_up_date'}
@@ -153,6 +225,9 @@ def update_shop_visit(
         if 'sales_data' in update_data and update_data['sales_data'] is None:
             update_data['sales_data'] = {}
         
+        # Store a new or changed signature by reference (removes it from update_data)
+        apply_signature(db, visit, update_data, current_user.id)
+        
         # Update only the fields that are provided
         for field, value in update_data.items():
             # Skip fields that shouldn't be updated via this endpoint
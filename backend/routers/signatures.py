@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy.orm import Session
+from typing import Literal
+from db import get_db
+from auth import get_media_user
+from models import User
+from signatures import signature_cache
+from file_storage import MEDIA_CACHE_CONTROL
+
+router = APIRouter()
+
+@router.get("/{signature_id}")
+@router.head("/{signature_id}")
+def get_signature(
+    signature_id: str,
+    request: Request,
+    format: Literal["svg", "png"] = "svg",
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_media_user)
+):
+    """
+    Render a stored signature as SVG (default, a few hundred bytes) or PNG.
+    Like uploaded files, signatures need the bearer token or the media cookie (<img> tags),
+    and responses are only cached privately by the user's browser.
+    """
+    rendered = signature_cache.get(db, signature_id, format)
+    if rendered is None:
+        raise HTTPException(status_code=404, detail="Signature not found")
+    content, media_type, etag = rendered
+    headers = {"ETag": etag, "Cache-Control": MEDIA_CACHE_CONTROL}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=content if request.method != "HEAD" else b"", media_type=media_type, headers=headers)
@@ -4,10 +4,13 @@ from typing import List, Dict, Any
 from datetime import datetime, timezone
 from db import get_db
 from models import UserProfile, User
-from schemas import UserProfileCreate, UserProfileUpdate, UserProfileResponse
+from schemas import UserProfileCreate, UserProfileUpdate, UserProfileResponse, UserSignatureResponse
 from auth import get_current_user
+from signatures import apply_signature
+from response_cache import invalidates
 
-router = APIRouter()
+# Profiles are joined into the user lists (avatar, status), so writes invalidate those
+router = APIRouter(dependencies=[invalidates("users")])
 
 @router.post("", response_model=UserProfileResponse)
 @router.post("/", response_model=UserProfileResponse)
@@ -16,7 +19,10 @@ def create_user_profile(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    db_profile = UserProfile(**profile.dict())
+    profile_data = profile.model_dump()
+    signature_data = {key: profile_data.pop(key) for key in ("signature", "signature_strokes")}
+    db_profile = UserProfile(**profile_data)
+    apply_signature(db, db_profile, signature_data, profile.user_id)
     db.add(db_profile)
     db.commit()
     db.refresh(db_profile)
@@ -65,7 +71,8 @@ def update_user_profile(
     if not profile:
         raise HTTPException(status_code=404, detail="User profile not found")
     
-    update_data = profile_update.dict(exclude_unset=True)
+    update_data = profile_update.model_dump(exclude_unset=True)
+    apply_signature(db, profile, update_data, profile.user_id)
     for field, value in update_data.items():
         setattr(profile, field, value)
     
@@ -97,34 +104,37 @@ async def save_user_signature(
         db.add(profile)
         db.flush()
     
-    # Save or update signature data (allows updates)
-    if "signature" in signature_data:
-        profile.signature = signature_data.get("signature")
-    if "signature_signer_name" in signature_data:
-        profile.signature_signer_name = signature_data.get("signature_signer_name")
-    
     # Always update signature_date when signature is saved
-    if signature_data.get("signature"):
+    if signature_data.get("signature") or signature_data.get("signature_strokes"):
         profile.signature_date = datetime.now(timezone.utc)
     
+    # Save or update signature data (allows updates); stored once in the signatures table
+    if "signature_signer_name" in signature_data:
+        profile.signature_signer_name = signature_data.get("signature_signer_name")
+    apply_signature(db, profile, dict(signature_data), user_id)
+    
     db.commit()
     db.refresh(profile)
     return profile
 
-@router.get("/user/{user_id}/signature", response_model=UserProfileResponse)
+@router.get("/user/{user_id}/signature", response_model=UserSignatureResponse)
 def get_user_signature(
     user_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get user's saved signature."""
+    """Get user's saved signature (only the signature columns are loaded, not the whole profile)."""
     # Users can only view their own signature
     if current_user.id != user_id:
         raise HTTPException(status_code=403, detail="Not authorized to view this user's signature")
     
-    profile = db.query(UserProfile).filter(UserProfile.user_id == user_id).first()
-    if not profile or not profile.signature:
+    signature = db.query(
+        UserProfile.signature,
+        UserProfile.signature_id,
+        UserProfile.signature_signer_name,
+        UserProfile.signature_date
+    ).filter(UserProfile.user_id == user_id).first()
+    if not signature or not (signature.signature or signature.signature_id):
         raise HTTPException(status_code=404, detail="No signature found for this user")
     
-    return profile
-
+    return signature
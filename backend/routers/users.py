@@ -1,12 +1,49 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import Session, contains_eager
+from typing import List, Optional, Union
 from db import get_db
-from models import User
-from schemas import UserCreate, UserUpdate, UserResponse
+from models import User, UserProfile, UserRole
+from schemas import UserCreate, UserUpdate, UserResponse, UserRef, UserPage
 from auth import get_password_hash, get_current_user
+from batch_lookup import parse_id_list
+from serialization import model_list_response, model_response
+from fieldsets import parse_fields, partial_schema, load_columns
+from response_cache import response_cache, invalidates
+import base64
 
-router = APIRouter()
+router = APIRouter(dependencies=[invalidates("users")])
+
+def users_with_profiles(db: Session):
+    """
+    Users LEFT JOINed with their profile in a single query. Only the profile columns
+    needed for lists are loaded, never the (large) base64 signature.
+    """
+    return db.query(User).outerjoin(User.profile).options(
+        contains_eager(User.profile).load_only(
+            UserProfile.id,
+            UserProfile.full_name,
+            UserProfile.avatar_url,
+            UserProfile.phone,
+            UserProfile.preferences
+        )
+    )
+
+def users_for_fields(db: Session, names):
+    """Users loading only the requested columns; the profile is joined only for avatar_url."""
+    query = users_with_profiles(db) if "avatar_url" in names else db.query(User)
+    return query.options(load_columns(User, UserResponse, names))
+
+def encode_cursor(email: str, user_id: int) -> str:
+    """Opaque keyset cursor for the (lower(email), id) position of the last row on a page."""
+    return base64.urlsafe_b64encode(f"{email.lower()}|{user_id}".encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        email, user_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return email, int(user_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @router.post("", response_model=UserResponse)
 @router.post("/", response_model=UserResponse)
@@ -32,26 +69,97 @@ def create_user(
     db.refresh(db_user)
     return db_user
 
-@router.get("", response_model=List[UserResponse])
-@router.get("/", response_model=List[UserResponse])
+@router.get("", response_model=Union[List[UserResponse], List[UserRef]])
+@router.get("/", response_model=Union[List[UserResponse], List[UserRef]])
+@response_cache.cached("users")
 def list_users(
     skip: int = 0, 
     limit: int = 100, 
+    ids: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    List users. With ids=1,2,3 the given users are resolved in one IN query instead,
+    returning only id, email and full_name (unknown ids are left out).
+    fields=id,full_name,... selects the returned (and loaded) UserResponse fields.
+    """
+    names = parse_fields(fields, UserResponse)
+    if ids is not None:
+        id_list = parse_id_list(ids)
+        if not id_list:
+            return []
+        if names is None:
+            users = db.query(User.id, User.email, User.full_name).filter(User.id.in_(id_list)).order_by(User.id).all()
+            return model_list_response(UserRef, users)
+        query = users_for_fields(db, names).filter(User.id.in_(id_list)).order_by(User.id)
+    elif names is None:
+        return model_list_response(UserResponse, users_with_profiles(db).order_by(User.id).offset(skip).limit(limit).all())
+    else:
+        query = users_for_fields(db, names).order_by(User.id).offset(skip).limit(limit)
+    return model_list_response(partial_schema(UserResponse, names), query.all())
+
+@router.get("/search", response_model=UserPage)
+@response_cache.cached("users")
+def search_users(
+    q: Optional[str] = None,
+    role: Optional[UserRole] = None,
+    is_active: Optional[bool] = None,
+    status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    return db.query(User).offset(skip).limit(limit).all()
+    """
+    Users with their profile (without signature), filtered on the server and keyset-paged
+    on (lower(email), id).
+    - q: case-insensitive prefix of the email or full name
+    - status: profile status from preferences ("active", "inactive", "pending"); no profile counts as active
+    """
+    query = users_with_profiles(db)
+    if q:
+        escaped = q.strip().lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        query = query.filter(
+            func.lower(User.email).like(f"{escaped}%", escape="\\")
+            | func.lower(User.full_name).like(f"{escaped}%", escape="\\")
+        )
+    if role is not None:
+        query = query.filter(User.role == role)
+    if is_active is not None:
+        query = query.filter(User.is_active == is_active)
+    if status:
+        query = query.filter(func.coalesce(UserProfile.preferences["status"].as_string(), "active") == status)
+    if cursor:
+        cursor_email, cursor_id = decode_cursor(cursor)
+        query = query.filter(tuple_(func.lower(User.email), User.id) > tuple_(cursor_email, cursor_id))
+    
+    effective_limit = max(1, min(limit, 200))
+    # Fetch one extra row to know whether another page exists
+    rows = query.order_by(func.lower(User.email), User.id).limit(effective_limit + 1).all()
+    items = rows[:effective_limit]
+    next_cursor = None
+    if len(rows) > effective_limit:
+        next_cursor = encode_cursor(items[-1].email, items[-1].id)
+    return model_response(UserPage, {"items": items, "next_cursor": next_cursor})
 
 @router.get("/{user_id}", response_model=UserResponse)
+@response_cache.cached("users")
 def get_user(
     user_id: int, 
+    fields: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    user = db.query(User).filter(User.id == user_id).first()
+    names = parse_fields(fields, UserResponse)
+    query = users_with_profiles(db) if names is None else users_for_fields(db, names)
+    user = query.filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+    if names is not None:
+        return model_response(partial_schema(UserResponse, names), user)
+    return model_response(UserResponse, user)
 
 @router.put("/{user_id}", response_model=UserResponse)
 def update_user(
@@ -64,7 +172,7 @@ def update_user(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    update_data = user_update.dict(exclude_unset=True)
+    update_data = user_update.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(user, field, value)
     
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr, field_validator
-from typing import Optional, List, Dict, Any
-from datetime import datetime
+from pydantic import BaseModel, EmailStr, field_validator, model_validator
+from typing import Optional, List, Dict, Any, Union
+from datetime import date, datetime
 from models import UserRole, VisitStatus
 
 # User Schemas
@@ -27,6 +27,15 @@ class UserResponse(UserBase):
     class Config:
         from_attributes = True
 
+# Minimal projection returned by batch lookups (GET /api/users?ids=1,2,3)
+class UserRef(BaseModel):
+    id: int
+    email: str
+    full_name: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
 # Auth Schemas
 class Token(BaseModel):
     access_token: str
@@ -126,6 +135,36 @@ class CustomerResponse(BaseModel):
     class Config:
         from_attributes = True
 
+# Minimal projection returned by batch lookups (GET /api/customers?ids=1,2,3)
+class CustomerRef(BaseModel):
+    id: int
+    shop_name: str
+    shop_type: Optional[str] = None
+    city: Optional[str] = None
+    region: Optional[str] = None
+    visit_notes: Optional[str] = None
+    status: Optional[str] = "active"
+
+    class Config:
+        from_attributes = True
+
+# Signature Schemas
+class SignatureStrokes(BaseModel):
+    """Vector signature from the signature pad: absolute [x, y, x, y, ...] points per stroke."""
+    width: int
+    height: int
+    strokes: List[List[float]]
+
+class SignatureReference(BaseModel):
+    """Signatures stored in the signatures table are exposed as their URL in `signature`."""
+    signature_id: Optional[str] = None
+    
+    @model_validator(mode="after")
+    def signature_from_reference(self):
+        if self.signature_id and not self.signature:
+            self.signature = f"/api/signatures/{self.signature_id}"
+        return self
+
 # Shop Visit Schemas
 class ShopVisitBase(BaseModel):
     customer_id: int
@@ -177,7 +216,7 @@ class ShopVisitBase(BaseModel):
     is_draft: Optional[bool] = False
 
 class ShopVisitCreate(ShopVisitBase):
-    pass
+    signature_strokes: Optional[SignatureStrokes] = None
 
 class ShopVisitUpdate(BaseModel):
     customer_id: Optional[int] = None
@@ -222,6 +261,7 @@ class ShopVisitUpdate(BaseModel):
     visit_photos: Optional[List[str]] = None
     gps_coordinates: Optional[Dict[str, Any]] = None
     signature: Optional[str] = None
+    signature_strokes: Optional[SignatureStrokes] = None
     signature_signer_name: Optional[str] = None
     signature_date: Optional[datetime] = None
     calculated_score: Optional[int] = None
@@ -229,7 +269,7 @@ class ShopVisitUpdate(BaseModel):
     is_draft: Optional[bool] = None
     draft_saved_at: Optional[datetime] = None
 
-class ShopVisitResponse(ShopVisitBase):
+class ShopVisitResponse(ShopVisitBase, SignatureReference):
     id: int
     created_at: datetime
     updated_at: Optional[datetime] = None
@@ -276,6 +316,63 @@ class ShopVisitSummary(BaseModel):
     class Config:
         from_attributes = True
 
+# Batch export of visit report PDFs as one ZIP (POST /api/report-exports)
+class ReportExportCreate(BaseModel):
+    region: Optional[str] = None
+    month: Optional[str] = None  # YYYY-MM of the visit date
+    visit_status: Optional[VisitStatus] = VisitStatus.done
+    created_by: Optional[int] = None
+    customer_id: Optional[int] = None
+
+    @field_validator("month")
+    @classmethod
+    def validate_month(cls, v):
+        if v is not None:
+            try:
+                datetime.strptime(v, "%Y-%m")
+            except ValueError:
+                raise ValueError("month must be formatted as YYYY-MM")
+        return v
+
+class ReportExportError(BaseModel):
+    visit_id: int
+    error: str
+
+class ReportExportResponse(BaseModel):
+    id: str
+    status: str  # queued, running, completed, failed or cancelled
+    filters: Dict[str, Any]
+    created_by: int
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    total: Optional[int] = None  # Matching visits, known once the job has started
+    done: int = 0
+    failed: int = 0
+    errors: List[ReportExportError] = []  # First failures, by visit
+    size: Optional[int] = None  # ZIP size in bytes once completed
+    error: Optional[str] = None
+    download_url: Optional[str] = None
+
+# One group of the daily visit rollup (GET /api/analytics/visit-rollup); dimensions that were
+# not grouped by are null, as are unknown values
+class VisitRollupRow(BaseModel):
+    day: Optional[date] = None
+    user_id: Optional[int] = None
+    region: Optional[str] = None
+    visit_status: Optional[str] = None
+    visit_purpose: Optional[str] = None
+    visit_count: int = 0
+    order_value_sum: float = 0.0
+    order_count: int = 0
+    satisfaction_sum: int = 0
+    satisfaction_count: int = 0
+    score_sum: int = 0
+    score_count: int = 0
+    follow_up_count: int = 0
+    average_score: Optional[float] = None
+    average_satisfaction: Optional[float] = None
+
 # Configuration Schemas
 class ConfigurationBase(BaseModel):
     config_type: str
@@ -302,6 +399,18 @@ class ConfigurationResponse(ConfigurationBase):
     class Config:
         from_attributes = True
 
+# Bulk upsert of a whole configuration list (one config_type)
+class ConfigurationBulkItem(BaseModel):
+    id: Optional[int] = None  # Existing row; when omitted the row is matched by config_value
+    config_name: str
+    config_value: str
+    is_active: Optional[bool] = True
+    display_order: Optional[int] = None  # Defaults to the item's position in the list
+
+class ConfigurationBulkUpsert(BaseModel):
+    config_type: str
+    items: List[ConfigurationBulkItem]
+
 # Audit Log Schemas
 class AuditLogCreate(BaseModel):
     actor_user_id: Optional[int] = None
@@ -320,6 +429,11 @@ class AuditLogResponse(AuditLogCreate):
     class Config:
         from_attributes = True
 
+# Keyset page of audit logs; pass next_cursor back as ?cursor= to get the next page
+class AuditLogPage(BaseModel):
+    items: List[AuditLogResponse]
+    next_cursor: Optional[str] = None
+
 # User Profile Schemas
 class UserProfileBase(BaseModel):
     full_name: Optional[str] = None
@@ -331,13 +445,33 @@ class UserProfileBase(BaseModel):
     signature_signer_name: Optional[str] = None
     signature_date: Optional[datetime] = None
 
+class UserProfileSummary(BaseModel):
+    """Profile fields shown in user lists (everything except the signature)."""
+    id: int
+    full_name: Optional[str] = None
+    avatar_url: Optional[str] = None
+    phone: Optional[str] = None
+    preferences: Optional[Dict[str, Any]] = {}
+    
+    class Config:
+        from_attributes = True
+
+class UserWithProfileResponse(UserResponse):
+    profile: Optional[UserProfileSummary] = None
+
+# Keyset page of users; pass next_cursor back as ?cursor= to get the next page
+class UserPage(BaseModel):
+    items: List[UserWithProfileResponse]
+    next_cursor: Optional[str] = None
+
 class UserProfileCreate(UserProfileBase):
     user_id: int
+    signature_strokes: Optional[SignatureStrokes] = None
 
 class UserProfileUpdate(UserProfileBase):
-    pass
+    signature_strokes: Optional[SignatureStrokes] = None
 
-class UserProfileResponse(UserProfileBase):
+class UserProfileResponse(UserProfileBase, SignatureReference):
     id: int
     user_id: int
     created_at: datetime
@@ -346,3 +480,12 @@ class UserProfileResponse(UserProfileBase):
     class Config:
         from_attributes = True
 
+# Just the saved signature of a user (GET /api/user-profiles/user/{user_id}/signature)
+class UserSignatureResponse(SignatureReference):
+    signature: Optional[str] = None
+    signature_signer_name: Optional[str] = None
+    signature_date: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
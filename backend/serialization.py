@@ -0,0 +1,48 @@
+"""
+Fast JSON serialization for API responses.
+FastAPI's default path validates returned ORM objects into the response model, converts the
+result to Python primitives and encodes that with the stdlib json module. Two faster paths:
+  - ORJSONResponse, the app-wide default response class: same content, encoded with orjson
+  - model_list_response(): for list endpoints, pydantic-core validates the ORM rows and
+    writes the JSON bytes directly (TypeAdapter.dump_json), skipping the Python-level steps
+Measure with: python serialization_benchmark.py
+"""
+from functools import lru_cache
+from typing import Any, Iterable, List, Type
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, TypeAdapter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse encoded with orjson; falls back to the stdlib encoder if orjson is not installed."""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+@lru_cache(maxsize=None)
+def list_adapter(schema: Type[BaseModel]) -> TypeAdapter:
+    """TypeAdapter for List[schema], built once per schema (building one compiles a validator)."""
+    return TypeAdapter(List[schema])
+
+def dump_model_list(schema: Type[BaseModel], rows: Iterable[Any]) -> bytes:
+    """Validate ORM rows (or dicts) into schema and serialize them to JSON bytes in one pass."""
+    adapter = list_adapter(schema)
+    return adapter.dump_json(adapter.validate_python(list(rows), from_attributes=True))
+
+def model_response(schema: Type[BaseModel], obj: Any, headers: dict = None) -> Response:
+    """JSON response for a single ORM object validated into schema (bypasses response_model)."""
+    content = schema.model_validate(obj, from_attributes=True).model_dump_json()
+    return Response(content=content, media_type="application/json", headers=headers)
+
+def model_list_response(schema: Type[BaseModel], rows: Iterable[Any], headers: dict = None) -> Response:
+    """
+    JSON response for a list endpoint. Returning a Response bypasses FastAPI's response_model
+    processing, which is kept on the route for the OpenAPI schema.
+    """
+    return Response(content=dump_model_list(schema, rows), media_type="application/json", headers=headers)
@@ -0,0 +1,94 @@
+"""
+Serialization microbenchmark for visit list responses.
+Builds transient ShopVisit rows (no database needed) and measures rows/sec for a
+List[ShopVisitSummary] response through:
+  - fastapi:  FastAPI's default path (response_model validation + stdlib json), i.e. before
+  - orjson:   the same path rendered by ORJSONResponse, the default response class
+  - adapter:  model_list_response(), TypeAdapter validation + dump_json, used by list endpoints
+Run from the backend directory: python serialization_benchmark.py [--rows 1000] [--runs 20]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from models import ShopVisit, VisitStatus
+from schemas import ShopVisitSummary
+from serialization import ORJSONResponse, model_list_response
+
+def build_rows(count: int) -> List[ShopVisit]:
+    """Transient ShopVisit objects with realistic values, including the large excluded fields."""
+    now = datetime.now(timezone.utc)
+    rows = []
+    for i in range(count):
+        rows.append(ShopVisit(
+            id=i + 1,
+            customer_id=i % 250 + 1,
+            shop_name=f"Grow Shop {i % 250}",
+            shop_type="growshop",
+            shop_address=f"Main Street {i}",
+            city="Amsterdam",
+            country="Netherlands",
+            region="North",
+            contact_person="Jane Doe",
+            contact_phone="+31 20 123 4567",
+            visit_status=VisitStatus.done,
+            assigned_user_id=i % 12 + 1,
+            visit_date=now - timedelta(days=i),
+            visit_duration=60,
+            visit_purpose="routine_check",
+            product_visibility_score=70,
+            commercial_outcome="order_placed",
+            order_value=1250.5,
+            overall_satisfaction=8,
+            follow_up_required=i % 3 == 0,
+            follow_up_date=now + timedelta(days=7),
+            calculated_score=82,
+            priority_level="medium",
+            is_draft=False,
+            created_at=now - timedelta(days=i),
+            updated_at=now,
+            created_by=i % 12 + 1,
+            visit_photos=[f"/api/files/{i:08d}-0000-0000-0000-000000000000"] * 4,
+            sales_data={"products": [{"name": "Terra", "qty": 10}]},
+            notes="Visit notes " * 20,
+        ))
+    return rows
+
+def fastapi_default(rows, response_class) -> bytes:
+    """What a route returning the ORM rows with response_model=List[ShopVisitSummary] does."""
+    field = create_response_field(name="benchmark", type_=List[ShopVisitSummary], mode="serialization")
+    content = asyncio.run(serialize_response(field=field, response_content=rows, is_coroutine=True))
+    return response_class(content).body
+
+def measure(label: str, fn, rows, runs: int) -> float:
+    fn(rows)  # Warm up (builds validators and adapters)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        body = fn(rows)
+        timings.append(time.perf_counter() - start)
+    median = statistics.median(timings)
+    rate = len(rows) / median
+    print(f"{label:<10} {median * 1000:9.2f} ms {rate:12,.0f} rows/s {len(body) / 1024:9.1f} KB")
+    return rate
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure visit list serialization throughput")
+    parser.add_argument("--rows", type=int, default=1000, help="Visits per response")
+    parser.add_argument("--runs", type=int, default=20, help="Measured runs per method")
+    args = parser.parse_args()
+
+    rows = build_rows(args.rows)
+    print(f"Serializing {args.rows} ShopVisitSummary rows, median of {args.runs} runs")
+    baseline = measure("fastapi", lambda r: fastapi_default(r, JSONResponse), rows, args.runs)
+    orjson_rate = measure("orjson", lambda r: fastapi_default(r, ORJSONResponse), rows, args.runs)
+    adapter_rate = measure("adapter", lambda r: model_list_response(ShopVisitSummary, r).body, rows, args.runs)
+    print(f"\nSpeedup vs fastapi: orjson {orjson_rate / baseline:.1f}x, adapter {adapter_rate / baseline:.1f}x")
+
+if __name__ == "__main__":
+    main()
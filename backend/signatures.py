@@ -0,0 +1,246 @@
+"""
+Compact signature storage.
+Signatures are stored once in the signatures table, either as vector strokes captured by the
+signature pad (a few hundred bytes of integer deltas) or, for older clients, as raw PNG bytes.
+Visits and profiles only keep a signature_id, so a rep signature reused across many visits is
+a single row, and API payloads carry a short /api/signatures/{id} URL instead of base64 PNG.
+Rendered SVG/PNG images are cached in memory; a signature never changes under its id.
+"""
+import base64
+import binascii
+import hashlib
+import io
+import json
+import logging
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models import Signature
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_URL_PATTERN = re.compile(r"/api/signatures/([0-9a-fA-F-]{36})")
+PNG_DATA_URL_PREFIX = "data:image/png;base64,"
+
+MAX_STROKE_POINTS = 20000
+MAX_CANVAS_SIZE = 4000
+STROKE_WIDTH = 2
+
+class InvalidStrokes(ValueError):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+def encode_strokes(payload: Dict[str, Any]) -> Tuple[int, int, list]:
+    """
+    Validate {width, height, strokes: [[x, y, x, y, ...], ...]} from the signature pad and
+    delta-encode the rounded coordinates (first point absolute, the rest relative).
+    Raises InvalidStrokes for data that cannot be stored.
+    """
+    try:
+        width = int(payload["width"])
+        height = int(payload["height"])
+        raw_strokes = payload["strokes"]
+        if not (0 < width <= MAX_CANVAS_SIZE and 0 < height <= MAX_CANVAS_SIZE) or not isinstance(raw_strokes, list):
+            raise ValueError("invalid canvas")
+        strokes = []
+        total_points = 0
+        for raw in raw_strokes:
+            points = [round(float(value)) for value in raw]
+            if len(points) < 2 or len(points) % 2:
+                continue
+            total_points += len(points) // 2
+            encoded = points[:2]
+            for i in range(2, len(points), 2):
+                dx, dy = points[i] - points[i - 2], points[i + 1] - points[i - 1]
+                if dx or dy:
+                    encoded += [dx, dy]
+            strokes.append(encoded)
+    except (KeyError, TypeError, ValueError, OverflowError):
+        # NaN/None coordinates, e.g. touch events without offsetX from older signature pads
+        raise InvalidStrokes(400, "Invalid signature strokes")
+    if not strokes:
+        raise InvalidStrokes(400, "Signature strokes are empty")
+    if total_points > MAX_STROKE_POINTS:
+        raise InvalidStrokes(413, "Signature has too many points")
+    return width, height, strokes
+
+def get_or_create(db: Session, sha256: str, **fields) -> str:
+    """Return the id of the signature with this content hash, inserting it if it is new."""
+    existing = db.query(Signature.id).filter(Signature.sha256 == sha256).first()
+    if existing is not None:
+        return existing.id
+    signature = Signature(id=str(uuid.uuid4()), sha256=sha256, **fields)
+    try:
+        with db.begin_nested():
+            db.add(signature)
+    except IntegrityError:
+        # Stored concurrently by another request
+        return db.query(Signature.id).filter(Signature.sha256 == sha256).one().id
+    return signature.id
+
+def store_signature(db: Session, value: Optional[str], strokes: Optional[Dict[str, Any]] = None, user_id: Optional[int] = None) -> Optional[str]:
+    """
+    Resolve an incoming signature to a signature id: stroke data, a /api/signatures/{id}
+    reference handed back by the API, or a PNG data URL. Returns None for other values.
+    Unusable strokes fall back to the image sent with them instead of failing the save.
+    """
+    if strokes:
+        try:
+            width, height, encoded = encode_strokes(strokes)
+        except InvalidStrokes as e:
+            if not value:
+                raise HTTPException(status_code=e.status_code, detail=e.detail)
+            logger.warning(f"{e.detail} from user {user_id}, storing the signature image instead")
+        else:
+            canonical = json.dumps({"w": width, "h": height, "s": encoded}, separators=(",", ":"))
+            return get_or_create(
+                db, hashlib.sha256(canonical.encode()).hexdigest(),
+                kind="strokes", width=width, height=height, strokes=encoded, created_by=user_id
+            )
+    if not value:
+        return None
+    match = SIGNATURE_URL_PATTERN.search(value)
+    if match:
+        if db.query(Signature.id).filter(Signature.id == match.group(1)).first() is None:
+            raise HTTPException(status_code=400, detail="Unknown signature reference")
+        return match.group(1)
+    if value.startswith(PNG_DATA_URL_PREFIX):
+        try:
+            png = base64.b64decode(value[len(PNG_DATA_URL_PREFIX):], validate=True)
+        except (binascii.Error, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid signature image")
+        return get_or_create(db, hashlib.sha256(png).hexdigest(), kind="png", png=png, created_by=user_id)
+    return None
+
+def apply_signature(db: Session, target, data: Dict[str, Any], user_id: Optional[int] = None):
+    """
+    Move "signature"/"signature_strokes" out of an update dict onto a visit or profile,
+    storing the signature by reference. Unrecognised values are kept inline as before.
+    """
+    strokes = data.pop("signature_strokes", None)
+    if "signature" not in data and not strokes:
+        return
+    value = data.pop("signature", None)
+    signature_id = store_signature(db, value, strokes, user_id)
+    target.signature_id = signature_id
+    target.signature = None if signature_id else value
+
+def render_svg(signature: Signature) -> bytes:
+    """Vector rendering: the delta encoding maps directly onto SVG relative line commands."""
+    if signature.kind != "strokes":
+        encoded = base64.b64encode(signature.png).decode()
+        body = f'<image href="{PNG_DATA_URL_PREFIX}{encoded}" width="100%" height="100%"/>'
+        size = ""
+    else:
+        paths = []
+        for stroke in signature.strokes or []:
+            x, y, *deltas = stroke
+            if deltas:
+                paths.append(f"M{x} {y}l" + " ".join(str(value) for value in deltas))
+            else:
+                paths.append(f"M{x} {y}h0")  # A single tap is drawn as a dot
+        body = (f'<path d="{" ".join(paths)}" fill="none" stroke="#000" stroke-width="{STROKE_WIDTH}" '
+                f'stroke-linecap="round" stroke-linejoin="round"/>')
+        size = f' width="{signature.width}" height="{signature.height}" viewBox="0 0 {signature.width} {signature.height}"'
+    return f'<svg xmlns="http://www.w3.org/2000/svg"{size}>{body}</svg>'.encode()
+
+def render_png(signature: Signature) -> Optional[bytes]:
+    """Raster rendering for consumers that need PNG; None if Pillow is not installed."""
+    if signature.kind != "strokes":
+        return signature.png
+    try:
+        from PIL import Image, ImageDraw
+    except ImportError:
+        return None
+    image = Image.new("RGBA", (signature.width, signature.height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    for stroke in signature.strokes or []:
+        x, y = stroke[0], stroke[1]
+        points = [(x, y)]
+        for i in range(2, len(stroke), 2):
+            x, y = x + stroke[i], y + stroke[i + 1]
+            points.append((x, y))
+        if len(points) == 1:
+            draw.ellipse([x - 1, y - 1, x + 1, y + 1], fill="black")
+        else:
+            draw.line(points, fill="black", width=STROKE_WIDTH, joint="curve")
+    output = io.BytesIO()
+    image.save(output, format="PNG", optimize=True)
+    return output.getvalue()
+
+class SignatureRenderCache:
+    """LRU cache of rendered signatures keyed by (id, format)."""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, db: Session, signature_id: str, fmt: str) -> Optional[Tuple[bytes, str, str]]:
+        """Return (content, media_type, etag) or None if the signature does not exist."""
+        key = (signature_id, fmt)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        signature = db.query(Signature).filter(Signature.id == signature_id).first()
+        if signature is None:
+            return None
+        content = render_png(signature) if fmt == "png" else None
+        if content is not None:
+            media_type = "image/png"
+        else:
+            content, media_type = render_svg(signature), "image/svg+xml"
+        rendered = (content, media_type, f'"{signature.sha256[:32]}-{media_type.split("/")[1].split("+")[0]}"')
+
+        with self._lock:
+            self._entries[key] = rendered
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return rendered
+
+signature_cache = SignatureRenderCache()
+
+def migrate_inline_signatures(engine, batch_size: int = 500) -> int:
+    """
+    Move base64 PNG signatures still stored inline in shop_visits/user_profiles into the
+    signatures table (deduplicated), replacing them with a signature_id. Runs in batches.
+    """
+    from sqlalchemy.orm import sessionmaker
+    from models import ShopVisit, UserProfile
+    SessionLocal = sessionmaker(bind=engine)
+    migrated = 0
+    for model in (UserProfile, ShopVisit):
+        last_id = 0
+        while True:
+            with SessionLocal() as db:
+                rows = db.query(model).filter(
+                    model.id > last_id,
+                    model.signature_id.is_(None),
+                    model.signature.like(f"{PNG_DATA_URL_PREFIX}%")
+                ).order_by(model.id).limit(batch_size).all()
+                if not rows:
+                    break
+                for row in rows:
+                    try:
+                        created_by = getattr(row, "user_id", None) or getattr(row, "created_by", None)
+                        row.signature_id = store_signature(db, row.signature, user_id=created_by)
+                        row.signature = None
+                        migrated += 1
+                    except HTTPException:
+                        # Corrupt data URL: left inline untouched
+                        logger.warning(f"Could not migrate signature of {model.__tablename__} {row.id}")
+                last_id = rows[-1].id
+                db.commit()
+                logger.info(f"  Migrated {migrated} inline signatures so far")
+    logger.info(f"✓ Migrated {migrated} inline signatures")
+    return migrated
@@ -0,0 +1,115 @@
+"""
+Startup time benchmark for the API process.
+Measures, in fresh interpreter processes so results are reproducible:
+  - import time of main.py (module import only, no server)
+  - `python -X importtime` breakdown of the slowest imports
+  - time to first successful request: uvicorn start until /health answers,
+    with and without FAST_START
+Run from the backend directory: python startup_benchmark.py [--runs 5] [--top 15]
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import main; "
+    "print(time.perf_counter() - start)"
+)
+
+def measure_import_time(runs: int):
+    """Seconds to import main.py, measured in a new interpreter for each run."""
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        )
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return timings
+
+def measure_import_breakdown(top: int):
+    """
+    Parse `python -X importtime -c "import main"` output.
+    Returns the `top` modules by cumulative import time as (module, cumulative_us, self_us).
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|", 2)
+        entries.append((module.rstrip(), int(cumulative_us), int(self_us)))
+    return sorted(entries, key=lambda e: e[1], reverse=True)[:top]
+
+def free_port() -> int:
+    """Ask the OS for an unused TCP port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def measure_first_request(fast_start: bool, timeout: float = 60.0) -> float:
+    """Seconds from launching uvicorn until GET /health returns 200."""
+    port = free_port()
+    env = dict(os.environ, FAST_START="true" if fast_start else "false")
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError(f"Server did not answer /health within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+def summarize(timings) -> str:
+    """min / median / max in milliseconds."""
+    return (f"min {min(timings) * 1000:.0f} ms, median {statistics.median(timings) * 1000:.0f} ms, "
+            f"max {max(timings) * 1000:.0f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API process startup")
+    parser.add_argument("--runs", type=int, default=5, help="Repetitions per measurement")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest imports to list")
+    parser.add_argument("--skip-server", action="store_true", help="Only measure imports")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("API Startup Benchmark")
+    print("=" * 60)
+
+    print(f"\n📦 import main ({args.runs} runs): {summarize(measure_import_time(args.runs))}")
+
+    print(f"\n🐢 Slowest imports (python -X importtime, top {args.top}):")
+    print(f"  {'cumulative':>12} {'self':>10}  module")
+    for module, cumulative_us, self_us in measure_import_breakdown(args.top):
+        print(f"  {cumulative_us / 1000:>10.1f}ms {self_us / 1000:>8.1f}ms  {module}")
+
+    if not args.skip_server:
+        for fast_start in (False, True):
+            label = "FAST_START=true " if fast_start else "FAST_START=false"
+            timings = [measure_first_request(fast_start) for _ in range(args.runs)]
+            print(f"\n🚀 Time to first request, {label} ({args.runs} runs): {summarize(timings)}")
+
+    print("=" * 60)
+
+if __name__ == "__main__":
+    main()
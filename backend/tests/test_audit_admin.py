@@ -0,0 +1,32 @@
+"""
+Admin operations are audited under an action named after their path, with the options
+they ran with.
+"""
+import pytest
+
+pytest.importorskip("fastapi")
+
+from audit_middleware import build_audit_entry
+
+def admin_scope(method, path, parameters=None):
+    state = {"audit_actor": {"id": 1, "email": "admin@example.com"}}
+    if parameters is not None:
+        state["audit_parameters"] = parameters
+    return {"type": "http", "method": method, "path": path, "state": state, "headers": []}
+
+def test_audit_retention_run_is_audited():
+    entry = build_audit_entry(admin_scope("POST", "/api/admin/audit-retention", {"retention_days": 90}), 200)
+    assert entry["action"] == "run_audit_retention"
+    assert entry["details"]["parameters"] == {"retention_days": 90}
+
+def test_admin_reads_are_not_audited():
+    assert build_audit_entry(admin_scope("GET", "/api/admin/audit-sink"), 200) is None
+
+def test_failed_admin_run_is_not_audited():
+    assert build_audit_entry(admin_scope("POST", "/api/admin/audit-retention"), 403) is None
+
+def test_file_gc_run_is_audited():
+    parameters = {"grace_hours": 24, "dry_run": True}
+    entry = build_audit_entry(admin_scope("POST", "/api/admin/file-gc", parameters), 200)
+    assert entry["action"] == "run_file_gc"
+    assert entry["details"]["parameters"] == parameters
@@ -0,0 +1,77 @@
+"""
+Deleting a user must still produce an audit row: the entry may not reference the deleted
+users row, and an entry the database rejects must not hold back the rest of the queue.
+"""
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy.exc import IntegrityError
+import audit_sink as audit_sink_module
+from audit_middleware import build_audit_entry
+from audit_sink import AuditSink
+
+ADMIN = {"id": 1, "email": "admin@example.com"}
+EXISTING_USER_IDS = {1}
+
+class ForeignKeySession:
+    """Stands in for SessionLocal, enforcing the audit_logs foreign keys to users.id."""
+    written = []
+
+    def execute(self, statement, rows):
+        for row in rows:
+            for column in ("actor_user_id", "target_user_id"):
+                if row[column] is not None and row[column] not in EXISTING_USER_IDS:
+                    raise IntegrityError("INSERT INTO audit_logs", row, Exception("violates foreign key constraint"))
+        self.pending = list(rows)
+
+    def commit(self):
+        ForeignKeySession.written.extend(self.pending)
+
+    def rollback(self):
+        self.pending = []
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def sink(monkeypatch):
+    ForeignKeySession.written = []
+    monkeypatch.setattr(audit_sink_module, "SessionLocal", ForeignKeySession)
+    return AuditSink(batch_size=10)
+
+def delete_user_scope(user_id: int):
+    return {
+        "type": "http",
+        "method": "DELETE",
+        "path": f"/api/users/{user_id}",
+        "path_params": {"user_id": str(user_id)},
+        "state": {"audit_actor": ADMIN},
+        "headers": [(b"user-agent", b"pytest")],
+        "client": ("127.0.0.1", 50000),
+    }
+
+def test_user_delete_is_audited(sink):
+    entry = build_audit_entry(delete_user_scope(7), 200)
+    assert entry["action"] == "delete_user"
+    assert entry["target_user_id"] is None
+    assert entry["details"]["resource_id"] == "7"
+
+    sink.submit(entry)
+    sink.flush()
+
+    assert [row["action"] for row in ForeignKeySession.written] == ["delete_user"]
+    assert ForeignKeySession.written[0]["details"]["resource_id"] == "7"
+    assert sink.metrics()["queued"] == 0
+
+def test_rejected_entry_does_not_block_the_queue(sink):
+    sink.submit({"actor_user_id": 1, "target_user_id": 99, "action": "update_user"})
+    sink.submit(build_audit_entry(delete_user_scope(7), 200))
+    sink.flush()
+
+    metrics = sink.metrics()
+    assert [row["action"] for row in ForeignKeySession.written] == ["delete_user"]
+    assert metrics["rejected"] == 1
+    assert metrics["written"] == 1
+    assert metrics["queued"] == 0
@@ -0,0 +1,78 @@
+"""
+Accept-Encoding negotiation, per-content-type levels and chunk-by-chunk compression of
+streaming responses.
+"""
+import asyncio
+import zlib
+import pytest
+
+pytest.importorskip("starlette")
+
+from compression import CompressionMiddleware, choose_encoding, parse_accept_encoding
+
+def test_parse_accept_encoding_keeps_refusals():
+    assert parse_accept_encoding("gzip, br;q=0.8, zstd;q=0, *;q=0.1") == {
+        "gzip": 1.0, "br": 0.8, "zstd": 0.0, "*": 0.1
+    }
+    assert parse_accept_encoding("GZIP ; q=0.5, , br;q=oops") == {"gzip": 0.5, "br": 0.0}
+
+@pytest.mark.parametrize("header, preference, expected", [
+    ("gzip, br", ["zstd", "br", "gzip"], "br"),
+    ("gzip, br;q=0.8", ["zstd", "br", "gzip"], "gzip"),
+    ("", ["zstd", "br", "gzip"], None),
+    ("identity", ["gzip"], None),
+    ("*", ["br", "gzip"], "br"),
+    # A coding refused with q=0 stays refused even when "*" is accepted
+    ("gzip;q=0, *", ["gzip"], None),
+    ("br;q=0, gzip;q=0.5, *", ["br", "gzip"], "gzip"),
+    ("br;q=0, gzip;q=0.5, *", ["zstd", "br", "gzip"], "zstd"),
+    ("br;q=0, gzip;q=0.5, *;q=0", ["zstd", "br", "gzip"], "gzip"),
+    ("gzip;q=0", ["gzip"], None),
+])
+def test_choose_encoding(header, preference, expected):
+    assert choose_encoding(header, preference) == expected
+
+def make_middleware(app=None, levels=None):
+    return CompressionMiddleware(app, minimum_size=10, encodings=["gzip"], levels=levels or {})
+
+def test_level_for_matches_exact_type_then_family():
+    middleware = make_middleware(levels={"text/": {"gzip": 2}, "text/csv": {"gzip": 9}})
+    assert middleware.level_for("application/json; charset=utf-8", "gzip") == 6
+    assert middleware.level_for("TEXT/CSV", "gzip") == 9
+    assert middleware.level_for("text/html; charset=utf-8", "gzip") == 2
+    assert middleware.level_for("image/png", "gzip") is None
+    assert middleware.level_for("", "gzip") is None
+
+def test_level_overrides_keep_other_encodings():
+    middleware = make_middleware(levels={"application/json": {"br": 9}})
+    assert middleware.level_for("application/json", "br") == 9
+    assert middleware.level_for("application/json", "gzip") == 6
+
+CHUNKS = [b'{"row": %d}\n' % i * 20 for i in range(3)]
+
+async def streaming_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/x-ndjson")]})
+    for index, chunk in enumerate(CHUNKS):
+        await send({"type": "http.response.body", "body": chunk, "more_body": index < len(CHUNKS) - 1})
+
+def test_streaming_response_is_flushed_chunk_by_chunk():
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", b"gzip")]}
+    asyncio.run(make_middleware(streaming_app)(scope, None, send))
+
+    start, *bodies = sent
+    headers = dict(start["headers"])
+    assert headers[b"content-encoding"] == b"gzip"
+    assert b"content-length" not in headers
+    assert b"accept-encoding" in headers[b"vary"].lower()
+
+    # Every chunk is decodable as soon as it arrives
+    decoder = zlib.decompressobj(31)
+    for chunk, body in zip(CHUNKS, bodies):
+        assert decoder.decompress(body["body"]) == chunk
+    assert [body["more_body"] for body in bodies] == [True, True, False]
+    assert decoder.eof
@@ -0,0 +1,114 @@
+"""
+MessagePack content negotiation: which Accept headers get MessagePack, MessagePack request
+bodies replayed to the routers as JSON, and JSON responses transcoded (with Vary: Accept).
+"""
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+msgpack = pytest.importorskip("msgpack")
+
+from fastapi import FastAPI
+from fastapi import Response
+from fastapi.responses import PlainTextResponse
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+from content_negotiation import MsgPackMiddleware, prefers_msgpack
+
+MSGPACK = "application/msgpack"
+
+@pytest.mark.parametrize("accept, expected", [
+    ("application/msgpack", True),
+    ("application/x-msgpack, application/json;q=0.9", True),
+    ("application/json, application/msgpack", True),
+    ("application/json, application/vnd.msgpack;q=0.5", False),
+    ("application/msgpack;q=0.5, */*", False),
+    ("application/msgpack;q=0", False),
+    ("application/json", False),
+    ("*/*", False),
+    ("", False),
+])
+def test_prefers_msgpack(accept, expected):
+    assert prefers_msgpack(accept) is expected
+
+class Visit(BaseModel):
+    shop_name: str
+    order_value: float
+    photos: list
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(MsgPackMiddleware)
+
+    @app.post("/visits")
+    def create_visit(visit: Visit):
+        return {"received": visit.model_dump(), "id": 7}
+
+    @app.get("/empty", status_code=204)
+    def empty():
+        return None
+
+    @app.get("/revalidated")
+    def revalidated():
+        return Response(status_code=304, headers={"ETag": '"v1"'})
+
+    @app.get("/text")
+    def plain_text():
+        return PlainTextResponse("not JSON")
+
+    return TestClient(app)
+
+VISIT = {"shop_name": "Green Leaf", "order_value": 125.5, "photos": ["/api/files/1", "/api/files/2"]}
+
+def test_json_stays_json(client):
+    response = client.post("/visits", json=VISIT, headers={"Accept": "application/json"})
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == {"received": VISIT, "id": 7}
+    assert "accept" in response.headers["vary"].lower()
+
+def test_msgpack_request_is_replayed_as_json(client):
+    response = client.post(
+        "/visits",
+        content=msgpack.packb(VISIT),
+        headers={"Content-Type": MSGPACK, "Accept": "application/json"},
+    )
+    assert response.status_code == 200
+    assert response.json() == {"received": VISIT, "id": 7}
+
+def test_msgpack_request_is_validated_like_json(client):
+    response = client.post("/visits", content=msgpack.packb({"shop_name": "x"}), headers={"Content-Type": MSGPACK})
+    assert response.status_code == 422
+
+def test_invalid_msgpack_request_is_rejected(client):
+    response = client.post("/visits", content=b"\xc1", headers={"Content-Type": MSGPACK})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid MessagePack body"}
+
+def test_json_response_is_transcoded(client):
+    response = client.post(
+        "/visits",
+        content=msgpack.packb(VISIT),
+        headers={"Content-Type": MSGPACK, "Accept": MSGPACK},
+    )
+    assert response.headers["content-type"] == MSGPACK
+    assert int(response.headers["content-length"]) == len(response.content)
+    assert "accept" in response.headers["vary"].lower()
+    assert msgpack.unpackb(response.content) == {"received": VISIT, "id": 7}
+
+def test_error_responses_are_transcoded(client):
+    response = client.post("/visits", json={}, headers={"Accept": MSGPACK})
+    assert response.status_code == 422
+    assert "detail" in msgpack.unpackb(response.content)
+
+def test_other_responses_pass_through(client):
+    response = client.get("/text", headers={"Accept": MSGPACK})
+    assert response.text == "not JSON"
+    assert response.headers["content-type"].startswith("text/plain")
+    assert client.get("/empty", headers={"Accept": MSGPACK}).status_code == 204
+
+@pytest.mark.parametrize("accept", ["application/json", MSGPACK])
+def test_not_modified_varies_on_accept(client, accept):
+    response = client.get("/revalidated", headers={"Accept": accept})
+    assert response.status_code == 304
+    assert "accept" in response.headers["vary"].lower()
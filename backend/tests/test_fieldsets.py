@@ -0,0 +1,43 @@
+"""
+Sparse fieldsets: ?fields= is validated against the full response schema and served with a
+derived model holding just those fields.
+"""
+from datetime import datetime
+from types import SimpleNamespace
+import pytest
+
+pytest.importorskip("fastapi")
+
+from fastapi import HTTPException
+from fieldsets import parse_fields, partial_schema
+from schemas import CustomerResponse, ShopVisitResponse
+
+def test_no_fields_keep_the_default_shape():
+    assert parse_fields(None, CustomerResponse) is None
+
+def test_fields_are_ordered_as_in_the_schema_with_id():
+    assert parse_fields(" city,shop_name,,city ", CustomerResponse) == ("id", "shop_name", "city")
+    assert parse_fields("", CustomerResponse) == ("id",)
+
+def test_unknown_fields_are_rejected():
+    with pytest.raises(HTTPException) as error:
+        parse_fields("shop_name,password,hashed_password", CustomerResponse)
+    assert error.value.status_code == 400
+    assert error.value.detail.startswith("Unknown fields: hashed_password, password.")
+
+def test_partial_schema_serializes_only_the_requested_fields():
+    names = parse_fields("shop_name,city", CustomerResponse)
+    schema = partial_schema(CustomerResponse, names)
+    customer = SimpleNamespace(id=3, shop_name="Green Leaf", city="Utrecht", shop_type="retail")
+    assert schema.model_validate(customer, from_attributes=True).model_dump() == {"id": 3, "shop_name": "Green Leaf", "city": "Utrecht"}
+
+def test_partial_schemas_are_shared_per_field_set():
+    names = parse_fields("city,shop_name", CustomerResponse)
+    assert partial_schema(CustomerResponse, names) is partial_schema(CustomerResponse, parse_fields("shop_name,city", CustomerResponse))
+
+def test_partial_schema_keeps_the_signature_url():
+    schema = partial_schema(ShopVisitResponse, parse_fields("signature", ShopVisitResponse))
+    visit = SimpleNamespace(id=5, signature=None, signature_id="0f0e0d0c-0000-0000-0000-000000000000", created_at=datetime(2024, 5, 3))
+    dumped = schema.model_validate(visit, from_attributes=True).model_dump()
+    assert dumped["signature"] == "/api/signatures/0f0e0d0c-0000-0000-0000-000000000000"
+    assert "created_at" not in dumped
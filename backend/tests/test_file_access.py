@@ -0,0 +1,101 @@
+"""
+Stored files and signatures need a login: the bearer token for API calls or the media
+cookie for <img> tags. Byte ranges follow RFC 9110 for the single-range requests browsers send.
+"""
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from auth import MEDIA_COOKIE, MEDIA_SCOPE, create_access_token, get_current_user
+from db import get_db
+from file_storage import parse_range
+from models import User
+from routers import files
+
+ACTIVE_USER = User(id=1, email="rep@example.com", is_active=True)
+
+class UserSession:
+    """Stands in for the database session: every user lookup finds ACTIVE_USER, no file exists."""
+
+    def query(self, model):
+        self.model = model
+        return self
+
+    def filter(self, *criteria):
+        return self
+
+    def first(self):
+        return ACTIVE_USER if self.model is User else None
+
+def make_client(app: FastAPI) -> TestClient:
+    app.dependency_overrides[get_db] = UserSession
+    return TestClient(app)
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(files.router, prefix="/api/files")
+    return make_client(app)
+
+FILE_URL = "/api/files/00000000-0000-0000-0000-000000000000"
+
+def test_anonymous_request_is_rejected(client):
+    assert client.get(FILE_URL).status_code == 401
+
+def test_bearer_token_is_accepted(client):
+    token = create_access_token({"sub": ACTIVE_USER.email})
+    # Authenticated; the file itself does not exist
+    assert client.get(FILE_URL, headers={"Authorization": f"Bearer {token}"}).status_code == 404
+
+def test_media_cookie_is_accepted(client):
+    client.cookies.set(MEDIA_COOKIE, create_access_token({"sub": ACTIVE_USER.email, "scope": MEDIA_SCOPE}))
+    assert client.get(FILE_URL).status_code == 404
+
+def test_api_token_is_not_accepted_as_media_cookie(client):
+    client.cookies.set(MEDIA_COOKIE, create_access_token({"sub": ACTIVE_USER.email}))
+    assert client.get(FILE_URL).status_code == 401
+
+def test_media_token_is_not_accepted_as_bearer_token():
+    app = FastAPI()
+
+    @app.get("/me")
+    def me(user: User = Depends(get_current_user)):
+        return {"email": user.email}
+
+    token = create_access_token({"sub": ACTIVE_USER.email, "scope": MEDIA_SCOPE})
+    response = make_client(app).get("/me", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=900-5000", (900, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=0-99,200-299", None),
+    ("bytes=99-0", None),
+    ("bytes=a-b", None),
+    ("items=0-99", None),
+    ("bytes=-", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+@pytest.mark.parametrize("header, size", [("bytes=1000-", 1000), ("bytes=-0", 1000), ("bytes=-10", 0)])
+def test_unsatisfiable_range(header, size):
+    with pytest.raises(ValueError):
+        parse_range(header, size)
+
+def test_signatures_need_a_login():
+    from routers import signatures
+
+    app = FastAPI()
+    app.include_router(signatures.router, prefix="/api/signatures")
+    client = make_client(app)
+    assert client.get("/api/signatures/00000000-0000-0000-0000-000000000000").status_code == 401
+    client.cookies.set(MEDIA_COOKIE, create_access_token({"sub": ACTIVE_USER.email, "scope": MEDIA_SCOPE}))
+    assert client.get("/api/signatures/00000000-0000-0000-0000-000000000000").status_code == 404
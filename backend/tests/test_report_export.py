@@ -0,0 +1,68 @@
+"""
+Report export helpers: the visit query built from the job filters, ZIP member names and
+the audit entries recorded for creating and cancelling jobs.
+"""
+from datetime import datetime, timezone
+from types import SimpleNamespace
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+from audit_middleware import build_audit_entry
+from models import ShopVisit
+from report_export import entry_name, filter_visits
+
+def compiled(filters):
+    query = filter_visits(Session().query(ShopVisit.id), filters)
+    statement = query.statement.compile(dialect=postgresql.dialect())
+    return str(statement), statement.params
+
+def test_no_filters_match_every_visit():
+    sql, params = compiled({})
+    assert "WHERE" not in sql
+    assert params == {}
+
+def test_filters_are_combined():
+    sql, params = compiled({"visit_status": "done", "region": "North", "created_by": "rep@example.com", "customer_id": 7})
+    assert sql.count(" AND ") == 3
+    assert set(params.values()) == {"done", "North", "rep@example.com", 7}
+
+@pytest.mark.parametrize("month, start, end", [
+    ("2024-05", datetime(2024, 5, 1), datetime(2024, 6, 1)),
+    ("2024-12", datetime(2024, 12, 1), datetime(2025, 1, 1)),
+    ("2024-02", datetime(2024, 2, 1), datetime(2024, 3, 1)),
+])
+def test_month_covers_the_calendar_month(month, start, end):
+    sql, params = compiled({"month": month})
+    assert "visit_date >=" in sql and "visit_date <" in sql
+    assert sorted(params.values()) == [start.replace(tzinfo=timezone.utc), end.replace(tzinfo=timezone.utc)]
+
+def visit(shop_name, visit_date):
+    return SimpleNamespace(id=42, shop_name=shop_name, visit_date=visit_date)
+
+@pytest.mark.parametrize("shop_name, visit_date, expected", [
+    ("Green Leaf", datetime(2024, 5, 3), "2024-05-03_Green-Leaf_42.pdf"),
+    ("  ../Café & Co!  ", datetime(2024, 5, 3), "2024-05-03_Caf-Co_42.pdf"),
+    (None, datetime(2024, 5, 3), "2024-05-03_visit_42.pdf"),
+    ("***", None, "undated_visit_42.pdf"),
+    ("x" * 100, datetime(2024, 5, 3), f"2024-05-03_{'x' * 60}_42.pdf"),
+])
+def test_entry_name(shop_name, visit_date, expected):
+    assert entry_name(visit(shop_name, visit_date)) == expected
+
+@pytest.mark.parametrize("method, path, action", [
+    ("POST", "/api/report-exports", "create_report_export"),
+    ("DELETE", "/api/report-exports/0123456789abcdef0123456789abcdef", "delete_report_export"),
+])
+def test_export_jobs_are_audited(method, path, action):
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "state": {"audit_actor": {"id": 1, "email": "admin@example.com"}},
+        "headers": [],
+    }
+    assert build_audit_entry(scope, 202)["action"] == action
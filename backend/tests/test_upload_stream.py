@@ -0,0 +1,83 @@
+"""
+Uploads are parsed straight off the request stream into one temporary file: the stored
+bytes, hash and part headers must match what the client sent, however the body is split.
+"""
+import asyncio
+import hashlib
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("multipart")
+
+from fastapi import HTTPException
+from starlette.requests import Request
+from file_storage import TMP_DIR, stream_upload
+
+BOUNDARY = "----visitreportboundary"
+CONTENT = bytes(range(256)) * 5000  # Over CHUNK_SIZE, with CR/LF bytes and boundary-like dashes inside
+
+def multipart_body(parts) -> bytes:
+    body = b""
+    for name, filename, content_type, data in parts:
+        disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else "")
+        body += f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n".encode()
+        if content_type:
+            body += f"Content-Type: {content_type}\r\n".encode()
+        body += b"\r\n" + data + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+def upload_request(body: bytes, chunk_size: int, content_type: str = None) -> Request:
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)] or [b""]
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": index < len(chunks) - 1}
+        for index, chunk in enumerate(chunks)
+    ]
+
+    async def receive():
+        return messages.pop(0)
+
+    content_type = content_type or f"multipart/form-data; boundary={BOUNDARY}"
+    scope = {"type": "http", "method": "POST", "path": "/api/files/upload", "headers": [(b"content-type", content_type.encode())]}
+    return Request(scope, receive)
+
+def stream(body: bytes, chunk_size: int = 65536, **kwargs):
+    return asyncio.run(stream_upload(upload_request(body, chunk_size, kwargs.pop("content_type", None)), **kwargs))
+
+def temp_files():
+    return set(TMP_DIR.iterdir())
+
+@pytest.mark.parametrize("chunk_size", [7, 997, 65536, 10 ** 7])
+def test_file_part_is_written_as_sent(chunk_size):
+    content = CONTENT[:5000] if chunk_size < 100 else CONTENT
+    body = multipart_body([
+        ("note", None, None, b"skipped"),
+        ("file", "Shop front é.jpg", "image/jpeg", content),
+    ])
+    streamed = stream(body, chunk_size)
+    try:
+        assert streamed.tmp_path.read_bytes() == content
+        assert streamed.sha256 == hashlib.sha256(content).hexdigest()
+        assert streamed.size == len(content)
+        assert streamed.filename == "Shop front é.jpg"
+        assert streamed.content_type == "image/jpeg"
+    finally:
+        streamed.tmp_path.unlink()
+
+def test_too_large_upload_is_rejected_and_removed():
+    before = temp_files()
+    with pytest.raises(HTTPException) as error:
+        stream(multipart_body([("file", "big.bin", None, CONTENT)]), max_bytes=1000)
+    assert error.value.status_code == 413
+    assert temp_files() == before
+
+@pytest.mark.parametrize("body, content_type", [
+    (multipart_body([("other", "a.txt", "text/plain", b"data")]), None),
+    (b"file=data", "application/x-www-form-urlencoded"),
+    (b"--not-the-boundary\r\n", None),
+])
+def test_upload_without_the_file_field_is_rejected(body, content_type):
+    before = temp_files()
+    with pytest.raises(HTTPException) as error:
+        stream(body, content_type=content_type)
+    assert error.value.status_code == 400
+    assert temp_files() == before
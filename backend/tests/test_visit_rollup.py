@@ -0,0 +1,53 @@
+"""
+SQL built for the visit rollup trigger: every dimension and measure is written from the
+right row, with the configured timezone quoted safely.
+"""
+import re
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+import visit_rollup
+from visit_rollup import (
+    DIMENSIONS, MEASURES, SOURCE_COLUMNS, TABLE,
+    _apply_sql, create_trigger_sql, expressions, timezone_literal, trigger_function_sql,
+)
+
+@pytest.fixture(autouse=True)
+def timezone(monkeypatch):
+    monkeypatch.setattr(visit_rollup.settings, "visit_rollup_timezone", "Europe/Amsterdam")
+
+def test_timezone_is_quoted(monkeypatch):
+    assert timezone_literal() == "'Europe/Amsterdam'"
+    monkeypatch.setattr(visit_rollup.settings, "visit_rollup_timezone", "x'; DROP TABLE users; --")
+    assert timezone_literal() == "'x''; DROP TABLE users; --'"
+
+def test_expressions_read_the_given_row():
+    day, user_id, *_ = expressions(DIMENSIONS, "NEW")
+    assert day == "(NEW.visit_date AT TIME ZONE 'Europe/Amsterdam')::date"
+    assert user_id == "COALESCE(NEW.created_by, 0)"
+
+def test_measures_only_read_source_columns():
+    for expression in expressions(MEASURES, "v") + expressions(DIMENSIONS, "v"):
+        assert set(re.findall(r"\bv\.(\w+)", expression)) <= set(SOURCE_COLUMNS), expression
+
+def test_apply_sql_adds_or_subtracts_every_measure():
+    added, removed = _apply_sql("NEW", ""), _apply_sql("OLD", "-")
+    assert added.startswith(f"INSERT INTO {TABLE} ({', '.join([*DIMENSIONS, *MEASURES])})")
+    assert f"ON CONFLICT ({', '.join(DIMENSIONS)})" in added
+    for name in MEASURES:
+        assert f"{name} = {TABLE}.{name} + EXCLUDED.{name}" in added
+    assert "OLD." not in added and "NEW." not in removed
+    assert removed.count("-(") == len(MEASURES)
+    assert added.count("-(") == 0
+
+def test_trigger_skips_updates_of_other_columns():
+    sql = trigger_function_sql()
+    old_row = ", ".join(f"OLD.{column}" for column in SOURCE_COLUMNS)
+    new_row = ", ".join(f"NEW.{column}" for column in SOURCE_COLUMNS)
+    assert f"ROW({old_row}) IS NOT DISTINCT FROM ROW({new_row})" in sql
+    assert sql.index(_apply_sql("OLD", "-")) < sql.index(_apply_sql("NEW", ""))
+
+def test_trigger_targets_the_given_table():
+    assert create_trigger_sql().endswith('ON "shop_visits" FOR EACH ROW EXECUTE FUNCTION visit_daily_rollup_apply()')
+    assert 'ON "shop_visits_partitioned"' in create_trigger_sql("shop_visits_partitioned")
@@ -0,0 +1,106 @@
+"""
+Request-level limits for file uploads, enforced before the multipart body is parsed.
+- Declared Content-Length above UPLOAD_MAX_BYTES is rejected with 413 immediately.
+- Bodies without a usable Content-Length are counted as they arrive and cut off with 413.
+- At most UPLOAD_MAX_CONCURRENT uploads and UPLOAD_MAX_TOTAL_BYTES of declared body size
+  are in flight per worker; further uploads wait briefly, then get 503 with Retry-After.
+"""
+import asyncio
+import json
+import logging
+from fastapi import HTTPException
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_PATHS = ("/api/files/upload",)
+
+# How long an upload waits for a free slot before being turned away
+SLOT_WAIT_SECONDS = 10.0
+
+class UploadBodyTooLarge(HTTPException):
+    """Raised from receive() when a streamed body exceeds the limit; FastAPI turns it into a 413."""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(
+            status_code=413,
+            detail=f"File too large. Maximum upload size is {max_bytes / (1024 * 1024):.0f} MB"
+        )
+
+class UploadLimitMiddleware:
+    """Pure ASGI middleware guarding the upload endpoints."""
+
+    def __init__(self, app, max_bytes: int = None, max_total_bytes: int = None, max_concurrent: int = None):
+        self.app = app
+        self.max_bytes = max_bytes or settings.upload_max_bytes
+        self.max_total_bytes = max_total_bytes or settings.upload_max_total_bytes
+        self.max_concurrent = max_concurrent or settings.upload_max_concurrent
+        self._condition = asyncio.Condition()
+        self.active_uploads = 0
+        self.reserved_bytes = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("method") != "POST" or scope.get("path") not in UPLOAD_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = None
+        for key, value in scope.get("headers", []):
+            if key == b"content-length":
+                try:
+                    content_length = int(value)
+                except ValueError:
+                    pass
+        if content_length is not None and content_length > self.max_bytes:
+            await self._reject(send, 413, f"File too large. Maximum upload size is {self.max_bytes / (1024 * 1024):.0f} MB")
+            return
+
+        reserve = content_length if content_length is not None else self.max_bytes
+        if not await self._acquire(reserve):
+            await self._reject(send, 503, "Too many uploads in progress, please retry shortly", {"Retry-After": "5"})
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise UploadBodyTooLarge(self.max_bytes)
+            return message
+
+        try:
+            await self.app(scope, limited_receive, send)
+        finally:
+            await self._release(reserve)
+
+    async def _acquire(self, reserve: int) -> bool:
+        def has_room():
+            return (self.active_uploads < self.max_concurrent
+                    and self.reserved_bytes + reserve <= self.max_total_bytes)
+        async with self._condition:
+            try:
+                await asyncio.wait_for(self._condition.wait_for(has_room), SLOT_WAIT_SECONDS)
+            except asyncio.TimeoutError:
+                logger.warning(f"Upload rejected: {self.active_uploads} uploads / {self.reserved_bytes} bytes in flight")
+                return False
+            self.active_uploads += 1
+            self.reserved_bytes += reserve
+            return True
+
+    async def _release(self, reserve: int):
+        async with self._condition:
+            self.active_uploads -= 1
+            self.reserved_bytes -= reserve
+            self._condition.notify_all()
+
+    async def _reject(self, send, status_code: int, detail: str, headers: dict = None):
+        body = json.dumps({"detail": detail}).encode("utf-8")
+        raw_headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        raw_headers += [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+        # The client may still be sending; closing the connection stops the upload early
+        raw_headers.append((b"connection", b"close"))
+        await send({"type": "http.response.start", "status": status_code, "headers": raw_headers})
+        await send({"type": "http.response.body", "body": body})
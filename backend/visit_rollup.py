@@ -0,0 +1,230 @@
+"""
+Daily rollup of shop visits for the dashboards.
+visit_daily_rollup holds one row per day x rep (created_by) x region x status x purpose with
+visit counts, order value sums and satisfaction/score sums, so dashboard totals read a few
+hundred rollup rows instead of scanning shop_visits.
+- An AFTER INSERT/UPDATE/DELETE trigger on shop_visits applies every write as a delta
+  (the old row's contribution is subtracted, the new row's added) in the same transaction,
+  so the rollup stays exact for writes from any code path. Updates that change none of the
+  rolled-up columns (e.g. draft autosaves of notes) skip it.
+- refresh() recomputes a range of days from shop_visits, e.g. nightly from cron as a safety
+  net; backfill() does so for all history, month by month. Each chunk locks the rollup table,
+  so trigger updates running at the same time are neither lost nor counted twice. Callers
+  then drop the cached analytics responses with invalidate_cached_totals().
+Days are calendar days of visit_date in VISIT_ROLLUP_TIMEZONE (refresh after changing it).
+Run from the backend directory: python visit_rollup.py backfill | refresh [--days 3]
+"""
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+from zoneinfo import ZoneInfo
+from sqlalchemy import func, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from config import settings
+from models import VisitDailyRollup
+
+logger = logging.getLogger(__name__)
+
+TABLE = "visit_daily_rollup"
+TRIGGER_NAME = "shop_visits_daily_rollup"
+FUNCTION_NAME = "visit_daily_rollup_apply"
+
+# Rollup key columns, derived from a shop_visits row ({row} is NEW, OLD or v)
+DIMENSIONS = {
+    "day": "({row}.visit_date AT TIME ZONE {tz})::date",
+    "user_id": "COALESCE({row}.created_by, 0)",
+    "region": "COALESCE({row}.region, '')",
+    "visit_status": "COALESCE({row}.visit_status::text, '')",
+    "visit_purpose": "COALESCE({row}.visit_purpose, '')",
+}
+# Summed columns: one visit's contribution
+MEASURES = {
+    "visit_count": "1",
+    "order_value_sum": "COALESCE({row}.order_value, 0)",
+    "order_count": "CASE WHEN {row}.order_value > 0 THEN 1 ELSE 0 END",
+    "satisfaction_sum": "COALESCE({row}.overall_satisfaction, 0)",
+    "satisfaction_count": "CASE WHEN {row}.overall_satisfaction IS NULL THEN 0 ELSE 1 END",
+    "score_sum": "COALESCE({row}.calculated_score, 0)",
+    "score_count": "CASE WHEN {row}.calculated_score IS NULL THEN 0 ELSE 1 END",
+    "follow_up_count": "CASE WHEN {row}.follow_up_required THEN 1 ELSE 0 END",
+}
+# shop_visits columns the expressions above read
+SOURCE_COLUMNS = (
+    "visit_date", "created_by", "region", "visit_status", "visit_purpose",
+    "order_value", "overall_satisfaction", "calculated_score", "follow_up_required",
+)
+# Dimensions stored as 0 / '' when unknown, returned as null
+EMPTY_VALUES = {"user_id": 0, "region": "", "visit_status": "", "visit_purpose": ""}
+
+def timezone_literal() -> str:
+    return "'" + settings.visit_rollup_timezone.replace("'", "''") + "'"
+
+def expressions(templates: Dict[str, str], row: str) -> List[str]:
+    return [template.format(row=row, tz=timezone_literal()) for template in templates.values()]
+
+def _apply_sql(row: str, sign: str) -> str:
+    """Upsert adding (sign '') or subtracting (sign '-') one row's contribution."""
+    columns = ", ".join([*DIMENSIONS, *MEASURES])
+    values = ", ".join(expressions(DIMENSIONS, row) + [f"{sign}({value})" for value in expressions(MEASURES, row)])
+    updates = ", ".join(f"{name} = {TABLE}.{name} + EXCLUDED.{name}" for name in MEASURES)
+    return f"INSERT INTO {TABLE} ({columns}) VALUES ({values}) ON CONFLICT ({', '.join(DIMENSIONS)}) DO UPDATE SET {updates};"
+
+def trigger_function_sql() -> str:
+    old_values = ", ".join(f"OLD.{column}" for column in SOURCE_COLUMNS)
+    new_values = ", ".join(f"NEW.{column}" for column in SOURCE_COLUMNS)
+    return f"""
+        CREATE OR REPLACE FUNCTION {FUNCTION_NAME}() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'UPDATE' AND ROW({old_values}) IS NOT DISTINCT FROM ROW({new_values}) THEN
+                RETURN NULL;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                {_apply_sql("OLD", "-")}
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                {_apply_sql("NEW", "")}
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """
+
+def create_trigger_sql(table_name: str = "shop_visits") -> str:
+    return (f'CREATE TRIGGER {TRIGGER_NAME} AFTER INSERT OR UPDATE OR DELETE ON "{table_name}" '
+            f'FOR EACH ROW EXECUTE FUNCTION {FUNCTION_NAME}()')
+
+def install(engine: Engine) -> bool:
+    """Create or update the trigger function and attach the trigger; True if the trigger is new."""
+    with engine.begin() as conn:
+        # Workers starting together run the migrations concurrently
+        conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:name))"), {"name": TABLE})
+        conn.execute(text(trigger_function_sql()))
+        exists = conn.execute(text(
+            "SELECT 1 FROM pg_trigger WHERE tgname = :name AND tgrelid = 'shop_visits'::regclass"
+        ), {"name": TRIGGER_NAME}).first() is not None
+        if not exists:
+            conn.execute(text(create_trigger_sql()))
+    return not exists
+
+def refresh(engine: Engine, start: date, end: date) -> int:
+    """Recompute the rollup rows of days [start, end) from shop_visits; returns the rows written."""
+    columns = ", ".join([*DIMENSIONS, *MEASURES])
+    selected = ", ".join(expressions(DIMENSIONS, "v") + [f"SUM({value})" for value in expressions(MEASURES, "v")])
+    tz = timezone_literal()
+    with engine.begin() as conn:
+        # Trigger updates wait for this chunk; the recount below then includes or follows them
+        conn.execute(text(f"LOCK TABLE {TABLE} IN EXCLUSIVE MODE"))
+        conn.execute(text(f"DELETE FROM {TABLE} WHERE day >= :start AND day < :end"), {"start": start, "end": end})
+        return conn.execute(text(f"""
+            INSERT INTO {TABLE} ({columns})
+            SELECT {selected} FROM shop_visits v
+            WHERE v.visit_date >= CAST(:start AS timestamp) AT TIME ZONE {tz}
+              AND v.visit_date < CAST(:end AS timestamp) AT TIME ZONE {tz}
+            GROUP BY 1, 2, 3, 4, 5
+        """), {"start": start, "end": end}).rowcount
+
+def today() -> date:
+    return datetime.now(ZoneInfo(settings.visit_rollup_timezone)).date()
+
+def refresh_recent(engine: Engine, days: int = 3) -> int:
+    """Recompute the last `days` days (today included)."""
+    end = today() + timedelta(days=1)
+    written = refresh(engine, end - timedelta(days=days), end)
+    logger.info(f"Refreshed visit rollup for the last {days} days: {written} rows")
+    return written
+
+def backfill(engine: Engine) -> int:
+    """Recompute the whole rollup, one month per transaction."""
+    tz = timezone_literal()
+    with engine.connect() as conn:
+        first, last = conn.execute(text(
+            f"SELECT (min(visit_date) AT TIME ZONE {tz})::date, (max(visit_date) AT TIME ZONE {tz})::date FROM shop_visits"
+        )).first()
+    if first is None:
+        return 0
+    written = 0
+    start = first.replace(day=1)
+    while start <= last:
+        end = (start + timedelta(days=32)).replace(day=1)
+        written += refresh(engine, start, end)
+        logger.info(f"  Visit rollup backfilled up to {end:%Y-%m} ({written} rows)")
+        start = end
+    return written
+
+def invalidate_cached_totals():
+    """Drop the cached analytics responses of every worker once the rollup was recomputed."""
+    from db import SessionLocal
+    from response_cache import response_cache
+    with SessionLocal() as db:
+        response_cache.invalidate(db, ["analytics"])
+        db.commit()
+
+def ensure_rollup(engine: Engine):
+    """Startup hook: keep the trigger in place, and build the rollup when the trigger is new."""
+    if install(engine):
+        logger.info("Installed the visit rollup trigger, backfilling visit_daily_rollup...")
+        logger.info(f"✓ Backfilled visit_daily_rollup: {backfill(engine)} rows")
+
+def query_rollup(
+    db: Session,
+    group_by: Sequence[str] = (),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    filters: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Sum the rollup over days [start, end), grouped by the given dimensions (none = one total).
+    filters maps dimensions to the value to match; None means unknown (stored as 0 / '').
+    """
+    keys = [getattr(VisitDailyRollup, name) for name in group_by]
+    sums = [func.sum(getattr(VisitDailyRollup, name)).label(name) for name in MEASURES]
+    query = db.query(*keys, *sums)
+    if start is not None:
+        query = query.filter(VisitDailyRollup.day >= start)
+    if end is not None:
+        query = query.filter(VisitDailyRollup.day < end)
+    for name, value in (filters or {}).items():
+        query = query.filter(getattr(VisitDailyRollup, name) == (EMPTY_VALUES.get(name) if value is None else value))
+    if keys:
+        # Groups whose visits were all deleted or moved away keep zero rows until refreshed
+        query = query.group_by(*keys).having(func.sum(VisitDailyRollup.visit_count) > 0).order_by(*keys)
+
+    rows = []
+    for row in query.all():
+        item = {name: value or 0 for name, value in row._asdict().items() if name in MEASURES}
+        for name in group_by:
+            value = getattr(row, name)
+            item[name] = None if name in EMPTY_VALUES and value == EMPTY_VALUES[name] else value
+        item["average_score"] = round(item["score_sum"] / item["score_count"], 2) if item["score_count"] else None
+        item["average_satisfaction"] = (
+            round(item["satisfaction_sum"] / item["satisfaction_count"], 2) if item["satisfaction_count"] else None
+        )
+        rows.append(item)
+    return rows
+
+def main():
+    import argparse
+    import sys
+    from db import engine
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    parser = argparse.ArgumentParser(description="Maintain the visit_daily_rollup table")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("backfill", help="Install the trigger and recompute the rollup for all visits")
+    refresh_parser = subparsers.add_parser("refresh", help="Recompute the most recent days (e.g. nightly from cron)")
+    refresh_parser.add_argument("--days", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.command == "backfill":
+        install(engine)
+        logger.info(f"✓ Backfilled visit_daily_rollup: {backfill(engine)} rows")
+    else:
+        refresh_recent(engine, args.days)
+    invalidate_cached_totals()
+
+if __name__ == "__main__":
+    main()
@@ -84,6 +84,8 @@ async function apiCall(endpoint, options = {}) {
   let response;
   try {
     response = await fetch(url, {
+      // Lets login/refresh set the media cookie that <img> tags need for /api/files and /api/signatures
+      credentials: 'include',
       ...options,
       headers,
     });
@@ -147,5 +149,14 @@ async function apiCall(endpoint, options = {}) {
   }
 }
 
-export { API_BASE_URL, getApiBaseUrl, apiCall };
+// Resolve a server-relative URL returned by the API (e.g. /api/files/{id}) against the API host,
+// so <img> tags load it from the backend when it runs on another port than the frontend
+function resolveApiUrl(url) {
+  if (typeof url !== 'string' || !url.startsWith('/api/')) {
+    return url;
+  }
+  return `${getApiBaseUrl().replace(/\/api\/?$/, '')}${url}`;
+}
+
+export { API_BASE_URL, getApiBaseUrl, apiCall, resolveApiUrl };
 
@@ -1,4 +1,4 @@
-import { apiCall } from './config';
+import { apiCall, getApiBaseUrl } from './config';
 
 // ShopVisit entity
 export const ShopVisit = {
@@ -45,6 +45,18 @@ export const ShopVisit = {
   get: async (id) => {
     return apiCall(`/shop-visits/${id}`);
   },
+  // Report PDF rendered (and cached) on the server; resolves to a Blob
+  getPdf: async (id) => {
+    const token = localStorage.getItem('access_token');
+    const response = await fetch(`${getApiBaseUrl()}/shop-visits/${id}/pdf`, {
+      headers: token ? { Authorization: `Bearer ${token}` } : {}
+    });
+    if (!response.ok) {
+      const error = await response.json().catch(() => ({ detail: response.statusText }));
+      throw new Error(error.detail || `HTTP error! status: ${response.status}`);
+    }
+    return response.blob();
+  },
   delete: async (id) => {
     return apiCall(`/shop-visits/${id}`, {
       method: 'DELETE'
@@ -102,6 +114,12 @@ export const Customer = {
   get: async (id) => {
     return apiCall(`/customers/${id}`);
   },
+  // Resolve a set of ids in one request; returns [{ id, shop_name, shop_type, city, region, visit_notes, status }]
+  getMany: async (ids) => {
+    const unique = [...new Set(ids.filter(id => id !== undefined && id !== null))];
+    if (unique.length === 0) return [];
+    return apiCall(`/customers?ids=${unique.join(',')}`);
+  },
   delete: async (id) => {
     return apiCall(`/customers/${id}`, {
       method: 'DELETE'
@@ -152,6 +170,13 @@ export const Configuration = {
   get: async (id) => {
     return apiCall(`/configurations/${id}`);
   },
+  // Create/update a whole config_type list in one request (matched by id or config_value)
+  bulkUpsert: async (configType, items) => {
+    return apiCall('/configurations/bulk', {
+      method: 'PUT',
+      body: JSON.stringify({ config_type: configType, items })
+    });
+  },
   delete: async (id) => {
     return apiCall(`/configurations/${id}`, {
       method: 'DELETE'
@@ -180,6 +205,17 @@ export const AuditLog = {
     const endpoint = queryString ? `/audit-logs?${queryString}` : '/audit-logs';
     return apiCall(endpoint);
   },
+  // Keyset-paged search: returns { items, next_cursor }; pass next_cursor as `cursor` for the next page
+  search: async (filters = {}) => {
+    const params = new URLSearchParams();
+    Object.entries(filters).forEach(([key, value]) => {
+      if (value !== undefined && value !== null && value !== '') {
+        params.append(key, value.toString());
+      }
+    });
+    const queryString = params.toString();
+    return apiCall(queryString ? `/audit-logs/search?${queryString}` : '/audit-logs/search');
+  },
   get: async (id) => {
     return apiCall(`/audit-logs/${id}`);
   }
@@ -240,6 +276,12 @@ export const User = {
   get: async (id) => {
     return apiCall(`/users/${id}`);
   },
+  // Resolve a set of ids in one request; returns [{ id, email, full_name }]
+  getMany: async (ids) => {
+    const unique = [...new Set(ids.filter(id => id !== undefined && id !== null))];
+    if (unique.length === 0) return [];
+    return apiCall(`/users?ids=${unique.join(',')}`);
+  },
   getCurrent: async () => {
     return User.me();
   },
@@ -306,6 +348,9 @@ export const User = {
     const { stopTokenRefresh } = await import('@/utils/tokenRefresh');
     stopTokenRefresh();
     
+    // Drop the media cookie; logging out locally must not depend on the backend
+    await apiCall('/auth/logout', { method: 'POST' }).catch(() => {});
+    
     localStorage.removeItem('access_token');
     localStorage.removeItem('user');
     localStorage.removeItem('is_hardcoded_admin'); // Clear hardcoded admin flag
@@ -373,5 +418,33 @@ export const User = {
     const queryString = params.toString();
     const endpoint = `/users?${queryString}`;
     return apiCall(endpoint);
+  },
+  // Users joined with their profile (no signature), filtered on the server.
+  // Returns { items, next_cursor }; pass next_cursor as `cursor` for the next page
+  search: async (filters = {}) => {
+    const params = new URLSearchParams();
+    Object.entries(filters).forEach(([key, value]) => {
+      if (value !== undefined && value !== null && value !== '') {
+        params.append(key, value.toString());
+      }
+    });
+    const queryString = params.toString();
+    return apiCall(queryString ? `/users/search?${queryString}` : '/users/search');
+  }
+};
+
+// Daily visit rollup: precomputed dashboard totals
+export const VisitRollup = {
+  // filters: group_by (e.g. "day,region"), start, end (YYYY-MM-DD, end exclusive), user_id,
+  // region, visit_status, visit_purpose. Returns one row per group, or a single total row
+  query: async (filters = {}) => {
+    const params = new URLSearchParams();
+    Object.entries(filters).forEach(([key, value]) => {
+      if (value !== undefined && value !== null && value !== '') {
+        params.append(key, value.toString());
+      }
+    });
+    const queryString = params.toString();
+    return apiCall(queryString ? `/analytics/visit-rollup?${queryString}` : '/analytics/visit-rollup');
   }
 };
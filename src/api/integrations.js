@@ -18,7 +18,7 @@ export const Core = {
   UploadFile: async (file, options = {}) => {
     // Try to use backend API first, fallback to data URL if backend is not available
     try {
-      const { getApiBaseUrl } = await import('./config');
+      const { getApiBaseUrl, resolveApiUrl } = await import('./config');
       const formData = new FormData();
       formData.append('file', file);
       
@@ -38,10 +38,15 @@ export const Core = {
       
       if (response.ok) {
         const result = await response.json();
+        // Stored files come back as /api/files/{id}
+        const fileUrl = resolveApiUrl(result.url || result.file_url);
         return {
-          url: result.url || result.file_url,
+          url: fileUrl,
           fileId: result.fileId,
-          file_url: result.file_url || result.url
+          file_url: fileUrl,
+          variants: Object.fromEntries(
+            Object.entries(result.variants || {}).map(([name, variant]) => [name, { ...variant, url: resolveApiUrl(variant.url) }])
+          )
         };
       }
     } catch (error) {
@@ -112,6 +117,10 @@ export const Core = {
   }
 };
 
+// URL of a smaller rendition of a stored upload ('thumb' or 'medium'); other URLs are returned as-is
+export const fileVariantUrl = (url, variant = 'thumb') =>
+  typeof url === 'string' && /\/api\/files\/[^/?]+$/.test(url) ? `${url}?variant=${variant}` : url;
+
 // Individual export stubs for convenience
 export const InvokeLLM = Core.InvokeLLM;
 export const SendEmail = Core.SendEmail;
@@ -21,12 +21,12 @@ export default function PlannedVisits({ visits }) {
   const [customers, setCustomers] = useState([]);
 
   useEffect(() => {
-    // Fetch users and customers to get assigned user names and visit notes
+    // Resolve just the assigned users and customers of these visits (names and visit notes)
     const loadData = async () => {
       try {
         const [usersData, customersData] = await Promise.all([
-          UserEntity.list(),
-          Customer.list()
+          UserEntity.getMany(visits.map(visit => visit.assigned_user_id)),
+          Customer.getMany(visits.map(visit => visit.customer_id))
         ]);
         setUsers(usersData || []);
         setCustomers(customersData || []);
@@ -35,7 +35,7 @@ export default function PlannedVisits({ visits }) {
       }
     };
     loadData();
-  }, []);
+  }, [visits]);
 
   // Get user name by ID
   const getUserName = (userId) => {
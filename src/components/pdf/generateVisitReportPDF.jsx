@@ -1,3 +1,5 @@
+import { resolveApiUrl } from '@/api/config';
+
 export const generateVisitReportPDF = async (formData, user) => {
   // Fetch company logo from configurations
   let companyLogo = null;
@@ -99,12 +101,13 @@ export const generateVisitReportPDF = async (formData, user) => {
     order_value: formData.order_value || 0,
     sales_data: formData.sales_data || {},
     region: formData.region || '',
-    company_logo: companyLogo,
+    // The template page loads images itself, so server-relative URLs must be absolute
+    company_logo: resolveApiUrl(companyLogo),
     company_name: companyName,
-    signature: formData.signature || null,
+    signature: resolveApiUrl(formData.signature) || null,
     signature_signer_name: formData.signature_signer_name || null,
     signature_date: formData.signature_date || null,
-    visitor_signature: salesRepSignature,
+    visitor_signature: resolveApiUrl(salesRepSignature),
     visitor_signature_name: salesRepName
   };
 
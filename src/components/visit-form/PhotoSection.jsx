@@ -6,7 +6,7 @@ import { Textarea } from "@/components/ui/textarea";
 import { Dialog, DialogContent } from "@/components/ui/dialog";
 import { Alert, AlertDescription } from "@/components/ui/alert";
 import { Badge } from "@/components/ui/badge";
-import { UploadFile } from "@/api/integrations";
+import { UploadFile, fileVariantUrl } from "@/api/integrations";
 import SpeechRecognition, { useSpeechRecognition } from 'react-speech-recognition';
 import { 
   Camera, 
@@ -734,7 +734,8 @@ export default function PhotoSection({ formData, updateFormData }) {
                       onClick={() => setPreviewImage(url)}
                     >
                       <img
-                        src={url}
+                        src={fileVariantUrl(url, 'thumb')}
+                        loading="lazy"
                         alt={`Visit photo ${index + 1}`}
                         className="w-full h-24 object-cover rounded-lg border shadow-sm group-hover:shadow-md transition-shadow"
                         onError={(e) => {
@@ -6,6 +6,8 @@ export default function SignaturePad({ onSave, signerName, onError }) {
   const canvasRef = useRef(null);
   const contextRef = useRef(null);
   const isDrawing = useRef(false);
+  // Vector copy of the drawing: one flat [x, y, x, y, ...] array per stroke
+  const strokesRef = useRef([]);
 
   useEffect(() => {
     const canvas = canvasRef.current;
@@ -22,11 +24,20 @@ export default function SignaturePad({ onSave, signerName, onError }) {
     contextRef.current = context;
   }, []);
 
+  // Canvas coordinates of a mouse or touch event; touch events have no offsetX/offsetY
+  const getPoint = (nativeEvent) => {
+    const canvas = canvasRef.current;
+    const rect = canvas.getBoundingClientRect();
+    const source = nativeEvent.touches?.[0] || nativeEvent.changedTouches?.[0] || nativeEvent;
+    return [source.clientX - rect.left - canvas.clientLeft, source.clientY - rect.top - canvas.clientTop];
+  };
+
   const startDrawing = ({ nativeEvent }) => {
-    const { offsetX, offsetY } = nativeEvent;
     if (!contextRef.current) return;
+    const [offsetX, offsetY] = getPoint(nativeEvent);
     contextRef.current.beginPath();
     contextRef.current.moveTo(offsetX, offsetY);
+    strokesRef.current.push([offsetX, offsetY]);
     isDrawing.current = true;
   };
 
@@ -38,9 +49,10 @@ export default function SignaturePad({ onSave, signerName, onError }) {
 
   const draw = ({ nativeEvent }) => {
     if (!isDrawing.current || !contextRef.current) return;
-    const { offsetX, offsetY } = nativeEvent;
+    const [offsetX, offsetY] = getPoint(nativeEvent);
     contextRef.current.lineTo(offsetX, offsetY);
     contextRef.current.stroke();
+    strokesRef.current[strokesRef.current.length - 1]?.push(offsetX, offsetY);
   };
 
   const clearCanvas = () => {
@@ -48,6 +60,7 @@ export default function SignaturePad({ onSave, signerName, onError }) {
     if (!canvas) return;
     const context = canvas.getContext('2d');
     context.clearRect(0, 0, canvas.width, canvas.height);
+    strokesRef.current = [];
   };
 
   const hasSignature = () => {
@@ -78,7 +91,13 @@ export default function SignaturePad({ onSave, signerName, onError }) {
     }
 
     const dataUrl = canvasRef.current.toDataURL();
-    const result = onSave(dataUrl);
+    // The server stores the strokes (a few hundred bytes) instead of the PNG
+    const strokes = {
+      width: canvasRef.current.width,
+      height: canvasRef.current.height,
+      strokes: strokesRef.current.filter(stroke => stroke.length >= 2)
+    };
+    const result = onSave(dataUrl, strokes.strokes.length > 0 ? strokes : null);
     
     // If onSave returns false, it means validation failed
     if (result === false) {
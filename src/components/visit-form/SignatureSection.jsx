@@ -7,6 +7,7 @@ import { Alert, AlertDescription } from "@/components/ui/alert";
 import SignaturePad from "./SignaturePad";
 import { Badge } from "@/components/ui/badge";
 import { Edit, Check, AlertCircle, Lock } from "lucide-react";
+import { resolveApiUrl } from "@/api/config";
 
 export default function SignatureSection({ formData, updateFormData }) {
   const [signerName, setSignerName] = useState(formData.signature_signer_name || "");
@@ -22,7 +23,7 @@ export default function SignatureSection({ formData, updateFormData }) {
     setIsSigned(!!formData.signature);
   }, [formData.signature, formData.signature_signer_name]);
 
-  const handleSaveSignature = async (signatureDataUrl) => {
+  const handleSaveSignature = async (signatureDataUrl, signatureStrokes) => {
     // Validate signer name before saving signature
     if (!signerName || signerName.trim() === "") {
       setSignatureError("Signer name is mandatory. Please enter the name before submitting.");
@@ -36,6 +37,7 @@ export default function SignatureSection({ formData, updateFormData }) {
     // Update form data with shop representative signature
     updateFormData({
       signature: signatureDataUrl,
+      signature_strokes: signatureStrokes || null,
       signature_signer_name: signerName.trim(),
       signature_date: signatureDate
     });
@@ -50,6 +52,7 @@ export default function SignatureSection({ formData, updateFormData }) {
     // Clear signature data to allow re-signing
     updateFormData({
       signature: null,
+      signature_strokes: null,
       signature_signer_name: signerName, // Keep the name
       signature_date: null
     });
@@ -108,7 +111,7 @@ export default function SignatureSection({ formData, updateFormData }) {
                   <Check className="w-3 h-3 md:w-4 md:h-4 mr-1 md:mr-2 flex-shrink-0"/>
                   Signature Captured
                 </Badge>
-                <img src={formData.signature} alt="Shop Representative Signature" className="mx-auto mt-3 md:mt-4 border rounded max-w-full h-auto"/>
+                <img src={resolveApiUrl(formData.signature)} alt="Shop Representative Signature" className="mx-auto mt-3 md:mt-4 border rounded max-w-full h-auto"/>
               </div>
               <Button 
                 variant="outline" 
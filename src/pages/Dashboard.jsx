@@ -2,6 +2,7 @@
 import React, { useState, useEffect } from "react";
 import { ShopVisit } from "@/api/entities";
 import { User } from "@/api/entities";
+import { VisitRollup } from "@/api/entities";
 import { Link } from "react-router-dom";
 import { createPageUrl } from "@/utils";
 import { 
@@ -30,6 +31,7 @@ import { Skeleton } from "@/components/ui/skeleton";
 export default function Dashboard() {
   const [visits, setVisits] = useState([]);
   const [user, setUser] = useState(null);
+  const [rollup, setRollup] = useState(null);
   const [isLoading, setIsLoading] = useState(true);
 
   useEffect(() => {
@@ -73,9 +75,13 @@ export default function Dashboard() {
 
       // Load critical data in parallel (like Admin panel) - this is the key to speed!
       // Load enough data initially so we don't need to update it later (prevents confusion)
-      const [visitsData, freshUserData] = await Promise.all([
+      // Totals over all visits come from the daily rollup (not just the 50 loaded); null falls back to the loaded visits.
+      // "This week's visits" counts visits created in the last 7 days, which the rollup (keyed by visit day) cannot answer,
+      // so it stays on the loaded visits - the 50 most recently created.
+      const [visitsData, freshUserData, statusTotals] = await Promise.all([
         ShopVisit.list("-created_at", 50).catch(() => []), // Load enough data initially
-        User.me().catch(() => cachedUserData) // Fallback to cached if API fails
+        User.me().catch(() => cachedUserData), // Fallback to cached if API fails
+        VisitRollup.query({ group_by: "visit_status" }).catch(() => null)
       ]);
       
       // Ensure visitsData is an array
@@ -87,6 +93,16 @@ export default function Dashboard() {
         localStorage.setItem('user', JSON.stringify(freshUserData));
       }
       
+      if (Array.isArray(statusTotals)) {
+        const sum = (field) => statusTotals.reduce((total, row) => total + (row[field] || 0), 0);
+        const scoreCount = sum("score_count");
+        setRollup({
+          totalPlannedVisits: statusTotals.find(row => row.visit_status === "appointment")?.visit_count || 0,
+          averageScore: scoreCount > 0 ? sum("score_sum") / scoreCount : 0,
+          followUpRequired: sum("follow_up_count")
+        });
+      }
+
       setVisits(visits);
       setIsLoading(false); // Show page immediately after parallel data loads
       // No progressive loading - data stays stable to avoid user confusion
@@ -137,6 +153,8 @@ export default function Dashboard() {
     : 0;
 
   const followUpRequired = visits.filter(visit => visit.follow_up_required).length;
+  // The stats card and the Action Required banner show the same number: all visits needing follow-up
+  const followUpTotal = rollup ? rollup.followUpRequired : followUpRequired;
   // Find the first pending follow-up visit (requires follow-up but may be missing notes or date)
   // Priority: visits missing notes > visits missing date > any follow-up required visit
   const pendingFollowUpVisits = visits.filter(visit => 
@@ -244,10 +262,10 @@ export default function Dashboard() {
 
         {/* Stats Overview */}
         <StatsOverview 
-          totalPlannedVisits={totalPlannedVisits}
+          totalPlannedVisits={rollup ? rollup.totalPlannedVisits : totalPlannedVisits}
           thisWeeksVisits={thisWeeksVisits.length}
-          averageScore={averageScore}
-          followUpRequired={followUpRequired}
+          averageScore={rollup ? rollup.averageScore : averageScore}
+          followUpRequired={followUpTotal}
         />
 
         {/* Main Content Grid */}
@@ -264,7 +282,7 @@ export default function Dashboard() {
               <TopShops visits={visits} />
               
               {/* Action Required Card */}
-              {followUpRequired > 0 && (
+              {followUpTotal > 0 && (
                 <motion.div
                   initial={{ opacity: 0, y: 20 }}
                   animate={{ opacity: 1, y: 0 }}
@@ -279,7 +297,7 @@ export default function Dashboard() {
                     </CardHeader>
                     <CardContent className="px-4 md:px-4 lg:px-5 pb-3 md:pb-3.5 lg:pb-4 flex-1 flex flex-col justify-between">
                       <p className="text-sm md:text-sm lg:text-base text-orange-700 dark:text-orange-300 mb-2 md:mb-2 lg:mb-3">
-                        {followUpRequired} visit{followUpRequired !== 1 ? 's' : ''} require{followUpRequired === 1 ? 's' : ''} follow-up action
+                        {followUpTotal} visit{followUpTotal !== 1 ? 's' : ''} require{followUpTotal === 1 ? 's' : ''} follow-up action
                         {firstPendingFollowUp && (
                           <span className="block text-xs md:text-xs lg:text-sm mt-1.5 md:mt-1.5 lg:mt-2 font-semibold">
                             Next: {firstPendingFollowUp.shop_name || 'Unnamed Shop'}
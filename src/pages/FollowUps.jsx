@@ -38,12 +38,17 @@ export default function FollowUps() {
 
   useEffect(() => {
     loadVisits();
-    loadUsers();
   }, []);
 
-  const loadUsers = async () => {
+  useEffect(() => {
+    loadUsers(visits);
+  }, [visits]);
+
+  // Resolve only the users referenced by the loaded visits, in one request
+  const loadUsers = async (visitList) => {
     try {
-      const userList = await User.list().catch(() => []);
+      const ids = visitList.flatMap(visit => [visit.created_by, visit.follow_up_assigned_user_id]);
+      const userList = await User.getMany(ids).catch(() => []);
       setUsers(userList || []);
     } catch (error) {
       console.error("Failed to load users:", error);
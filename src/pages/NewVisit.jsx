@@ -1042,6 +1042,7 @@ export default function NewVisit() {
         support_materials_items: formData.support_materials_items || [],
         gps_coordinates: formData.gps_coordinates || null,
         signature: formData.signature || null,
+        signature_strokes: formData.signature_strokes || null,
         signature_signer_name: formData.signature_signer_name || null,
         signature_date: formData.signature_date ? new Date(formData.signature_date).toISOString() : null,
         // Ensure sales_data is included (contains all the sales/purchase breakdown data)
@@ -1072,8 +1073,29 @@ export default function NewVisit() {
     }
   };
 
-  const handleDownloadPdf = () => {
+  const handleDownloadPdf = async () => {
     if (formData && user) {
+      // Submitted reports no longer change, so the server renders (and caches) the PDF;
+      // drafts still reflect unsaved edits and are rendered in the browser
+      if (visitId && formData.visit_status === "done") {
+        const pdfWindow = window.open('', '_blank');
+        try {
+          const blob = await ShopVisit.getPdf(visitId);
+          const url = URL.createObjectURL(blob);
+          if (pdfWindow) {
+            pdfWindow.location.href = url;
+          } else {
+            window.location.href = url;
+          }
+          setTimeout(() => URL.revokeObjectURL(url), 60000);
+          return;
+        } catch (err) {
+          console.error('Server PDF rendering failed, using the browser export:', err);
+          if (pdfWindow) {
+            pdfWindow.close();
+          }
+        }
+      }
       generateVisitReportPDF(formData, user);
     } else {
       alert("Report data or user data is not loaded yet.");
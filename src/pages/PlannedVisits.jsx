@@ -23,6 +23,12 @@ import { format, startOfDay, startOfWeek, startOfMonth, isToday, isTomorrow, isT
 import ExportOptions from "../components/reports/ExportOptions";
 import { Skeleton } from "@/components/ui/skeleton";
 
+const PLANNED_VISIT_FIELDS = [
+  "id", "customer_id", "shop_name", "shop_type", "shop_address", "contact_person",
+  "visit_purpose", "visit_status", "planned_visit_date", "appointment_description",
+  "assigned_user_id", "created_at"
+].join(",");
+
 export default function PlannedVisits() {
   const navigate = useNavigate();
   const [visits, setVisits] = useState([]);
@@ -47,7 +53,12 @@ export default function PlannedVisits() {
       setIsLoading(true);
       
       // Load enough data initially so we don't need to update it later (prevents confusion)
-      const visitsData = await ShopVisit.list("-created_at", 200).catch(() => []);
+      // Only appointments, and only the columns this page renders and exports
+      const visitsData = await ShopVisit.list({
+        visit_status: "appointment",
+        fields: PLANNED_VISIT_FIELDS,
+        limit: 200
+      }).catch(() => []);
       
       // Filter only planned visits (appointment status)
       const plannedVisits = (visitsData || []).filter(visit => visit.visit_status === "appointment");
@@ -55,10 +66,11 @@ export default function PlannedVisits() {
       setVisits(plannedVisits);
       setIsLoading(false); // Show page immediately after critical data loads
       
-      // Load secondary data in background (non-blocking, doesn't change visits)
+      // Load secondary data in background (non-blocking, doesn't change visits):
+      // only the users and customers these visits reference, one request each
       Promise.all([
-        UserEntity.list().catch(() => []),
-        Customer.list().catch(() => [])
+        UserEntity.getMany(plannedVisits.map(visit => visit.assigned_user_id)).catch(() => []),
+        Customer.getMany(plannedVisits.map(visit => visit.customer_id)).catch(() => [])
       ]).then(([usersData, customersData]) => {
         setUsers(usersData || []);
         setCustomers(customersData || []);
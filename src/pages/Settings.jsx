@@ -21,6 +21,7 @@ import {
   Lock
 } from "lucide-react";
 import SignaturePad from "@/components/visit-form/SignaturePad";
+import { resolveApiUrl } from "@/api/config";
 import { Skeleton } from "@/components/ui/skeleton";
 
 export default function Settings() {
@@ -534,7 +535,7 @@ export default function Settings() {
                     </div>
                     {signature ? (
                       <img 
-                        src={signature} 
+                        src={resolveApiUrl(signature)} 
                         alt="signature" 
                         className="mx-auto border rounded max-w-full h-auto max-h-48"
                         onError={(e) => {
@@ -560,7 +561,7 @@ export default function Settings() {
                 </div>
               ) : (
                 <SignaturePad 
-                  onSave={async (signatureDataUrl) => {
+                  onSave={async (signatureDataUrl, signatureStrokes) => {
                     if (!signatureSignerName || signatureSignerName.trim() === "") {
                       setSignatureError("Signer name is mandatory. Please enter the name before submitting.");
                       return false;
@@ -582,6 +583,7 @@ export default function Settings() {
                     try {
                       const savedResponse = await UserProfile.saveSignature(user.id, {
                         signature: signatureDataUrl,
+                        signature_strokes: signatureStrokes,
                         signature_signer_name: signatureSignerName.trim()
                       });
                       setSuccess(true);
@@ -48,6 +48,7 @@ export async function refreshAccessToken() {
 
     const response = await fetch(`${API_BASE_URL}/auth/refresh`, {
       method: 'POST',
+      credentials: 'include', // Also renews the media cookie
       headers: {
         'Authorization': `Bearer ${token}`,
         'Content-Type': 'application/json',